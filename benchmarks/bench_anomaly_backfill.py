@@ -0,0 +1,83 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+import pandas as pd
+
+from benchmarks.synthetic_data import write_synthetic
+from src.evaluation.anomaly_detection import run_anomaly_backfill
+from src.io.dataset import DatasetWriter, read_dataset
+from src.io.schema import AI4I_SCHEMA, csv_dtypes, enforce_schema
+
+
+# -------------------------
+# Backfill scoring throughput vs workers
+# -------------------------
+# A synthetic snapshot is written as Arrow (in a separate process, so it
+# does not count toward this process's peak memory) and backfilled once per
+# worker count. Reports scoring rows/s, the speedup over one worker,
+# end-to-end rows/s (sample, fit and scoring) and the peak RSS of this
+# process. With one worker it scores the chunks itself, so its peak RSS
+# should track the chunk size rather than the dataset size. Scores must not
+# depend on the number of workers.
+
+
+def _peak_rss_mb():
+    # VmHWM is Linux-only
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def _write_snapshot(path: str, scale: float):
+    csv_path = path + ".csv"
+    write_synthetic(csv_path, scale)
+    with DatasetWriter(path) as writer:
+        for chunk in pd.read_csv(csv_path, dtype=csv_dtypes(AI4I_SCHEMA), chunksize=500_000):
+            writer.write(enforce_schema(chunk, AI4I_SCHEMA)[0])
+    os.remove(csv_path)
+
+
+def run_benchmark(scale: float = 100, workers=(1, 2, 4), chunksize: int = 100_000, fit_rows: int = 100_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, "snapshot.arrow")
+        writer = multiprocessing.get_context("spawn").Process(target=_write_snapshot, args=(snapshot, scale))
+        writer.start()
+        writer.join()
+
+        reference = None
+        baseline = None
+        print(f"{os.path.getsize(snapshot) / 2 ** 20:.0f} MB snapshot, {chunksize} rows per chunk")
+        print(f"{'workers':>8} {'rows/s':>10} {'speedup':>8} {'total rows/s':>13} {'sample s':>9} "
+              f"{'peak RSS MB':>12}")
+        for n in workers:
+            output = os.path.join(tmp, f"scores_{n}.arrow")
+            stats = run_anomaly_backfill(snapshot, output, fit_rows=fit_rows, chunksize=chunksize, workers=n)
+
+            scores = read_dataset(output, columns=["anomaly_score"])["anomaly_score"]
+            if reference is None:
+                reference = scores
+            elif not scores.equals(reference):
+                raise AssertionError(f"Scores with {n} workers differ from {workers[0]} worker(s)")
+
+            baseline = baseline or stats["rows_per_sec"]
+            print(f"{n:>8} {stats['rows_per_sec']:>10,.0f} {stats['rows_per_sec'] / baseline:>7.2f}x "
+                  f"{stats['total_rows_per_sec']:>13,.0f} {stats['sample_seconds']:>9.2f} "
+                  f"{_peak_rss_mb():>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parallel anomaly backfill scoring")
+    parser.add_argument("--scale", type=float, default=100, help="synthetic rows as a multiple of 10k")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--fit-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    run_benchmark(args.scale, args.workers, args.chunksize, args.fit_rows)
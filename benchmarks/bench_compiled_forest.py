@@ -0,0 +1,86 @@
+import argparse
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from src.io.dataset import dataset_columns, read_dataset
+from src.modeling.compiled_forest import MAX_COMPILED_ROWS, compile_forest
+
+
+# -------------------------
+# sklearn vs compiled forest inference benchmark
+# -------------------------
+# By default a forest is fitted like the RQ1 fused-sensor model (raw
+# snapshot, 200 trees), since the ABT model is trained on a single class
+# and its trees are single leaves. The batch sizes bracket the break-even
+# point used for MAX_COMPILED_ROWS.
+
+def _best_time(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_benchmark(data_path: str, model_path: str = None, n_trees: int = 200,
+                  batch_sizes=(1, 64, 256, 1024, 4096, 100_000)):
+    columns = [c for c in dataset_columns(data_path) if c not in ["UDI", "Product ID", "Type"]]
+    df = read_dataset(data_path, columns=columns)
+    X = df.drop("Machine failure", axis=1)
+    y = df["Machine failure"]
+
+    if model_path:
+        model = joblib.load(model_path)
+        X = X[list(model.feature_names_in_)]
+    else:
+        model = RandomForestClassifier(n_estimators=n_trees, random_state=42, class_weight="balanced")
+        model.fit(X, y)
+
+    start = time.perf_counter()
+    compiled = compile_forest(model)
+    print(f"Compiled {len(model.estimators_)} trees ({compiled.feature.size} nodes, "
+          f"depth {compiled.max_depth}) in {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(42)
+    results = []
+
+    for batch_size in batch_sizes:
+        batch = X.iloc[rng.integers(0, len(X), batch_size)]
+        repeats = 20 if batch_size < 1000 else 3
+
+        expected = model.predict_proba(batch)
+        actual = compiled.predict_proba(batch)
+        max_diff = float(np.abs(expected - actual).max())
+
+        t_sklearn = _best_time(lambda: model.predict_proba(batch), repeats)
+        t_compiled = _best_time(lambda: compiled.predict_proba(batch), repeats)
+
+        results.append({
+            "batch_size": batch_size,
+            "sklearn_ms": t_sklearn * 1000,
+            "compiled_ms": t_compiled * 1000,
+            "speedup": t_sklearn / t_compiled,
+            "max_abs_diff": max_diff
+        })
+        print(f"batch={batch_size:>7}: sklearn {t_sklearn * 1000:9.2f} ms | "
+              f"compiled {t_compiled * 1000:9.2f} ms | speedup {t_sklearn / t_compiled:6.1f}x | "
+              f"max |diff| {max_diff:.2e}")
+
+    faster = [r["batch_size"] for r in results if r["speedup"] > 1]
+    print(f"Compiled forest faster up to {max(faster) if faster else 0} rows "
+          f"(MAX_COMPILED_ROWS = {MAX_COMPILED_ROWS})")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark compiled forest inference")
+    parser.add_argument("--data", default="data/raw/ai4i2020_snapshot.arrow")
+    parser.add_argument("--model", default=None, help="joblib model to benchmark instead of fitting one")
+    parser.add_argument("--trees", type=int, default=200)
+    args = parser.parse_args()
+
+    run_benchmark(args.data, args.model, args.trees)
@@ -0,0 +1,91 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import generate_ai4i
+from src.modeling.drift_monitor import drift_table, load_summary, reference_summary, save_summary, summarize
+
+
+# -------------------------
+# Drift summaries: cost, size and accuracy
+# -------------------------
+# Summarizes synthetic AI4I sensor rows at growing sizes (time should grow
+# linearly, the stored JSON should not), then compares new batches (an
+# unchanged one and a few shifted ones) with the reference. The sketch-based
+# PSI and KS are checked against the exact statistics computed from the full
+# columns; PSI is exact by construction (same bins), KS is within the
+# sketches' rank error.
+
+FEATURES = ["Air temperature [K]", "Process temperature [K]", "Rotational speed [rpm]",
+            "Torque [Nm]", "Tool wear [min]"]
+
+SHIFTS = {
+    "none": {},
+    "torque +2%": {"Torque [Nm]": lambda x: x * 1.02},
+    "torque +10%": {"Torque [Nm]": lambda x: x * 1.10},
+    "air temp +1 K": {"Air temperature [K]": lambda x: x + 1.0},
+    "speed noise x1.5": {"Rotational speed [rpm]": lambda x: x.mean() + (x - x.mean()) * 1.5}
+}
+
+
+def _frame(n: int, seed: int) -> pd.DataFrame:
+    return pd.concat(generate_ai4i(n, seed=seed), ignore_index=True)[FEATURES].astype("float64")
+
+
+def _chunks(df: pd.DataFrame, chunksize: int = 50_000):
+    for offset in range(0, len(df), chunksize):
+        yield df.iloc[offset:offset + chunksize]
+
+
+def _exact(reference: pd.Series, current: pd.Series, edges) -> tuple:
+    ref, cur = np.sort(reference.to_numpy()), np.sort(current.to_numpy())
+    points = np.union1d(ref, cur)
+    ks = np.abs(np.searchsorted(ref, points, side="right") / len(ref)
+                - np.searchsorted(cur, points, side="right") / len(cur)).max()
+
+    def proportions(values):
+        return np.maximum(np.bincount(np.searchsorted(edges, values), minlength=len(edges) + 1) / len(values), 1e-4)
+
+    p, q = proportions(ref), proportions(cur)
+    return float(np.sum((q - p) * np.log(q / p))), float(ks)
+
+
+def run_benchmark(sizes=(100_000, 1_000_000), batch_rows: int = 200_000):
+    print(f"{'rows':>9} {'summary s':>10} {'rows/s':>12} {'JSON KB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            df = _frame(n, seed=1)
+            start = time.perf_counter()
+            reference = reference_summary(df)
+            elapsed = time.perf_counter() - start
+            path = save_summary(reference, os.path.join(tmp, f"reference_{n}.json"))
+            print(f"{n:>9} {elapsed:10.2f} {n / elapsed:12,.0f} {os.path.getsize(path) / 1024:8.1f}")
+
+        # Compare batches with the last (largest) reference, reloaded from disk
+        reference = load_summary(path)
+
+    edges = {col: summary.edges for col, summary in reference.items()}
+    print(f"\n{'batch':>18} {'feature':>24} {'PSI':>8} {'exact':>8} {'KS':>7} {'exact':>7}")
+    for name, shift in SHIFTS.items():
+        batch = _frame(batch_rows, seed=2)
+        for col, f in shift.items():
+            batch[col] = f(batch[col])
+
+        table = drift_table(reference, summarize(_chunks(batch), edges)).set_index("Feature")
+        col = next(iter(shift), table.index[0])
+        exact_psi, exact_ks = _exact(df[col], batch[col], edges[col])
+        print(f"{name:>18} {col:>24} {table.at[col, 'PSI']:8.4f} {exact_psi:8.4f} "
+              f"{table.at[col, 'KS']:7.4f} {exact_ks:7.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sketch-based drift summaries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--batch-rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.batch_rows)
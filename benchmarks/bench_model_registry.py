@@ -0,0 +1,152 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from benchmarks.synthetic_data import BASE_ROWS, generate_ai4i
+from src.io.dataset import dataset_columns, read_dataset
+
+
+# -------------------------
+# Model loading benchmark: pickle vs registry
+# -------------------------
+# Starts N scorer processes at once for each loading mode, lets every one
+# load the model and score a batch, and measures load time and memory
+# while all of them are alive. PSS (proportional set size) splits shared
+# pages between the processes that map them, so it shows how much memory
+# each scorer really costs when the model arrays are shared.
+
+MODES = ("pickle", "pickle_mmap", "registry")
+
+
+def _memory_mb():
+    # RSS, PSS and private memory from /proc (Linux); None elsewhere
+    try:
+        values = {}
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts[0].endswith(":") and len(parts) >= 2 and parts[1].isdigit():
+                    values[parts[0][:-1]] = int(parts[1]) / 1024
+    except OSError:
+        return {"rss": None, "pss": None, "private": None}
+    return {
+        "rss": values["Rss"],
+        "pss": values["Pss"],
+        "private": values["Private_Clean"] + values["Private_Dirty"]
+    }
+
+
+def _scorer(mode, pickle_path, registry_dir, batch, barrier, results):
+    # Import sklearn before the baseline so only the model itself is measured
+    import sklearn.ensemble  # noqa: F401
+    from src.modeling.model_registry import load_model
+
+    before = _memory_mb()
+    start = time.perf_counter()
+
+    if mode == "pickle":
+        model = joblib.load(pickle_path)
+    elif mode == "pickle_mmap":
+        model = joblib.load(pickle_path, mmap_mode="r")
+    else:
+        model = load_model(version="latest", registry_dir=registry_dir)
+    model.predict_proba(batch)
+
+    load_s = time.perf_counter() - start
+
+    # Measure while every scorer holds its model
+    barrier.wait()
+    after = _memory_mb()
+    barrier.wait()
+
+    results.put({
+        "load_s": load_s,
+        **{k: None if after[k] is None else after[k] - before[k] for k in after}
+    })
+
+
+def run_benchmark(data_path: str = None, n_scorers=(1, 4, 8), n_trees: int = 200,
+                  scale: float = 10, label_noise: float = 0.0):
+    """
+    Fit a forest on ``data_path`` (or ``scale`` x 10k synthetic AI4I rows)
+    and compare the loading modes for each number of concurrent scorers.
+    ``label_noise`` flips that fraction of labels, which grows the trees
+    to the size of forests trained on noisy production data.
+    """
+
+    from src.modeling.model_registry import register_model
+
+    ids = ["UDI", "Product ID", "Type"]
+    if data_path:
+        columns = [c for c in dataset_columns(data_path) if c not in ids]
+        df = read_dataset(data_path, columns=columns)
+    else:
+        df = pd.concat(generate_ai4i(int(BASE_ROWS * scale))).drop(columns=ids)
+    X = df.drop("Machine failure", axis=1)
+    y = df["Machine failure"].copy()
+
+    flip = np.random.default_rng(42).random(len(y)) < label_noise
+    y[flip] = 1 - y[flip]
+
+    model = RandomForestClassifier(n_estimators=n_trees, random_state=42, class_weight="balanced")
+    model.fit(X, y)
+    batch = X.iloc[:64]
+
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, "random_forest_model.pkl")
+        joblib.dump(model, pickle_path)
+        registry_dir = os.path.join(tmp, "registry")
+        register_model(model, X, y, registry_dir=registry_dir)
+
+        print(f"Pickle size: {os.path.getsize(pickle_path) / 2 ** 20:.1f} MB")
+        print(f"{'mode':<12} {'scorers':>7} {'load ms':>9} {'RSS MB':>8} {'PSS MB':>8} {'private MB':>10}")
+
+        for n in n_scorers:
+            for mode in MODES:
+                barrier = ctx.Barrier(n)
+                results = ctx.Queue()
+                procs = [
+                    ctx.Process(target=_scorer,
+                                args=(mode, pickle_path, registry_dir, batch, barrier, results))
+                    for _ in range(n)
+                ]
+                for p in procs:
+                    p.start()
+                measured = [results.get() for _ in procs]
+                for p in procs:
+                    p.join()
+
+                row = {"mode": mode, "scorers": n}
+                for key in ("load_s", "rss", "pss", "private"):
+                    values = [m[key] for m in measured if m[key] is not None]
+                    row[key] = float(np.mean(values)) if values else None
+                rows.append(row)
+
+                def fmt(v):
+                    return f"{v:8.1f}" if v is not None else f"{'n/a':>8}"
+                print(f"{mode:<12} {n:>7} {row['load_s'] * 1000:9.1f} {fmt(row['rss'])} "
+                      f"{fmt(row['pss'])} {fmt(row['private']):>10}")
+
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark model loading for concurrent scorers")
+    parser.add_argument("--data", default=None, help="dataset to fit on (default: synthetic)")
+    parser.add_argument("--scale", type=float, default=10, help="synthetic rows as a multiple of 10k")
+    parser.add_argument("--scorers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--trees", type=int, default=200)
+    parser.add_argument("--label-noise", type=float, default=0.0)
+    args = parser.parse_args()
+
+    run_benchmark(args.data, args.scorers, args.trees, args.scale, args.label_noise)
@@ -0,0 +1,84 @@
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic_data import write_synthetic
+from src.io.dataset import read_dataset, write_dataset
+from src.io.partitioned import partition_dataset, scan, window_size
+from src.io.schema import AI4I_SCHEMA, csv_dtypes, enforce_schema
+
+
+# -------------------------
+# Flat snapshot vs partitioned snapshot reads
+# -------------------------
+# Writes a synthetic snapshot both as one Arrow file and partitioned by
+# Type and UDI window (as the partition_snapshot stage does), then times
+# typical analysis reads on each. Bytes are what the read has to touch:
+# the whole flat file, or the projected columns of the unpruned partitions.
+# Every partitioned read is checked against the flat one.
+
+QUERIES = {
+    "all columns": (None, None),
+    "torque only": (["Torque [Nm]"], None),
+    "torque, Type == L": (["Torque [Nm]"], [("Type", "==", "L")]),
+    "flags, first UDI window": (
+        ["Machine failure", "TWF", "HDF", "PWF", "OSF", "RNF"], [("UDI", "<", 2_500)]
+    )
+}
+
+
+def _timed_read(path, columns, filters, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        df = read_dataset(path, columns, filters)
+        best = min(best, time.perf_counter() - start)
+    return df, best
+
+
+def run_benchmark(data_path: str = None, scale: float = 100, repeats: int = 3):
+    with tempfile.TemporaryDirectory() as tmp:
+        if data_path is None:
+            data_path = os.path.join(tmp, "synthetic.csv")
+            write_synthetic(data_path, scale)
+
+        flat = os.path.join(tmp, "snapshot.arrow")
+        parts = os.path.join(tmp, "partitioned")
+        df, _ = enforce_schema(pd.read_csv(data_path, dtype=csv_dtypes(AI4I_SCHEMA)), AI4I_SCHEMA)
+        write_dataset(df, flat)
+
+        start = time.perf_counter()
+        manifest = partition_dataset(flat, parts, ("Type",), "UDI", window_size(flat))
+        t_partition = time.perf_counter() - start
+
+        print(f"{len(df)} rows, {len(manifest['partitions'])} partitions written in {t_partition:.2f}s")
+        print(f"{'query':>24} {'flat s':>8} {'parts s':>8} {'MB read':>8} {'parts read':>11}")
+
+        flat_mb = os.path.getsize(flat) / 2 ** 20
+        results = {}
+        for name, (columns, filters) in QUERIES.items():
+            expected, t_flat = _timed_read(flat, columns, filters, repeats)
+            actual, t_parts = _timed_read(parts, columns, filters, repeats)
+            pd.testing.assert_frame_equal(actual, expected)
+
+            plan = scan(parts, columns, filters)
+            mb = plan["bytes"] / 2 ** 20
+            print(f"{name:>24} {t_flat:8.3f} {t_parts:8.3f} {mb:8.1f} "
+                  f"{len(plan['partitions']):>5}/{plan['total_partitions']:<5}"
+                  f"   ({flat_mb:.1f} MB flat)")
+            results[name] = {"flat_s": t_flat, "partitioned_s": t_parts, "mb_read": mb}
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark partitioned dataset reads")
+    parser.add_argument("--data", default=None, help="AI4I CSV (default: synthetic)")
+    parser.add_argument("--scale", type=float, default=100, help="synthetic rows as a multiple of 10k")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.data, args.scale, args.repeats)
@@ -0,0 +1,68 @@
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.inspection import permutation_importance as sklearn_permutation_importance
+from sklearn.model_selection import train_test_split
+
+from benchmarks.synthetic_data import generate_ai4i
+from src.evaluation.permutation_importance import permutation_importance
+
+
+# -------------------------
+# Batched permutation importance vs sklearn
+# -------------------------
+# A forest is fitted on synthetic AI4I sensor rows and its permutation
+# importance is computed on the held-out rows by sklearn (one predict call
+# per feature and repeat), by the batched engine and by the engine again
+# from its cache. The two methods draw different shuffles, so their means
+# agree only up to the repeat noise; the Std column bounds it.
+
+FEATURES = ["Air temperature [K]", "Process temperature [K]", "Rotational speed [rpm]",
+            "Torque [Nm]", "Tool wear [min]"]
+
+
+def run_benchmark(sizes=(10_000, 100_000), n_trees: int = 100, n_repeats: int = 5, workers: int = 1):
+    print(f"{'rows':>8} {'sklearn s':>10} {'batched s':>10} {'cached s':>9} {'max mean diff':>14} {'max std':>8}")
+
+    for n in sizes:
+        df = pd.concat(generate_ai4i(n), ignore_index=True)
+        X, y = df[FEATURES], df["Machine failure"]
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+        model = RandomForestClassifier(n_estimators=n_trees, random_state=42, class_weight="balanced")
+        model.fit(X_train, y_train)
+
+        start = time.perf_counter()
+        expected = sklearn_permutation_importance(model, X_test, y_test, n_repeats=n_repeats, random_state=42)
+        t_sklearn = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            start = time.perf_counter()
+            # sklearn's default score, for comparison
+            table = permutation_importance(model, X_test, y_test, n_repeats, scoring="accuracy",
+                                           workers=workers, cache_dir=cache_dir)
+            t_batched = time.perf_counter() - start
+
+            start = time.perf_counter()
+            permutation_importance(model, X_test, y_test, n_repeats, scoring="accuracy",
+                                   workers=workers, cache_dir=cache_dir)
+            t_cached = time.perf_counter() - start
+
+        actual = table.set_index("Feature").loc[FEATURES]
+        diff = np.abs(actual["Importance"].to_numpy() - expected.importances_mean).max()
+        print(f"{n:>8} {t_sklearn:10.2f} {t_batched:10.2f} {t_cached:9.3f} {diff:14.4f} "
+              f"{actual['Std'].max():8.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched permutation importance")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.trees, args.repeats, args.workers)
@@ -0,0 +1,87 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+
+from benchmarks.synthetic_data import BASE_ROWS, generate_ai4i
+from src.io.dataset import DatasetWriter, read_dataset
+from src.modeling.sharded_forest import fit_sharded
+
+
+# -------------------------
+# Sharded training scaling benchmark
+# -------------------------
+# Fits the same total number of trees on 1, 2, 4, ... stratified shards,
+# one worker process per shard, and reports the speedup over one shard,
+# the scaling efficiency (speedup / workers), the peak memory per worker
+# and the test F1 of the merged forest. Worker start-up (spawning and
+# imports) is part of the wall time, as it would be for real nodes.
+
+FEATURES = [
+    "Air temperature [K]", "Process temperature [K]",
+    "Rotational speed [rpm]", "Torque [Nm]", "Tool wear [min]"
+]
+
+
+def run_benchmark(data_path: str = None, workers=(1, 2, 4, 8), n_trees: int = 64,
+                  scale: float = 10):
+    with tempfile.TemporaryDirectory() as tmp:
+        if data_path is None:
+            # Synthetic AI4I rows, written chunk by chunk as an Arrow dataset
+            data_path = os.path.join(tmp, "synthetic.arrow")
+            with DatasetWriter(data_path) as writer:
+                for chunk in generate_ai4i(int(BASE_ROWS * scale)):
+                    writer.write(chunk)
+
+        df = read_dataset(data_path, columns=FEATURES + ["Machine failure"])
+        y = df["Machine failure"]
+        train_rows, test_rows = train_test_split(
+            np.arange(len(df)), test_size=0.2, random_state=42, stratify=y
+        )
+        X_test, y_test = df[FEATURES].iloc[test_rows], y.iloc[test_rows]
+
+        print(f"{len(train_rows)} training rows, {n_trees} trees, {os.cpu_count()} CPUs")
+        print(f"{'workers':>7} {'wall s':>8} {'speedup':>8} {'effic.':>7} "
+              f"{'peak MB/worker':>15} {'shard MB':>9} {'test F1':>8}")
+
+        rows = []
+        for n in workers:
+            start = time.perf_counter()
+            model, stats = fit_sharded(
+                data_path, FEATURES, rows=train_rows, n_shards=n, workers=n,
+                n_estimators=n_trees, class_weight="balanced"
+            )
+            wall = time.perf_counter() - start
+
+            row = {
+                "workers": n,
+                "wall_s": wall,
+                "peak_rss_mb": max(s["peak_rss_mb"] or 0 for s in stats),
+                "shard_mb": max(s["shard_mb"] or 0 for s in stats),
+                "f1": f1_score(y_test, model.predict(X_test), zero_division=0)
+            }
+            base = rows[0]["wall_s"] if rows else wall
+            row["speedup"] = base / wall
+            row["efficiency"] = row["speedup"] / n * rows[0]["workers"] if rows else 1.0
+            rows.append(row)
+
+            print(f"{n:>7} {wall:8.2f} {row['speedup']:8.2f} {row['efficiency']:7.2f} "
+                  f"{row['peak_rss_mb']:15.1f} {row['shard_mb']:9.1f} {row['f1']:8.4f}")
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sharded forest training")
+    parser.add_argument("--data", default=None, help="Arrow dataset (default: synthetic)")
+    parser.add_argument("--scale", type=float, default=10, help="synthetic rows as a multiple of 10k")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--trees", type=int, default=64)
+    args = parser.parse_args()
+
+    run_benchmark(args.data, args.workers, args.trees, args.scale)
@@ -0,0 +1,54 @@
+import argparse
+import time
+
+import numpy as np
+from sklearn.metrics import accuracy_score, average_precision_score, f1_score, roc_auc_score
+
+from src.evaluation.thresholds import evaluate_scores
+
+
+# -------------------------
+# Single-pass threshold evaluation vs sklearn metrics
+# -------------------------
+# Synthetic failure scores (5 % positives). sklearn computes each metric in
+# its own pass at one threshold; the single-pass evaluation derives them,
+# plus the confusion matrix at every threshold, from one sort. The sweep
+# column is the cost of scanning ``--thresholds`` cutoffs with sklearn.
+
+def run_benchmark(sizes=(10_000, 100_000, 1_000_000, 5_000_000), n_thresholds: int = 20,
+                  seed: int = 42):
+    rng = np.random.default_rng(seed)
+    print(f"{'rows':>10} {'single pass s':>14} {'sklearn s':>10} {'sweep s':>9} {'max diff':>9}")
+
+    for n in sizes:
+        y = (rng.random(n) < 0.05).astype("int64")
+        scores = np.clip(rng.normal(0.3 + 0.3 * y, 0.2), 0, 1)
+
+        start = time.perf_counter()
+        metrics, curve = evaluate_scores(y, scores)
+        t_single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        y_pred = scores > 0.5
+        expected = [accuracy_score(y, y_pred), f1_score(y, y_pred),
+                    roc_auc_score(y, scores), average_precision_score(y, scores)]
+        t_sklearn = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for threshold in np.linspace(0, 1, n_thresholds):
+            f1_score(y, scores >= threshold, zero_division=0)
+        t_sweep = time.perf_counter() - start
+
+        actual = [metrics["accuracy"], metrics["f1"], metrics["auc"], metrics["average_precision"]]
+        diff = float(np.max(np.abs(np.subtract(actual, expected))))
+        print(f"{n:>10} {t_single:14.3f} {t_sklearn:10.3f} {t_sweep:9.3f} {diff:9.1e}"
+              f"   ({len(curve)} thresholds)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark single-pass threshold evaluation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 5_000_000])
+    parser.add_argument("--thresholds", type=int, default=20)
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.thresholds)
@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS from getrusage
+    resource = None
+
+from benchmarks.synthetic_data import BASE_ROWS, write_synthetic
+from src.pipeline.stages import RAW_DATA, STAGES, ancestors, topological_order
+
+
+# -------------------------
+# Scalable pipeline benchmark suite
+# -------------------------
+# For every scale a synthetic AI4I dataset is written to a scratch project
+# directory (benchmarks/.work/scale_<n>) and every pipeline stage is run
+# there in its own subprocess, in dependency order, with the stage's
+# default paths. Each run reports wall time, input rows per second and
+# the peak RSS of the process. Results are written as JSON per commit, and
+# ``compare`` diffs two result files.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = os.path.join(PROJECT_ROOT, "benchmarks", ".work")
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+DEFAULT_SCALES = (1, 10, 100, 1000)
+INFERENCE = "model_inference"
+
+
+def _peak_rss_mb():
+    # VmHWM (Linux) belongs to the current address space; ru_maxrss survives
+    # exec, so a spawned process would report its parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 1024
+
+
+def _model_inference():
+    """
+    Score the whole ABT with the trained forest and its compiled export.
+    """
+
+    import joblib
+    from src.io.dataset import read_dataset
+    from src.modeling.compiled_forest import CompiledForest
+    from src.pipeline.stages import ABT
+
+    model = joblib.load("models/random_forest_model.pkl")
+    X = read_dataset(ABT, columns=list(model.feature_names_in_))
+
+    timings = {}
+    start = time.perf_counter()
+    model.predict_proba(X)
+    timings["sklearn_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    CompiledForest.load("models/random_forest_compiled.npz").predict_proba(X)
+    timings["compiled_s"] = time.perf_counter() - start
+    return timings
+
+
+def _measure(name: str):
+    # Runs inside the stage subprocess; the result is the last output line
+    start = time.perf_counter()
+    if name == INFERENCE:
+        extra = _model_inference()
+    else:
+        stage = STAGES[name]
+        stage.resolve()(**stage.kwargs)
+        extra = {}
+    wall = time.perf_counter() - start
+    print("BENCH " + json.dumps({"wall_s": wall, "peak_rss_mb": _peak_rss_mb(), **extra}))
+
+
+def _run_stage(name: str, workdir: str, timeout: float = None) -> dict:
+    env = dict(
+        os.environ,
+        PYTHONPATH=PROJECT_ROOT,
+        MPLBACKEND="Agg",
+        # Fresh model store so memoized fits do not hide training time
+        PDM_MODEL_STORE=os.path.join(workdir, ".models", name)
+    )
+    shutil.rmtree(env["PDM_MODEL_STORE"], ignore_errors=True)
+
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run_benchmarks", "measure", name],
+            cwd=workdir, env=env, capture_output=True, text=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        return {"status": "timeout"}
+
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("BENCH ")]
+    if proc.returncode != 0 or not lines:
+        return {"status": "failed", "error": proc.stderr.strip().splitlines()[-1:]}
+    return {"status": "ok", **json.loads(lines[-1][len("BENCH "):])}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(scales=DEFAULT_SCALES, stages=None, output_path: str = None,
+              timeout: float = None, keep_data: bool = False):
+    """
+    Benchmark ``stages`` (default: all, plus model inference) at each scale
+    and write the results as JSON. Returns the result document.
+    """
+
+    # Upstream stages are run (and timed) too, since they produce the inputs
+    selected = set(stages or list(STAGES) + [INFERENCE])
+    if INFERENCE in selected:
+        selected.add("train_model")
+    for name in list(selected - {INFERENCE}):
+        selected |= ancestors(name)
+    names = [n for n in topological_order() + [INFERENCE] if n in selected]
+    commit = _git_commit()
+    results = []
+
+    for scale in scales:
+        workdir = os.path.join(WORK_DIR, f"scale_{scale:g}")
+        shutil.rmtree(workdir, ignore_errors=True)
+        n_rows = write_synthetic(os.path.join(workdir, RAW_DATA), scale)
+
+        for name in names:
+            result = _run_stage(name, workdir, timeout)
+            result.update({"scale": scale, "rows": n_rows, "stage": name})
+            if result["status"] == "ok":
+                result["rows_per_s"] = n_rows / result["wall_s"]
+                print(f"[bench] {scale:>6g}x {name:<24} {result['wall_s']:9.2f}s "
+                      f"{result['rows_per_s']:>12,.0f} rows/s  peak RSS {result['peak_rss_mb'] or 0:8.1f} MB")
+            else:
+                print(f"[bench] {scale:>6g}x {name:<24} {result['status'].upper()}")
+            results.append(result)
+
+        if not keep_data:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    document = {
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "base_rows": BASE_ROWS,
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count()
+        },
+        "results": results
+    }
+
+    output_path = output_path or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(document, f, indent=2)
+
+    print(f"Benchmark results saved as {output_path}")
+    return document
+
+
+# -------------------------
+# Regression comparison
+# -------------------------
+def compare(base_path: str, new_path: str, threshold: float = 0.10):
+    """
+    Print the wall-time change per (scale, stage) between two result files.
+    Returns the regressions slower than ``threshold`` (relative).
+    """
+
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def index(document):
+        return {
+            (r["scale"], r["stage"]): r for r in document["results"] if r["status"] == "ok"
+        }
+
+    base_results, new_results = index(base), index(new)
+    regressions = []
+
+    print(f"{'scale':>7} {'stage':<24} {base['commit']:>10} {new['commit']:>10} {'change':>8}")
+    for key in sorted(base_results.keys() & new_results.keys(), key=lambda k: (k[0], k[1])):
+        before, after = base_results[key]["wall_s"], new_results[key]["wall_s"]
+        change = after / before - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append({"scale": key[0], "stage": key[1], "change": change})
+        print(f"{key[0]:>6g}x {key[1]:<24} {before:9.2f}s {after:9.2f}s {change:+8.1%}{flag}")
+
+    missing = sorted(base_results.keys() - new_results.keys())
+    if missing:
+        print("Not measured in the new run:", missing)
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PdM pipeline benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="benchmark the pipeline on synthetic data")
+    run.add_argument("--scales", type=float, nargs="+", default=list(DEFAULT_SCALES))
+    run.add_argument("--stages", nargs="+", default=None)
+    run.add_argument("--output", default=None)
+    run.add_argument("--timeout", type=float, default=None, help="seconds per stage")
+    run.add_argument("--keep-data", action="store_true")
+
+    cmp = commands.add_parser("compare", help="compare two result files")
+    cmp.add_argument("base")
+    cmp.add_argument("new")
+    cmp.add_argument("--threshold", type=float, default=0.10)
+
+    measure = commands.add_parser("measure", help=argparse.SUPPRESS)
+    measure.add_argument("stage")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run_suite(args.scales, args.stages, args.output, args.timeout, args.keep_data)
+    elif args.command == "compare":
+        sys.exit(1 if compare(args.base, args.new, args.threshold) else 0)
+    else:
+        _measure(args.stage)
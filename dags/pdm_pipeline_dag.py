@@ -1,105 +1,129 @@
-from airflow import DAG
-from airflow.operators.bash import BashOperator
-from datetime import datetime
-
-
-# -------------------------
-# Default DAG arguments
-# -------------------------
-default_args = {
-    "owner": "student",
-    "depends_on_past": False,
-    "retries": 0
-}
-
-
-# -------------------------
-# Define DAG
-# -------------------------
-with DAG(
-    dag_id="pdm_multisensor_pipeline",
-    default_args=default_args,
-    description="Predictive Maintenance Data Engineering Pipeline",
-    start_date=datetime(2024, 1, 1),
-    schedule=None,
-    catchup=False,
-) as dag:
-
-    # -------------------------
-    # Data ingestion
-    # -------------------------
-    ingest_data = BashOperator(
-        task_id="ingest_data",
-        bash_command="echo 'Raw data already ingested from Kaggle'"
-    )
-
-    # -------------------------
-    # Data cleaning
-    # -------------------------
-    clean_data = BashOperator(
-        task_id="clean_data",
-        bash_command="python src/data_cleaning/clean_data.py"
-    )
-
-    # -------------------------
-    # Feature engineering
-    # -------------------------
-    build_features = BashOperator(
-        task_id="build_features",
-        bash_command="python src/feature_engineering/build_features.py"
-    )
-
-    # -------------------------
-    # Model training
-    # -------------------------
-    train_model = BashOperator(
-        task_id="train_model",
-        bash_command="python src/modeling/train_model.py"
-    )
-
-    # -------------------------
-    # RQ1 analysis
-    # -------------------------
-    rq1_analysis = BashOperator(
-        task_id="rq1_single_vs_fused",
-        bash_command="python src/evaluation/rq1_single_vs_fused.py"
-    )
-
-    # -------------------------
-    # RQ2 analysis
-    # -------------------------
-    rq2_analysis = BashOperator(
-        task_id="rq2_fusion_strategy",
-        bash_command="python src/evaluation/rq2_fusion_strategy.py"
-    )
-
-    # -------------------------
-    # RQ3 analysis
-    # -------------------------
-    rq3_analysis = BashOperator(
-        task_id="rq3_model_comparison",
-        bash_command="python src/evaluation/rq3_model_comparison.py"
-    )
-
-    # -------------------------
-    # RQ4 anomaly detection
-    # -------------------------
-    rq4_analysis = BashOperator(
-        task_id="rq4_anomaly_detection",
-        bash_command="python src/evaluation/anomaly_detection.py"
-    )
-
-    # -------------------------
-    # RQ5 economic analysis
-    # -------------------------
-    rq5_analysis = BashOperator(
-        task_id="rq5_economic_analysis",
-        bash_command="python src/evaluation/rq5_economic_analysis.py"
-    )
-
-    # -------------------------
-    # Task dependencies
-    # -------------------------
-    ingest_data >> clean_data >> build_features >> train_model
-    train_model >> rq1_analysis >> rq2_analysis >> rq3_analysis
-    rq3_analysis >> rq4_analysis >> rq5_analysis
+import json
+import os
+import sys
+from datetime import datetime
+
+from airflow import DAG
+from airflow.operators.bash import BashOperator
+from airflow.operators.python import PythonOperator, ShortCircuitOperator
+
+# Make the project importable so the stage graph is shared with the
+# local runner (python -m src.pipeline.run)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.pipeline.stages import DRIFT_CHECK, DRIFT_DECISION, STAGES, ancestors, validate_graph  # noqa: E402
+
+
+# -------------------------
+# Default DAG arguments
+# -------------------------
+default_args = {
+    "owner": "student",
+    "depends_on_past": False,
+    "retries": 0
+}
+
+
+# -------------------------
+# Run summary
+# -------------------------
+# Each stage task prints a JSON summary (wall/CPU time, rows, bytes, peak
+# memory per stage and sub-step timings) as its last line, which the
+# BashOperator pushes to XCom. The summary task collects them into one
+# XCom value for the run; the full records are in logs/metrics.jsonl.
+def summarize_run(ti=None, **_):
+    summary = {}
+    for name in STAGES:
+        line = ti.xcom_pull(task_ids=name)
+        try:
+            summary[name] = json.loads(line) if line else None
+        except ValueError:
+            summary[name] = {"raw": line}
+
+    timed = {k: v for k, v in summary.items() if v and "wall_s" in v}
+    if timed:
+        slowest = max(timed, key=lambda k: timed[k]["wall_s"])
+        print(f"Slowest stage: {slowest} ({timed[slowest]['wall_s']:.2f}s)")
+    return summary
+
+
+# -------------------------
+# Drift gate
+# -------------------------
+# The drift_check stage compares the new ABT with the feature summaries of
+# the current model's training rows and writes its decision. Without
+# drift, the gate skips the gated stages (train_model, the experiment grid
+# and the other RQ stages that refit models on the ABT); stages downstream
+# of them run on their previous outputs. Trigger the DAG with {"force_retrain": true} to
+# retrain regardless.
+def drift_gate(params=None, **_):
+    from src.modeling.drift_monitor import should_retrain
+
+    if (params or {}).get("force_retrain"):
+        print("Retraining forced")
+        return True
+    retrain = should_retrain(os.path.join(PROJECT_ROOT, DRIFT_DECISION))
+    print("Feature drift: retraining" if retrain else "No feature drift: skipping gated stages")
+    return retrain
+
+
+# -------------------------
+# Define DAG
+# -------------------------
+# Tasks and dependencies are generated from src/pipeline/stages.py, so the
+# independent RQ analyses fan out in parallel after their inputs exist.
+# Every task runs through the content-addressed stage cache
+# (src/pipeline/cache.py), so stages whose inputs and code are unchanged
+# restore their previous outputs instead of recomputing.
+validate_graph()
+
+with DAG(
+    dag_id="pdm_multisensor_pipeline",
+    default_args=default_args,
+    description="Predictive Maintenance Data Engineering Pipeline",
+    start_date=datetime(2024, 1, 1),
+    schedule=None,
+    catchup=False,
+    params={"force_retrain": False},
+) as dag:
+
+    gated = {name for name, stage in STAGES.items() if stage.gated}
+
+    tasks = {
+        name: BashOperator(
+            task_id=name,
+            bash_command=f"python -m src.pipeline.cache {name}",
+            cwd=PROJECT_ROOT,
+            do_xcom_push=True,
+            # Downstream of a gated stage: also run when it was skipped
+            trigger_rule="none_failed" if name not in gated and ancestors(name) & gated else "all_success"
+        )
+        for name in STAGES
+    }
+
+    # Only skips the tasks directly after it; the others follow their
+    # trigger rules
+    gate = ShortCircuitOperator(
+        task_id="drift_gate",
+        python_callable=drift_gate,
+        ignore_downstream_trigger_rules=False
+    )
+
+    # -------------------------
+    # Task dependencies
+    # -------------------------
+    tasks[DRIFT_CHECK] >> gate
+    for stage in STAGES.values():
+        for dep in stage.depends_on:
+            if dep == DRIFT_CHECK and stage.gated:
+                gate >> tasks[stage.name]
+            else:
+                tasks[dep] >> tasks[stage.name]
+
+    run_summary = PythonOperator(
+        task_id="run_summary",
+        python_callable=summarize_run,
+        trigger_rule="all_done"
+    )
+    list(tasks.values()) >> run_summary
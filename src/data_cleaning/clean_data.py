@@ -1,50 +1,363 @@
-import pandas as pd
-import os
-
-def clean_data(input_path: str, output_path: str):
-    """
-    Clean and preprocess predictive maintenance data.
-    """
-
-    df = pd.read_csv(input_path)
-
-    # Trim column names
-    df.columns = df.columns.str.strip()
-
-    # Handle missing values (median imputation)
-    numeric_cols = df.select_dtypes(include=["int64", "float64"]).columns
-    df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].median())
-
-    # Convert categorical column
-    df["Type"] = df["Type"].astype("category")
-
-    # Remove duplicates
-    df.drop_duplicates(inplace=True)
-
-    # One-hot encoding
-    df = pd.get_dummies(df, columns=["Type"], drop_first=True)
-
-    # Outlier removal using IQR
-    Q1 = df[numeric_cols].quantile(0.25)
-    Q3 = df[numeric_cols].quantile(0.75)
-    IQR = Q3 - Q1
-
-    df = df[
-        ~((df[numeric_cols] < (Q1 - 1.5 * IQR)) |
-          (df[numeric_cols] > (Q3 + 1.5 * IQR))).any(axis=1)
-    ]
-
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-    # Save cleaned data
-    df.to_csv(output_path, index=False)
-
-    return df
-
-
-if __name__ == "__main__":
-    clean_data(
-        input_path="data/raw/ai4i2020_snapshot.csv",
-        output_path="data/cleaned/ai4i2020_cleaned.csv"
-    )
+import argparse
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from numpy.lib.recfunctions import repack_fields
+
+from src.data_cleaning.quantile_sketch import make_quantile_summary
+from src.io.dataset import DatasetWriter, dataset_rows, iter_dataset, read_dataset, write_dataset
+from src.io.schema import AI4I_SCHEMA, enforce_schema
+from src.pipeline.instrumentation import log, stage, step
+
+# Inputs with more rows are cleaned out of core by the clean_data stage
+CLEAN_MAX_ROWS = int(os.environ.get("PDM_CLEAN_MAX_ROWS", 5_000_000))
+
+
+@stage("clean_data")
+def clean_data(input_path: str, output_path: str):
+    """
+    Clean and preprocess predictive maintenance data.
+    """
+
+    with step("read") as s:
+        df = read_dataset(input_path)
+        s.read(input_path)
+        s.rows_in = s.rows_out = len(df)
+
+    # Trim column names and check the input contract (a no-op cast for
+    # snapshots written by ingest_data)
+    df.columns = df.columns.str.strip()
+    df, _ = enforce_schema(df, AI4I_SCHEMA)
+
+    with step("impute_dedupe_encode", rows_in=len(df)) as s:
+        # Handle missing values (median imputation)
+        numeric_cols = df.select_dtypes(include="number").columns
+        df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].median())
+
+        # Convert categorical column
+        df["Type"] = df["Type"].astype("category")
+
+        # Remove duplicates
+        df.drop_duplicates(inplace=True)
+
+        # One-hot encoding
+        df = pd.get_dummies(df, columns=["Type"], drop_first=True)
+        s.rows_out = len(df)
+
+    # Outlier removal using IQR
+    with step("iqr_filter", rows_in=len(df)) as s:
+        Q1 = df[numeric_cols].quantile(0.25)
+        Q3 = df[numeric_cols].quantile(0.75)
+        IQR = Q3 - Q1
+
+        df = df[
+            ~((df[numeric_cols] < (Q1 - 1.5 * IQR)) |
+              (df[numeric_cols] > (Q3 + 1.5 * IQR))).any(axis=1)
+        ]
+        s.rows_out = len(df)
+
+    # Save cleaned data
+    with step("write", rows_in=len(df)) as s:
+        write_dataset(df, output_path)
+        s.rows_out = len(df)
+        s.wrote(output_path)
+
+    return df
+
+
+# -------------------------
+# Out-of-core de-duplication
+# -------------------------
+# ``clean_data`` drops duplicates after imputation. Instead of holding every
+# row seen, each imputed row's record (hash, position, numeric values and
+# the other columns as fixed-width UTF-8 bytes) is spilled to one of
+# SPILL_FANOUT files chosen by its hash bits (a Grace hash partitioning). A
+# partition of at most ``max_records`` records is de-duplicated in memory
+# by comparing the whole rows, so rows whose hashes merely collide are
+# kept; a larger one is re-partitioned on the next hash bits. The first
+# occurrence of every row is kept. The positions of the others are
+# appended to one file per ``chunksize`` rows of input, which the writing
+# pass reads back.
+
+SPILL_FANOUT = 64
+_HASH_BITS = 6  # log2(SPILL_FANOUT)
+
+
+def _record_dtype(n_values: int, n_texts: int = 0, width: int = 1) -> np.dtype:
+    return np.dtype([("hash", "u8"), ("pos", "i8"), ("values", "f8", (n_values,)),
+                     ("texts", f"S{max(width, 1)}", (n_texts,))])
+
+
+def _encoded(values: pd.Series) -> pd.Series:
+    return values.astype(str).str.encode("utf-8")
+
+
+class _Spill:
+    """
+    Append records to SPILL_FANOUT files by ``(hash >> shift) % SPILL_FANOUT``.
+    """
+
+    def __init__(self, directory: str, shift: int):
+        self.directory = directory
+        self.shift = shift
+        self._files = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, records: np.ndarray):
+        part = (records["hash"] >> np.uint64(self.shift)) & np.uint64(SPILL_FANOUT - 1)
+        for p in np.unique(part):
+            if p not in self._files:
+                self._files[p] = open(os.path.join(self.directory, f"{p:02d}.bin"), "ab")
+            self._files[p].write(records[part == p].tobytes())
+
+    def close(self) -> list:
+        for f in self._files.values():
+            f.close()
+        return [os.path.join(self.directory, f"{p:02d}.bin") for p in sorted(self._files)]
+
+
+class _DropLog:
+    """
+    Positions of the duplicate rows, bucketed by ``chunksize`` rows of input.
+    """
+
+    def __init__(self, directory: str, chunksize: int):
+        self.directory = directory
+        self.chunksize = chunksize
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, positions: np.ndarray):
+        self.dropped += len(positions)
+        buckets = positions // self.chunksize
+        for b in np.unique(buckets):
+            with open(os.path.join(self.directory, f"{b}.bin"), "ab") as f:
+                f.write(positions[buckets == b].astype("i8").tobytes())
+
+    def between(self, start: int, stop: int) -> np.ndarray:
+        found = [np.empty(0, dtype="i8")]
+        for b in range(start // self.chunksize, (stop - 1) // self.chunksize + 1):
+            path = os.path.join(self.directory, f"{b}.bin")
+            if os.path.exists(path):
+                found.append(np.fromfile(path, dtype="i8"))
+        positions = np.concatenate(found)
+        return positions[(positions >= start) & (positions < stop)]
+
+
+def _dedupe_partition(path: str, dtype: np.dtype, shift: int, max_records: int,
+                      on_unique, drops: _DropLog):
+    n = os.path.getsize(path) // dtype.itemsize
+
+    if n > max_records and shift < 64:
+        spill = _Spill(path + ".d", shift)
+        for offset in range(0, n, max_records):
+            spill.write(np.fromfile(path, dtype, count=max_records, offset=offset * dtype.itemsize))
+        os.remove(path)
+        for sub in spill.close():
+            _dedupe_partition(sub, dtype, shift + _HASH_BITS, max_records, on_unique, drops)
+        return
+
+    # Records are in input order, so the first index of a row is its first
+    # occurrence. Rows are compared byte for byte, hash included.
+    records = np.fromfile(path, dtype)
+    os.remove(path)
+    rows = repack_fields(records[["hash", "values", "texts"]])
+    _, first = np.unique(rows.view(f"V{rows.dtype.itemsize}"), return_index=True)
+    keep = np.zeros(len(records), dtype=bool)
+    keep[first] = True
+
+    on_unique(records["values"][keep])
+    if not keep.all():
+        drops.add(records["pos"][~keep])
+
+
+def _imputed(chunk: pd.DataFrame, numeric_cols, medians: pd.Series, categories) -> pd.DataFrame:
+    # Handle missing values (median imputation); only the float32 sensor
+    # columns are nullable
+    chunk[numeric_cols] = chunk[numeric_cols].fillna(medians)
+
+    # Convert categorical column with the global categories
+    chunk["Type"] = pd.Categorical(chunk["Type"], categories=categories)
+    return chunk
+
+
+@stage("clean_data")
+def clean_data_streaming(input_path: str, output_path: str,
+                         chunksize: int = 50_000,
+                         quantiles: str = "sketch", k: int = 200):
+    """
+    Out-of-core version of ``clean_data`` in three streaming passes.
+
+    Pass 1 builds the median summaries (on all rows) and collects the
+    ``Type`` categories. Pass 2 imputes and spills every row's hash to disk
+    (see ``_Spill``) to find the duplicates, and builds the quartile
+    summaries on the de-duplicated rows. Pass 3 imputes, drops the
+    duplicates, one-hot encodes and applies the IQR filter chunk by chunk,
+    appending to the output file.
+
+    Peak memory is O(``chunksize``) rows plus the quantile summaries
+    (O(k log n) per column with "sketch"; "exact" keeps the numeric columns
+    in memory) and SPILL_FANOUT open files. The spill takes
+    16 + 8 x (numeric columns) bytes of disk per row, next to the output.
+    Returns a summary dict including the worst-case normalized rank error
+    of the quantiles.
+    """
+
+    # -------------------------
+    # Pass 1: medians
+    # -------------------------
+    numeric_cols = None
+    text_cols = None
+    median_summaries = {}
+    types = set()
+    width = 1
+
+    with step("median_pass") as s:
+        for chunk in iter_dataset(input_path, chunksize):
+            chunk.columns = chunk.columns.str.strip()
+            chunk, _ = enforce_schema(chunk, AI4I_SCHEMA)
+
+            if numeric_cols is None:
+                numeric_cols = chunk.select_dtypes(include="number").columns
+                text_cols = chunk.columns.difference(numeric_cols, sort=False)
+                median_summaries = {c: make_quantile_summary(quantiles, k) for c in numeric_cols}
+
+            types.update(chunk["Type"].dropna().unique())
+            for col in text_cols:
+                width = max(width, int(_encoded(chunk[col]).str.len().max() or 0))
+            for col in numeric_cols:
+                median_summaries[col].update(chunk[col].to_numpy())
+
+        s.read(input_path)
+
+    medians = pd.Series({c: median_summaries[c].median() for c in numeric_cols})
+    categories = sorted(types)
+
+    spill_root = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_path)), prefix=".spill-")
+    try:
+        # -------------------------
+        # Pass 2: duplicates and quartiles
+        # -------------------------
+        quartile_summaries = {c: make_quantile_summary(quantiles, k) for c in numeric_cols}
+        dtype = _record_dtype(len(numeric_cols), len(text_cols), width)
+        drops = _DropLog(os.path.join(spill_root, "drops"), chunksize)
+
+        def on_unique(values):
+            for i, col in enumerate(numeric_cols):
+                quartile_summaries[col].update(values[:, i])
+
+        with step("dedupe_pass") as s:
+            spill = _Spill(os.path.join(spill_root, "rows"), 0)
+            position = 0
+            for chunk in iter_dataset(input_path, chunksize):
+                chunk.columns = chunk.columns.str.strip()
+                chunk, _ = enforce_schema(chunk, AI4I_SCHEMA)
+                chunk = _imputed(chunk, numeric_cols, medians, categories)
+
+                records = np.empty(len(chunk), dtype)
+                records["hash"] = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+                records["pos"] = np.arange(position, position + len(chunk))
+                records["values"] = chunk[numeric_cols].to_numpy(dtype="float64")
+                for i, col in enumerate(text_cols):
+                    records["texts"][:, i] = _encoded(chunk[col]).to_numpy().astype(dtype["texts"].base)
+                spill.write(records)
+                position += len(chunk)
+
+            for path in spill.close():
+                _dedupe_partition(path, dtype, _HASH_BITS, chunksize, on_unique, drops)
+
+            s.read(input_path)
+            s.rows_in, s.rows_out = position, position - drops.dropped
+
+        Q1 = pd.Series({c: quartile_summaries[c].quantile(0.25) for c in numeric_cols})
+        Q3 = pd.Series({c: quartile_summaries[c].quantile(0.75) for c in numeric_cols})
+        IQR = Q3 - Q1
+        lower, upper = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
+
+        rank_error = max(
+            max(median_summaries[c].rank_error_bound(), quartile_summaries[c].rank_error_bound())
+            for c in numeric_cols
+        )
+
+        # -------------------------
+        # Pass 3: clean and write
+        # -------------------------
+        rows_in = 0
+
+        with step("clean_pass") as s:
+            with DatasetWriter(output_path) as writer:
+                for chunk in iter_dataset(input_path, chunksize):
+                    chunk.columns = chunk.columns.str.strip()
+                    chunk, _ = enforce_schema(chunk, AI4I_SCHEMA)
+                    chunk = _imputed(chunk, numeric_cols, medians, categories)
+
+                    # Remove duplicates (within and across chunks)
+                    dropped = drops.between(rows_in, rows_in + len(chunk)) - rows_in
+                    rows_in += len(chunk)
+                    if len(dropped):
+                        keep = np.ones(len(chunk), dtype=bool)
+                        keep[dropped] = False
+                        chunk = chunk[keep]
+
+                    # One-hot encoding
+                    chunk = pd.get_dummies(chunk, columns=["Type"], drop_first=True)
+
+                    # Outlier removal using IQR
+                    chunk = chunk[
+                        ~((chunk[numeric_cols] < lower) |
+                          (chunk[numeric_cols] > upper)).any(axis=1)
+                    ]
+
+                    writer.write(chunk)
+
+            s.rows_in, s.rows_out = rows_in, writer.rows_written
+            s.read(input_path)
+            s.wrote(output_path)
+    finally:
+        shutil.rmtree(spill_root, ignore_errors=True)
+
+    log(f"Streaming clean ({quantiles} quantiles): "
+        f"{rows_in} rows in, {drops.dropped} duplicates, {writer.rows_written} rows out",
+        rank_error_bound=f"{rank_error:.4%}")
+
+    return {
+        "rows_in": rows_in,
+        "rows_out": writer.rows_written,
+        "duplicates": drops.dropped,
+        "medians": medians.to_dict(),
+        "q1": Q1.to_dict(),
+        "q3": Q3.to_dict(),
+        "rank_error_bound": rank_error
+    }
+
+
+def clean_dataset(input_path: str, output_path: str, max_rows: int = CLEAN_MAX_ROWS, **streaming):
+    """
+    ``clean_data`` for inputs of at most ``max_rows`` rows, otherwise
+    ``clean_data_streaming`` (with the ``streaming`` options).
+    """
+
+    rows = dataset_rows(input_path)
+    if rows <= max_rows:
+        clean_data(input_path, output_path)
+    else:
+        log(f"{rows} rows exceed {max_rows}: cleaning out of core", path=input_path)
+        clean_data_streaming(input_path, output_path, **streaming)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean the ingested snapshot")
+    parser.add_argument("--input", default="data/raw/ai4i2020_snapshot.arrow")
+    parser.add_argument("--output", default="data/cleaned/ai4i2020_cleaned.arrow")
+    parser.add_argument("--max-rows", type=int, default=CLEAN_MAX_ROWS,
+                        help="clean larger inputs out of core (0: always)")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--quantiles", choices=["sketch", "exact"], default="sketch",
+                        help="medians and quartiles of the out-of-core cleaner")
+    args = parser.parse_args()
+
+    clean_dataset(args.input, args.output, args.max_rows,
+                  chunksize=args.chunksize, quantiles=args.quantiles)
@@ -0,0 +1,231 @@
+import numpy as np
+
+
+class KLLSketch:
+    """
+    Mergeable streaming quantile sketch (KLL-style compactor hierarchy).
+
+    Values are buffered in levels; an item at level ``h`` stands for
+    ``2**h`` original values. When the sketch exceeds its capacity the
+    lowest overfull level is sorted and every other item is promoted one
+    level up. Memory is O(k log(n / k)) independent of the stream length.
+    """
+
+    def __init__(self, k: int = 200, seed: int = 42):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self.rank_error = 0
+        self._rng = np.random.default_rng(seed)
+
+    # -------------------------
+    # Updates
+    # -------------------------
+    def update(self, values):
+        values = np.asarray(values, dtype="float64").ravel()
+        values = values[~np.isnan(values)]
+
+        if values.size == 0:
+            return self
+
+        self.n += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def update_weighted(self, value: float, weight: int):
+        """
+        Insert ``weight`` copies of ``value`` using its binary decomposition,
+        so the cost is O(log weight) instead of O(weight).
+        """
+
+        weight = int(weight)
+        self.n += weight
+        level = 0
+
+        while weight:
+            if weight & 1:
+                self._ensure_level(level)
+                self.levels[level] = np.append(self.levels[level], value)
+            weight >>= 1
+            level += 1
+
+        self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch"):
+        self.n += other.n
+        self.rank_error += other.rank_error
+
+        for h, items in enumerate(other.levels):
+            self._ensure_level(h)
+            self.levels[h] = np.concatenate([self.levels[h], items])
+
+        self._compress()
+        return self
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def quantile(self, q):
+        if self.n == 0:
+            return np.nan
+
+        items, cum_weights = self._sorted_view()
+        ranks = np.atleast_1d(np.asarray(q, dtype="float64")) * self.n
+        idx = np.searchsorted(cum_weights, ranks, side="left")
+        idx = np.clip(idx, 0, items.size - 1)
+
+        result = items[idx]
+        return result if np.ndim(q) else float(result[0])
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def cdf(self, x):
+        """
+        Estimated fraction of values <= ``x``.
+        """
+
+        if self.n == 0:
+            return np.full(np.shape(x), np.nan) if np.ndim(x) else np.nan
+
+        items, cum_weights = self._sorted_view()
+        idx = np.searchsorted(items, np.atleast_1d(np.asarray(x, dtype="float64")), side="right")
+        result = np.r_[0, cum_weights][idx] / self.n
+        return result if np.ndim(x) else float(result[0])
+
+    def rank_error_bound(self) -> float:
+        """
+        Worst-case normalized rank error. Each compaction at level ``h``
+        moves any rank by at most ``2**h``; typical error is far smaller.
+        """
+
+        return self.rank_error / self.n if self.n else 0.0
+
+    # -------------------------
+    # Serialization
+    # -------------------------
+    def to_dict(self) -> dict:
+        return {
+            "k": self.k,
+            "n": self.n,
+            "rank_error": self.rank_error,
+            "levels": [items.tolist() for items in self.levels]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, seed: int = 42) -> "KLLSketch":
+        sketch = cls(k=data["k"], seed=seed)
+        sketch.n = data["n"]
+        sketch.rank_error = data["rank_error"]
+        sketch.levels = [np.asarray(items, dtype="float64") for items in data["levels"]]
+        return sketch
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _ensure_level(self, level: int):
+        while len(self.levels) <= level:
+            self.levels.append(np.empty(0))
+
+    def _size(self) -> int:
+        return sum(items.size for items in self.levels)
+
+    def _compress(self):
+        while self._size() > sum(
+            self._capacity(h) for h in range(len(self.levels))
+        ):
+            for h, items in enumerate(self.levels):
+                if items.size >= self._capacity(h):
+                    self._compact(h)
+                    break
+
+    def _compact(self, level: int):
+        items = np.sort(self.levels[level])
+
+        # Keep one item behind if the buffer is odd so total weight is exact
+        keep = items[-1:] if items.size % 2 else items[:0]
+        items = items[:items.size - keep.size]
+
+        offset = int(self._rng.integers(2))
+        self._ensure_level(level + 1)
+        self.levels[level + 1] = np.concatenate(
+            [self.levels[level + 1], items[offset::2]]
+        )
+        self.levels[level] = keep
+        self.rank_error += 2 ** level
+
+    def _sorted_view(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(buf.size, 2 ** h, dtype="int64")
+            for h, buf in enumerate(self.levels)
+        ])
+
+        order = np.argsort(items, kind="mergesort")
+        return items[order], np.cumsum(weights[order])
+
+
+class ExactQuantiles:
+    """
+    Exact counterpart of ``KLLSketch`` with the same interface.
+
+    Keeps every value, so memory grows with the stream; quantiles use the
+    same linear interpolation as ``pandas.Series.quantile``.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self._chunks = []
+
+    def update(self, values):
+        values = np.asarray(values, dtype="float64").ravel()
+        values = values[~np.isnan(values)]
+        self.n += values.size
+        self._chunks.append(values)
+        return self
+
+    def update_weighted(self, value: float, weight: int):
+        return self.update(np.full(int(weight), value))
+
+    def merge(self, other: "ExactQuantiles"):
+        self.n += other.n
+        self._chunks.extend(other._chunks)
+        return self
+
+    def quantile(self, q):
+        if self.n == 0:
+            return np.nan
+        result = np.quantile(np.concatenate(self._chunks), q)
+        return result if np.ndim(q) else float(result)
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def cdf(self, x):
+        if self.n == 0:
+            return np.full(np.shape(x), np.nan) if np.ndim(x) else np.nan
+        values = np.sort(np.concatenate(self._chunks))
+        result = np.searchsorted(values, np.atleast_1d(np.asarray(x, dtype="float64")), side="right") / self.n
+        return result if np.ndim(x) else float(result[0])
+
+    def rank_error_bound(self) -> float:
+        return 0.0
+
+
+def make_quantile_summary(method: str = "sketch", k: int = 200):
+    """
+    Return a quantile summary for ``method`` ("sketch" or "exact").
+    """
+
+    if method == "sketch":
+        return KLLSketch(k=k)
+    if method == "exact":
+        return ExactQuantiles()
+
+    raise ValueError(f"Unknown quantile method: {method}")
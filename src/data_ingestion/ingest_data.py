@@ -1,30 +1,181 @@
-import pandas as pd
-import os
-
-def ingest_data(input_path: str, output_path: str):
-    """
-    Ingest raw CSV data and save a snapshot.
-    """
-
-    # Load raw data
-    df = pd.read_csv(input_path)
-
-    # Basic profiling (for logs / reproducibility)
-    print("Dataset shape:", df.shape)
-    print("Column names:", df.columns.tolist())
-    print("Missing values:\n", df.isnull().sum())
-
-    # Ensure output directory exists
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-    # Save raw snapshot
-    df.to_csv(output_path, index=False)
-
-    return df
-
-
-if __name__ == "__main__":
-    ingest_data(
-        input_path="data/raw/ai4i2020.csv",
-        output_path="data/raw/ai4i2020_snapshot.csv"
-    )
+import argparse
+import pandas as pd
+import pyarrow as pa
+import os
+import time
+
+from src.io.dataset import DatasetWriter, write_dataset
+from src.io.partitioned import partition_dataset, window_size
+from src.io.schema import (
+    AI4I_SCHEMA, QUARANTINE_REASON, arrow_schema, check_columns, csv_dtypes, enforce_schema
+)
+from src.pipeline.instrumentation import log, stage, step
+
+# Compact storage types of the AI4I columns (see src/io/schema.py)
+AI4I_ARROW_SCHEMA = arrow_schema(AI4I_SCHEMA)
+AI4I_COLUMNS = [c.name for c in AI4I_SCHEMA]
+
+# Partitioned copy of the snapshot: one file per machine Type and UDI
+# window, about four windows of a multiple of 2,500 UDIs each
+SNAPSHOT_PARTITION_BY = ("Type",)
+SNAPSHOT_WINDOWS = 4
+SNAPSHOT_UDI_MULTIPLE = 2_500
+
+
+def _quarantine_path(output_path: str) -> str:
+    return os.path.splitext(output_path)[0] + "_quarantine.arrow"
+
+
+def _read_csv(input_path: str, on_error: str, **kwargs):
+    # Fail-fast parsing reads straight into the storage types; quarantine
+    # parses leniently so unparseable values can be set aside per row
+    return pd.read_csv(input_path, dtype=csv_dtypes(AI4I_SCHEMA, strict=on_error == "raise"), **kwargs)
+
+
+@stage("ingest_data")
+def ingest_data(input_path: str, output_path: str, on_error: str = "raise"):
+    """
+    Ingest raw CSV data and save a snapshot.
+    """
+
+    # Load raw data
+    with step("read_csv") as s:
+        df = _read_csv(input_path, on_error)
+        df.columns = df.columns.str.strip()
+        s.read(input_path)
+        s.rows_in = len(df)
+
+        df, rejected = enforce_schema(df, AI4I_SCHEMA, on_error)
+        s.rows_out = len(df)
+
+    if len(rejected):
+        write_dataset(rejected.astype("str"), _quarantine_path(output_path))
+        log("Rows quarantined", rows=len(rejected), path=_quarantine_path(output_path),
+            reasons=rejected[QUARANTINE_REASON].value_counts().to_dict())
+
+    # Basic profiling (for logs / reproducibility)
+    log("Dataset profiled", shape=df.shape, columns=df.columns.tolist(),
+        missing=df.isnull().sum().to_dict())
+
+    # Ensure output directory exists
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    # Save raw snapshot
+    with step("to_csv", rows_in=len(df)) as s:
+        df.to_csv(output_path, index=False)
+        s.rows_out = len(df)
+        s.wrote(output_path)
+
+    return df
+
+
+@stage("ingest_data")
+def ingest_data_streaming(input_path: str, output_path: str,
+                          chunksize: int = 50_000, on_error: str = "raise"):
+    """
+    Stream raw CSV data in fixed-size chunks into an Arrow IPC snapshot.
+
+    Only one chunk is held in memory at a time, so peak memory is bounded
+    by ``chunksize`` rather than by the size of the sensor log. Every chunk
+    is checked against ``AI4I_SCHEMA``; with ``on_error="quarantine"``
+    offending rows go to ``<output>_quarantine.arrow`` instead of failing
+    the stage. Returns the profiling stats instead of the full frame.
+    """
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    n_rows_in = n_rows = 0
+    n_quarantined = 0
+    reasons = pd.Series(dtype="int64")
+    missing = pd.Series(0, index=AI4I_COLUMNS, dtype="int64")
+    start = time.perf_counter()
+
+    with step("stream_csv_to_arrow") as s:
+        reader = _read_csv(input_path, on_error, chunksize=chunksize)
+        quarantine = None
+
+        with pa.ipc.new_file(output_path, AI4I_ARROW_SCHEMA) as writer:
+            for chunk in reader:
+                chunk.columns = chunk.columns.str.strip()
+                check_columns(chunk, AI4I_SCHEMA)
+                n_rows_in += len(chunk)
+                # Gaps are counted before the schema check rejects them
+                missing = missing.add(chunk[AI4I_COLUMNS].isnull().sum(), fill_value=0)
+                chunk, rejected = enforce_schema(chunk, AI4I_SCHEMA, on_error)
+
+                if len(rejected):
+                    if quarantine is None:
+                        quarantine = DatasetWriter(_quarantine_path(output_path))
+                    quarantine.write(rejected.astype("str"))
+                    n_quarantined += len(rejected)
+                    reasons = reasons.add(rejected[QUARANTINE_REASON].value_counts(), fill_value=0)
+
+                n_rows += len(chunk)
+
+                writer.write_table(
+                    pa.Table.from_pandas(
+                        chunk[AI4I_COLUMNS], schema=AI4I_ARROW_SCHEMA, preserve_index=False
+                    )
+                )
+
+        if quarantine is not None:
+            quarantine.close()
+            s.wrote(quarantine.path)
+
+        s.rows_in, s.rows_out = n_rows_in, n_rows
+        s.read(input_path)
+        s.wrote(output_path)
+
+    if n_quarantined:
+        log("Rows quarantined", rows=n_quarantined, path=_quarantine_path(output_path),
+            reasons=reasons.astype("int64").to_dict())
+
+    elapsed = time.perf_counter() - start
+    rows_per_sec = n_rows / elapsed if elapsed > 0 else float("inf")
+
+    # Basic profiling (for logs / reproducibility)
+    log("Dataset profiled", shape=(n_rows, len(AI4I_COLUMNS)), columns=AI4I_COLUMNS,
+        missing=missing.astype("int64").to_dict())
+    log(f"Ingested {n_rows} rows in {elapsed:.2f}s ({rows_per_sec:,.0f} rows/sec)")
+
+    return {
+        "shape": (n_rows, len(AI4I_COLUMNS)),
+        "missing": missing.astype("int64").to_dict(),
+        "quarantined": n_quarantined,
+        "elapsed_sec": elapsed,
+        "rows_per_sec": rows_per_sec
+    }
+
+
+@stage("partition_snapshot")
+def partition_snapshot(input_path: str, output_path: str, range_size: int = None):
+    """
+    Write the snapshot as a dataset partitioned by Type and UDI window, so
+    analyses of one machine type or time window only read those files.
+    """
+
+    range_size = range_size or window_size(input_path, SNAPSHOT_WINDOWS, SNAPSHOT_UDI_MULTIPLE)
+    with step("partition") as s:
+        manifest = partition_dataset(input_path, output_path, SNAPSHOT_PARTITION_BY, "UDI", range_size)
+        s.read(input_path)
+        s.rows_in = s.rows_out = manifest["rows"]
+        s.bytes_written += sum(sum(p["column_bytes"].values()) for p in manifest["partitions"])
+
+    log("Snapshot partitioned", path=output_path, partitions=len(manifest["partitions"]),
+        udi_range=range_size)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the raw sensor log into an Arrow snapshot")
+    parser.add_argument("--input", default="data/raw/ai4i2020.csv")
+    parser.add_argument("--output", default="data/raw/ai4i2020_snapshot.arrow")
+    parser.add_argument("--on-error", choices=["raise", "quarantine"], default="raise",
+                        help="fail on rows that break the schema, or set them aside")
+    parser.add_argument("--partitioned", default="data/raw/ai4i2020_partitioned",
+                        help="also write the snapshot partitioned by Type and UDI window here")
+    args = parser.parse_args()
+
+    ingest_data_streaming(args.input, args.output, on_error=args.on_error)
+    if args.partitioned:
+        partition_snapshot(args.output, args.partitioned)
@@ -1,47 +1,515 @@
-import pandas as pd
-import os
-import matplotlib.pyplot as plt
-from sklearn.ensemble import IsolationForest
-
-
-def run_anomaly_detection(input_path: str):
-    print("Loading ABT for anomaly detection:", input_path)
-
-    df = pd.read_csv(input_path)
-
-    # Separate features only (no target)
-    X = df.drop("Machine failure", axis=1)
-
-    # Train Isolation Forest
-    iso = IsolationForest(
-        n_estimators=100,
-        contamination=0.05,
-        random_state=42
-    )
-
-    df["anomaly_score"] = iso.fit_predict(X)
-
-    # Convert output: -1 = anomaly, 1 = normal
-    df["anomaly_label"] = df["anomaly_score"].map({1: "Normal", -1: "Anomaly"})
-
-    # Save table
-    os.makedirs("tables", exist_ok=True)
-    anomaly_table = df["anomaly_label"].value_counts().reset_index()
-    anomaly_table.columns = ["Label", "Count"]
-    anomaly_table.to_excel("tables/RQ4_Table1.xlsx", index=False)
-
-    # Plot anomaly distribution
-    os.makedirs("figures", exist_ok=True)
-    plt.figure(figsize=(6, 4))
-    anomaly_table.set_index("Label")["Count"].plot(kind="bar")
-    plt.title("Anomaly Detection Results")
-    plt.ylabel("Number of Observations")
-    plt.tight_layout()
-    plt.savefig("figures/RQ4_Fig1.pdf")
-    plt.close()
-
-    print("Anomaly detection completed. Outputs saved.")
-
-
-if __name__ == "__main__":
-    run_anomaly_detection("data/processed/abt.csv")
+import argparse
+import csv
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+
+from src.io.dataset import (
+    ARROW_EXTENSIONS, DatasetWriter, bytes_scanned, dataset_columns, dataset_rows, iter_dataset,
+    read_dataset, read_table
+)
+from src.io.partitioned import is_partitioned, load_manifest, parse_filter
+from src.io.schema import AI4I_SCHEMA, QUARANTINE_REASON, csv_dtypes, enforce_schema
+from src.pipeline.instrumentation import LatencyStats, log, stage, step
+from src.reporting.report import save_result
+
+
+@stage("rq4_anomaly_detection")
+def run_anomaly_detection(input_path: str, columns=None, filters=None, result_name: str = None):
+    """
+    Fit and score an IsolationForest on the ABT features, or only on
+    ``columns``, of the rows matching ``filters``.
+
+    The label counts are saved as ``result_name``: by default RQ4_Table1,
+    which the report renders, and RQ4_Table1_filtered for a subset of the
+    columns or rows, so exploratory runs do not replace the RQ4 table.
+    """
+
+    if result_name is None:
+        result_name = "RQ4_Table1" if columns is None and not filters else "RQ4_Table1_filtered"
+
+    log("Loading ABT for anomaly detection", path=input_path, columns=columns, filters=filters)
+
+    load = None if columns is None else [c for c in columns if c != "Machine failure"] + ["Machine failure"]
+    with step("read") as s:
+        df = read_dataset(input_path, load, filters)
+        s.bytes_read += bytes_scanned(input_path, load, filters)
+        s.rows_in = s.rows_out = len(df)
+
+    # Separate features only (no target)
+    X = df.drop("Machine failure", axis=1)
+
+    # Train Isolation Forest
+    iso = IsolationForest(
+        n_estimators=100,
+        contamination=0.05,
+        random_state=42
+    )
+
+    with step("fit_predict", rows_in=len(X)) as s:
+        predicted = iso.fit_predict(X)
+        s.rows_out = len(predicted)
+
+    # Convert output: -1 = anomaly, 1 = normal
+    labels = pd.Series(np.where(predicted == -1, "Anomaly", "Normal"), name="anomaly_label")
+
+    # Save the label counts (table and figure are rendered by the report stage)
+    anomaly_table = labels.value_counts().reset_index()
+    anomaly_table.columns = ["Label", "Count"]
+    with step("save_results") as s:
+        s.wrote(save_result(result_name, anomaly_table))
+
+    log("Anomaly detection completed. Results saved.", result=result_name,
+        counts=dict(zip(anomaly_table["Label"], anomaly_table["Count"].tolist())))
+
+
+# -------------------------
+# Backfill mode
+# -------------------------
+# A command-line mode only (``--backfill``), not a stage of the pipeline
+# runner. For histories too large to hold in memory, the forest is fitted
+# on a stratified sample drawn chunk by chunk, dumped once and
+# memory-mapped read-only by spawned worker processes. Each worker reads
+# its own fixed-size row range of the Arrow dataset (or of one partition)
+# and returns the scores of those rows only. At most two chunks per worker
+# are in flight, and scores are appended to a columnar output in input
+# order, so memory is bounded by the chunk size whatever the dataset size.
+
+TARGET = "Machine failure"
+ID_COLUMNS = ["UDI", "Product ID", "Type"]
+
+
+def _chunk_tasks(path: str, chunksize: int):
+    # (file, first row, rows) per chunk, in dataset order
+    if is_partitioned(path):
+        files = [(os.path.join(path, p["path"]), p["rows"]) for p in load_manifest(path)["partitions"]]
+    elif path.endswith(ARROW_EXTENSIONS):
+        files = [(path, dataset_rows(path))]
+    else:
+        raise ValueError(f"Backfill needs an Arrow or partitioned dataset: {path}")
+    return [(file, offset, min(chunksize, rows - offset))
+            for file, rows in files for offset in range(0, rows, chunksize)]
+
+
+def _read_chunk(task, columns) -> pd.DataFrame:
+    file, offset, rows = task
+    return read_table(file, columns).slice(offset, rows).to_pandas()
+
+
+def stratified_sample(tasks, n_rows: int, columns, stratify=(), seed: int = 42) -> pd.DataFrame:
+    """
+    About ``n_rows`` rows of the chunks ``tasks``, drawn chunk by chunk with
+    the same share of every ``stratify`` group as in the whole dataset.
+    Rows are chosen from the task row counts and the ``stratify`` columns
+    alone; only the chosen rows of ``columns`` are read.
+    """
+
+    total = sum(rows for _, _, rows in tasks)
+    rate = min(1.0, n_rows / max(total, 1))
+    rng = np.random.default_rng(seed)
+    owed = {}
+    parts = []
+
+    for task in tasks:
+        file, offset, n = task
+        if stratify:
+            groups = _read_chunk(task, list(stratify)).groupby(list(stratify), sort=False).indices
+        else:
+            groups = {(): np.arange(n)}
+        taken = []
+        for key, rows in groups.items():
+            # Carry the fractional share over, so every group gets its exact
+            # proportion (within one row) across the chunks
+            due = owed.get(key, 0.0) + rate * rows.size
+            k = min(int(due), rows.size)
+            owed[key] = due - k
+            taken.append(rng.choice(rows, k, replace=False))
+        positions = np.sort(np.concatenate(taken))
+        parts.append(read_table(file, list(columns)).slice(offset, n).take(positions).to_pandas())
+
+    return pd.concat(parts, ignore_index=True)
+
+
+_WORKER = {}
+
+
+def _load_worker_model(model_path: str):
+    # The forest's arrays are shared through the page cache, read-only
+    _WORKER["model"] = joblib.load(model_path, mmap_mode="r")
+
+
+def _score_chunk(task, features, id_columns):
+    chunk = _read_chunk(task, list(features) + list(id_columns))
+    scores = _WORKER["model"].decision_function(chunk[list(features)])
+    out = chunk[list(id_columns)].copy()
+    out["anomaly_score"] = scores
+    out["is_anomaly"] = scores < 0
+    return out
+
+
+@stage("anomaly_backfill_scoring")
+def run_anomaly_backfill(input_path: str, output_path: str, columns=None, fit_rows: int = 100_000,
+                         chunksize: int = 100_000, workers: int = None, contamination: float = 0.05,
+                         n_estimators: int = 100, random_state: int = 42):
+    """
+    Fit an IsolationForest on a stratified sample of ``fit_rows`` rows and
+    write the ``anomaly_score`` (negative = anomalous) and ``is_anomaly`` of
+    every row of ``input_path`` to ``output_path`` (Arrow), with the row
+    position and the id columns. Returns the run statistics: ``rows_per_sec``
+    covers scoring only, ``total_rows_per_sec`` also the sample and the fit.
+    """
+
+    run_start = time.perf_counter()
+
+    available = dataset_columns(input_path)
+    features = list(columns or [c for c in available if c not in ID_COLUMNS + [TARGET]])
+    id_columns = [c for c in ID_COLUMNS[:1] if c in available]
+    stratify = [c for c in [TARGET] if c in available]
+
+    tasks = _chunk_tasks(input_path, chunksize)
+    total = sum(rows for _, _, rows in tasks)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+
+    start = time.perf_counter()
+    with step("sample", rows_in=total, stratify=stratify) as s:
+        sample = stratified_sample(tasks, fit_rows, features, stratify, random_state)
+        s.rows_out = len(sample)
+    sample_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with step("fit", rows_in=len(sample), trees=n_estimators):
+        model = IsolationForest(n_estimators=n_estimators, contamination=contamination,
+                                random_state=random_state).fit(sample)
+    fit_seconds = time.perf_counter() - start
+    n_fit = len(sample)
+    del sample
+
+    model_dir = tempfile.mkdtemp(prefix="anomaly-backfill-")
+    model_path = joblib.dump(model, os.path.join(model_dir, "isolation_forest.joblib"))[0]
+
+    start = time.perf_counter()
+    rows = anomalies = 0
+    try:
+        with step("score", rows_in=total, chunks=len(tasks), workers=workers) as s:
+            with DatasetWriter(output_path) as writer:
+
+                def write(scored):
+                    nonlocal rows, anomalies
+                    scored.insert(0, "row", np.arange(rows, rows + len(scored), dtype="int64"))
+                    writer.write(scored)
+                    rows += len(scored)
+                    anomalies += int(scored["is_anomaly"].sum())
+
+                if workers == 1:
+                    _load_worker_model(model_path)
+                    for task in tasks:
+                        write(_score_chunk(task, features, id_columns))
+                else:
+                    with ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_load_worker_model,
+                        initargs=(model_path,)
+                    ) as pool:
+                        pending = deque()
+                        for task in tasks:
+                            if len(pending) >= 2 * workers:
+                                write(pending.popleft().result())
+                            pending.append(pool.submit(_score_chunk, task, features, id_columns))
+                        while pending:
+                            write(pending.popleft().result())
+
+            s.rows_out = rows
+            s.wrote(output_path)
+    finally:
+        _WORKER.clear()
+        shutil.rmtree(model_dir, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    total_seconds = time.perf_counter() - run_start
+    stats = {
+        "rows": rows,
+        "anomalies": anomalies,
+        "fit_rows": n_fit,
+        "chunks": len(tasks),
+        "workers": workers,
+        "sample_seconds": sample_seconds,
+        "fit_seconds": fit_seconds,
+        "score_seconds": elapsed,
+        "total_seconds": total_seconds,
+        "rows_per_sec": rows / elapsed if elapsed else None,
+        "total_rows_per_sec": rows / total_seconds if total_seconds else None
+    }
+    log(f"Backfilled {rows} rows ({anomalies} anomalies) on {workers} workers: "
+        f"{stats['rows_per_sec']:.0f} rows/s scoring, {stats['total_rows_per_sec']:.0f} rows/s "
+        f"including the sample ({sample_seconds:.2f}s) and the fit ({fit_seconds:.2f}s)", path=output_path)
+    return stats
+
+
+# -------------------------
+# Streaming mode
+# -------------------------
+# Rows arrive in chunks (a tailed CSV file or any generator of DataFrames)
+# and are scored against an IsolationForest fitted on a sliding reference
+# window of the most recent rows. Refits run on a background thread every
+# ``refit_every`` rows; scoring keeps using the current model until the new
+# one is swapped in. Memory is bounded by the reference window.
+
+
+def tail_csv(path: str, poll_interval: float = 0.5, idle_timeout: float = None,
+             schema=AI4I_SCHEMA):
+    """
+    Yield rows appended to a CSV file as DataFrames, like ``tail -f``.
+
+    Columns declared in ``schema`` are parsed and validated like the ingest
+    does; rows that break it are logged and dropped. Stops after
+    ``idle_timeout`` seconds without new rows (never if None).
+    """
+
+    with open(path, encoding="utf-8-sig") as f:
+        header = f.readline()
+        while not header.endswith("\n"):
+            time.sleep(poll_interval)
+            header += f.readline()
+        columns = next(csv.reader([header]))
+        declared = tuple(c for c in schema if c.name in columns)
+        dtypes = csv_dtypes(declared, strict=False)
+
+        partial = ""
+        idle_since = time.perf_counter()
+
+        while True:
+            lines = f.readlines()
+            if lines:
+                lines[0] = partial + lines[0]
+                partial = "" if lines[-1].endswith("\n") else lines.pop()
+
+            text = "".join(line for line in lines if line.strip())
+            if text:
+                idle_since = time.perf_counter()
+                chunk = pd.read_csv(io.StringIO(text), header=None, names=columns, dtype=dtypes)
+                chunk, rejected = enforce_schema(chunk, declared, on_error="quarantine")
+                if len(rejected):
+                    log(f"Dropped {len(rejected)} rows that violate the schema",
+                        example=rejected[QUARANTINE_REASON].iloc[0])
+                if len(chunk):
+                    yield chunk
+                continue
+
+            if idle_timeout is not None and time.perf_counter() - idle_since > idle_timeout:
+                return
+            time.sleep(poll_interval)
+
+
+class StreamingAnomalyDetector:
+    """
+    IsolationForest scoring over a stream with a sliding reference window.
+
+    The first model is fitted once ``min_fit_rows`` rows have been seen;
+    earlier rows are held back and scored by it. Afterwards a background
+    refit on the latest ``window`` rows is started every ``refit_every``
+    rows, unless one is still running.
+    """
+
+    def __init__(self, feature_columns, window: int = 5000, refit_every: int = 1000,
+                 min_fit_rows: int = 1000, contamination: float = 0.05,
+                 n_estimators: int = 100, random_state: int = 42):
+        self.feature_columns = list(feature_columns)
+        self.refit_every = refit_every
+        self.min_fit_rows = min(min_fit_rows, window)
+        self.params = {
+            "n_estimators": n_estimators,
+            "contamination": contamination,
+            "random_state": random_state
+        }
+
+        # Ring buffer holding the reference window
+        self._window = np.empty((window, len(self.feature_columns)))
+        self._filled = 0
+        self._pos = 0
+
+        self.model = None
+        self.model_version = 0
+        self.refits = 0
+        self.stats = LatencyStats()
+
+        self._since_refit = 0
+        self._pending = []
+        self._refit = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _append(self, X):
+        size = self._window.shape[0]
+        X = X[-size:]
+        end = self._pos + len(X)
+        if end <= size:
+            self._window[self._pos:end] = X
+        else:
+            split = size - self._pos
+            self._window[self._pos:] = X[:split]
+            self._window[:end - size] = X[split:]
+        self._pos = end % size
+        self._filled = min(self._filled + len(X), size)
+
+    def _fit(self, reference):
+        model = IsolationForest(**self.params).fit(reference)
+        with self._lock:
+            self.model = model
+            self.model_version += 1
+            self.refits += 1
+
+    def _maybe_refit(self):
+        if self._refit is not None and not self._refit.done():
+            return
+        if self._refit is not None:
+            self._refit.result()  # surface errors from the last refit
+        reference = self._window[:self._filled].copy()
+        self._refit = self._executor.submit(self._fit, reference)
+        self._since_refit = 0
+
+    def _score(self, X):
+        with self._lock:
+            model, version = self.model, self.model_version
+        scores = model.decision_function(X)
+        return scores, version
+
+    def process(self, chunk: pd.DataFrame, arrived: float = None):
+        """
+        Score one chunk of rows. Returns a DataFrame with ``anomaly_score``
+        (negative = anomalous), ``is_anomaly`` and ``model_version`` per row.
+        Rows held back during warm-up are returned with a later chunk.
+        """
+
+        arrived = time.perf_counter() if arrived is None else arrived
+        X = chunk[self.feature_columns].to_numpy(dtype="float64")
+        self._append(X)
+        self._since_refit += len(X)
+
+        if self.model is None:
+            self._pending.append((arrived, X))
+            if self._filled < self.min_fit_rows:
+                return pd.DataFrame(columns=["anomaly_score", "is_anomaly", "model_version"])
+            self._fit(self._window[:self._filled].copy())
+            self._since_refit = 0
+            arrivals = np.concatenate([np.full(len(x), t) for t, x in self._pending])
+            X = np.vstack([x for _, x in self._pending])
+            self._pending = []
+        else:
+            arrivals = np.full(len(X), arrived)
+            if self._since_refit >= self.refit_every:
+                self._maybe_refit()
+
+        scores, version = self._score(X)
+        self.stats.record_batch(list(time.perf_counter() - arrivals))
+
+        return pd.DataFrame({
+            "anomaly_score": scores,
+            "is_anomaly": scores < 0,
+            "model_version": version
+        })
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+@stage("anomaly_stream")
+def run_streaming_anomaly_detection(chunks, output_path: str, feature_columns=None,
+                                    **detector_options):
+    """
+    Score a stream of DataFrame chunks and append per-row results to
+    ``output_path`` (CSV). Returns the detector statistics.
+    """
+
+    detector = None
+    rows = 0
+    anomalies = 0
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    try:
+        for chunk in chunks:
+            if detector is None:
+                columns = feature_columns or [c for c in chunk.columns if c not in ID_COLUMNS + [TARGET]]
+                detector = StreamingAnomalyDetector(columns, **detector_options)
+
+            scored = detector.process(chunk)
+            if scored.empty:
+                continue
+
+            scored.index = pd.RangeIndex(rows, rows + len(scored), name="row")
+            scored.to_csv(output_path, mode="a", header=rows == 0)
+            rows += len(scored)
+            anomalies += int(scored["is_anomaly"].sum())
+    finally:
+        if detector is not None:
+            detector.close()
+
+    if detector is None:
+        log("No rows received.")
+        return {}
+
+    stats = detector.stats.snapshot()
+    stats.update({"rows": rows, "anomalies": anomalies, "refits": detector.refits})
+    log(f"Streamed {rows} rows ({anomalies} anomalies, {detector.refits} fits): "
+        f"{stats['throughput_rps']:.0f} rows/s, p50 {stats['p50_ms']:.2f} ms, "
+        f"p99 {stats['p99_ms']:.2f} ms per row")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Isolation Forest anomaly detection (RQ4)")
+    parser.add_argument("--input", default="data/processed/abt_partitioned")
+    parser.add_argument("--columns", nargs="+", default=None,
+                        help="feature columns to fit on (default: all)")
+    parser.add_argument("--where", action="append", type=parse_filter, default=[],
+                        help="row filter such as 'Torque [Nm] > 60'; repeatable")
+    parser.add_argument("--stream", action="store_true",
+                        help="score rows as a stream instead of the batch RQ4 table")
+    parser.add_argument("--backfill", action="store_true",
+                        help="score every row in parallel chunks, fitting on a sample")
+    parser.add_argument("--follow", action="store_true",
+                        help="tail --input as a growing CSV file")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="rows per chunk (default: 100 streamed, 100000 backfilled)")
+    parser.add_argument("--window", type=int, default=5000)
+    parser.add_argument("--refit-every", type=int, default=1000)
+    parser.add_argument("--fit-rows", type=int, default=100_000,
+                        help="size of the stratified sample the backfill model is fitted on")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--result-name", default=None,
+                        help="batch result name (default: RQ4_Table1, or RQ4_Table1_filtered "
+                             "with --columns or --where)")
+    parser.add_argument("--output", default=None,
+                        help="default: tables/RQ4_stream_scores.csv or data/processed/anomaly_scores.arrow")
+    args = parser.parse_args()
+
+    if args.backfill:
+        run_anomaly_backfill(
+            args.input, args.output or "data/processed/anomaly_scores.arrow", args.columns,
+            fit_rows=args.fit_rows, chunksize=args.chunksize or 100_000, workers=args.workers
+        )
+    elif not args.stream:
+        run_anomaly_detection(args.input, args.columns, args.where or None, args.result_name)
+    else:
+        if args.follow:
+            source = tail_csv(args.input, idle_timeout=30)
+        else:
+            source = iter_dataset(args.input, chunksize=args.chunksize or 100)
+        run_streaming_anomaly_detection(
+            source, args.output or "tables/RQ4_stream_scores.csv",
+            window=args.window, refit_every=args.refit_every
+        )
@@ -0,0 +1,356 @@
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.evaluation.permutation_importance import permutation_importance
+from src.evaluation.thresholds import evaluate_scores, positive_scores
+from src.io.dataset import bytes_scanned, dataset_columns, read_dataset
+from src.modeling.model_store import fit_or_load
+from src.pipeline.instrumentation import log, stage, step
+from src.reporting.report import RESULTS_DIR, load_result, save_result
+
+
+# -------------------------
+# Parallel experiment grid engine
+# -------------------------
+# An experiment is a grid of (feature set x estimator x params x seed)
+# configurations over one dataset. Every dataset is loaded once in the
+# parent, copied into a shared-memory block and attached by the worker
+# processes as a zero-copy DataFrame. Configurations run concurrently; the
+# available cores are split between the process pool and each estimator's
+# n_jobs. Fits go through the model store, so identical fits are shared
+# (the shared frames keep the dataset's dtypes, so a grid fit has the same
+# data fingerprint as the same fit in train_model). PDM_GRID_CORES caps the
+# cores a grid uses; the local runner sets it to 1, since its stages
+# already run side by side in its own process pool.
+# Configurations may restrict their dataset with row ``filters``, which a
+# partitioned dataset uses to skip the partitions that cannot match.
+
+TARGET = "Machine failure"
+ID_COLUMNS = ["UDI", "Product ID", "Type"]
+
+# Feature set meaning "every column except identifiers and the target"
+ALL_FEATURES = None
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    One grid point: fit ``estimator(**params, random_state=seed)`` on
+    ``features`` of the ``filters`` rows of ``dataset`` and score it on the
+    held-out split, with ``importance_repeats`` rounds of permutation
+    importance if set.
+    """
+
+    experiment: str
+    dataset: str
+    feature_set: str
+    features: tuple
+    estimator: type
+    estimator_name: str
+    params: dict = field(default_factory=dict, hash=False)
+    seed: int = 42
+    test_size: float = 0.2
+    split_seed: int = 42
+    filters: tuple = ()
+    importance_repeats: int = 0
+
+
+def experiment_grid(experiment: str, dataset: str, feature_sets: dict, estimators: dict,
+                    param_grid=({},), seeds=(42,), filters=None, importance_repeats: int = 0):
+    """
+    Expand a grid declaration into configurations.
+
+    ``feature_sets`` maps a label to a column list (or ``ALL_FEATURES``);
+    ``estimators`` maps a label to ``(estimator_class, base_params)``;
+    every entry of ``param_grid`` is merged over the base parameters.
+    ``filters`` are (column, op, value) row filters on the dataset.
+    """
+
+    available = dataset_columns(dataset)
+    filters = tuple(tuple(f) for f in filters or ())
+    configs = []
+
+    for (set_name, features), (est_name, (est, base)), params, seed in itertools.product(
+        feature_sets.items(), estimators.items(), param_grid, seeds
+    ):
+        if features is ALL_FEATURES:
+            features = [c for c in available if c not in ID_COLUMNS + [TARGET]]
+        configs.append(Config(
+            experiment=experiment,
+            dataset=dataset,
+            feature_set=set_name,
+            features=tuple(features),
+            estimator=est,
+            estimator_name=est_name,
+            params={**base, **params},
+            seed=seed,
+            filters=filters,
+            importance_repeats=importance_repeats
+        ))
+
+    return configs
+
+
+def split_cores(n_configs: int, cores: int = None):
+    """
+    ``(workers, n_jobs)`` so that workers * n_jobs does not exceed the cores.
+    """
+
+    cores = cores or os.cpu_count() or 1
+    workers = max(1, min(n_configs, cores))
+    return workers, max(1, cores // workers)
+
+
+# -------------------------
+# Shared-memory datasets
+# -------------------------
+class SharedFrame:
+    """
+    Numeric columns of a dataset in shared memory, one block per dtype
+    with each column stored contiguously, so workers see the same dtypes
+    as the parent.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        groups = {}
+        for col, dtype in df.dtypes.items():
+            groups.setdefault(np.dtype(dtype).str, []).append(col)
+
+        self.shms = []
+        blocks = []
+        for dtype, columns in groups.items():
+            values = df[columns].to_numpy(dtype=dtype).T
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=dtype, buffer=shm.buf)[:] = values
+            self.shms.append(shm)
+            blocks.append((shm.name, dtype, values.shape, columns))
+        self.spec = (blocks, list(df.columns))
+
+    def close(self):
+        for shm in self.shms:
+            shm.close()
+            shm.unlink()
+
+
+def _attach_frame(spec):
+    blocks, columns = spec
+    handles, parts = [], []
+    for name, dtype, shape, block_columns in blocks:
+        shm = shared_memory.SharedMemory(name=name)
+        values = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        handles.append(shm)
+        parts.append(pd.DataFrame(values.T, columns=block_columns, copy=False))
+    return handles, pd.concat(parts, axis=1)[columns]
+
+
+_FRAMES = {}
+_HANDLES = []
+
+
+def _init_worker(specs: dict):
+    # Keep the shared-memory handles alive for the lifetime of the worker
+    for source, spec in specs.items():
+        handles, frame = _attach_frame(spec)
+        _HANDLES.extend(handles)
+        _FRAMES[source] = frame
+
+
+def _run_config(config: Config, n_jobs: int):
+    df = _FRAMES[(config.dataset, config.filters)]
+    X = df[list(config.features)]
+    y = df[TARGET]
+
+    estimator = config.estimator(**config.params, random_state=config.seed)
+    if "n_jobs" in estimator.get_params():
+        estimator.set_params(n_jobs=n_jobs)
+
+    start = time.perf_counter()
+    model, (_, X_test, _, y_test) = fit_or_load(
+        estimator, X, y,
+        test_size=config.test_size, random_state=config.split_seed, stratify=True
+    )
+    metrics, _ = evaluate_scores(y_test, positive_scores(model, X_test))
+    seconds = time.perf_counter() - start
+
+    importances = getattr(model, "feature_importances_", None)
+    permuted = None
+    if config.importance_repeats:
+        # The pool already uses every core
+        permuted = permutation_importance(model, X_test, y_test, config.importance_repeats,
+                                          random_state=config.seed, workers=1)
+    return {
+        "Experiment": config.experiment,
+        "Feature Set": config.feature_set,
+        "Estimator": config.estimator_name,
+        "Params": json.dumps(config.params, sort_keys=True, default=str),
+        "Seed": config.seed,
+        "Features": len(config.features),
+        "Accuracy": metrics["accuracy"],
+        "F1-score": metrics["f1"],
+        "AUC": metrics["auc"],
+        "Cost-optimal Threshold": metrics["operating_point"]["threshold"],
+        "Seconds": seconds,
+        "importances": None if importances is None else dict(zip(config.features, importances)),
+        "permutation_importances": permuted
+    }
+
+
+# -------------------------
+# Grid runner
+# -------------------------
+def run_grid(configs, workers: int = None, cores: int = None):
+    """
+    Run all configurations and return one result dict per configuration,
+    in declaration order.
+    """
+
+    configs = list(configs)
+    cores = cores or int(os.environ.get("PDM_GRID_CORES", 0)) or None
+    default_workers, n_jobs = split_cores(len(configs), cores)
+    workers = workers or default_workers
+
+    # Load each (dataset, filters) source once with only the columns some
+    # configuration uses
+    needed = {}
+    for config in configs:
+        needed.setdefault((config.dataset, config.filters), {TARGET}).update(config.features)
+    with step("load_datasets") as span:
+        frames = {}
+        for (path, filters), cols in needed.items():
+            columns = [c for c in dataset_columns(path) if c in cols]
+            frames[(path, filters)] = read_dataset(path, columns, filters)
+            span.bytes_read += bytes_scanned(path, columns, filters)
+        span.rows_in = span.rows_out = sum(len(df) for df in frames.values())
+
+    start = time.perf_counter()
+    log(f"[grid] {len(configs)} configurations | {workers} workers x n_jobs={n_jobs}")
+
+    with step("run_configs", configs=len(configs), workers=workers, n_jobs=n_jobs):
+        if workers == 1:
+            _FRAMES.update(frames)
+            try:
+                results = [_run_config(config, n_jobs) for config in configs]
+            finally:
+                _FRAMES.clear()
+        else:
+            shared = {source: SharedFrame(df) for source, df in frames.items()}
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=({source: s.spec for source, s in shared.items()},)
+                ) as pool:
+                    results = list(pool.map(_run_config, configs, [n_jobs] * len(configs)))
+            finally:
+                for s in shared.values():
+                    s.close()
+
+    log(f"[grid] finished in {time.perf_counter() - start:.2f}s")
+    return results
+
+
+def results_table(results) -> pd.DataFrame:
+    return pd.DataFrame([
+        {k: v for k, v in r.items() if k not in ("importances", "permutation_importances")}
+        for r in results
+    ])
+
+
+def importances_table(results) -> pd.DataFrame:
+    """
+    Impurity and permutation importances of every configuration, one row
+    per feature, keyed by the configuration's row in ``results_table``.
+    """
+
+    rows = []
+    for i, r in enumerate(results):
+        if r["importances"] is None:
+            continue
+        permuted = r["permutation_importances"]
+        permuted = None if permuted is None else permuted.set_index("Feature")
+        for feature, importance in r["importances"].items():
+            rows.append({
+                "Config": i,
+                "Feature": feature,
+                "Importance": importance,
+                "Permutation Importance": np.nan if permuted is None else permuted["Importance"][feature],
+                "Permutation Std": np.nan if permuted is None else permuted["Std"][feature],
+                "Permutation Scoring": None if permuted is None else permuted["Scoring"][feature]
+            })
+    return pd.DataFrame(rows, columns=[
+        "Config", "Feature", "Importance", "Permutation Importance", "Permutation Std", "Permutation Scoring"
+    ])
+
+
+def load_grid_results(experiment: str, results_dir: str = RESULTS_DIR):
+    """
+    The saved results of ``experiment`` from the consolidated grid, in the
+    shape ``run_grid`` returns them, so the RQ tables are built from the
+    grid's fits instead of fitting again.
+    """
+
+    table = load_result("Experiment_Results", results_dir)
+    importances = load_result("Experiment_Importances", results_dir)
+
+    results = []
+    for i, row in table[table["Experiment"] == experiment].iterrows():
+        r = row.to_dict()
+        rows = importances[importances["Config"] == i]
+        r["importances"] = dict(zip(rows["Feature"], rows["Importance"])) if len(rows) else None
+        r["permutation_importances"] = None
+        if len(rows) and rows["Permutation Importance"].notna().all():
+            r["permutation_importances"] = pd.DataFrame({
+                "Feature": rows["Feature"].to_numpy(),
+                "Importance": rows["Permutation Importance"].to_numpy(),
+                "Std": rows["Permutation Std"].to_numpy(),
+                "Scoring": rows["Permutation Scoring"].to_numpy()
+            })
+        results.append(r)
+
+    if not results:
+        raise ValueError(f"No {experiment} results in {results_dir}; run the experiment_results stage first")
+    return results
+
+
+@stage("experiment_results")
+def run_all_experiments(raw_path: str, abt_path: str, workers: int = None):
+    """
+    Run the RQ1-RQ3 grids in one pool and save the consolidated table with
+    the importances the RQ1-RQ3 tables are built from.
+    """
+
+    from src.evaluation.rq1_single_vs_fused import rq1_grid
+    from src.evaluation.rq2_fusion_strategy import rq2_grid
+    from src.evaluation.rq3_model_comparison import rq3_grid
+
+    configs = rq1_grid(raw_path) + rq2_grid(abt_path) + rq3_grid(abt_path)
+    results = run_grid(configs, workers=workers)
+    table = results_table(results)
+
+    # Written to the workbook by the report stage
+    with step("save_results") as span:
+        span.wrote(save_result("Experiment_Results", table))
+        span.wrote(save_result("Experiment_Importances", importances_table(results)))
+
+    columns = ["Experiment", "Feature Set", "Estimator", "Accuracy", "F1-score", "Seconds"]
+    log("Consolidated results saved", table=table[columns].to_dict("records"))
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the RQ1-RQ3 experiment grids")
+    parser.add_argument("--raw", default="data/raw/ai4i2020_snapshot.arrow")
+    parser.add_argument("--abt", default="data/processed/abt.arrow")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    run_all_experiments(args.raw, args.abt, workers=args.workers)
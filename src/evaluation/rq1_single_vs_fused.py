@@ -1,116 +1,88 @@
-import pandas as pd
-import os
-import matplotlib.pyplot as plt
-
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, f1_score
-
-
-def run_rq1_experiment(input_path: str):
-    print("Running RQ1: Single-sensor vs Fused-sensor comparison (RAW data)")
-
-    # -------------------------
-    # Load RAW operational data
-    # -------------------------
-    df = pd.read_csv(input_path)
-
-    # -------------------------
-    # Drop identifier columns
-    # -------------------------
-    df = df.drop(columns=["UDI", "Product ID", "Type"], errors="ignore")
-
-    y = df["Machine failure"]
-
-    # -------------------------
-    # Model 1: Single Sensor (Torque only)
-    # -------------------------
-    X_single = df[["Torque [Nm]"]]
-
-    Xs_train, Xs_test, ys_train, ys_test = train_test_split(
-        X_single, y, test_size=0.2, random_state=42, stratify=y
-    )
-
-    model_single = RandomForestClassifier(
-        n_estimators=200,
-        random_state=42,
-        class_weight="balanced"
-    )
-
-    model_single.fit(Xs_train, ys_train)
-    ys_pred = model_single.predict(Xs_test)
-
-    acc_single = accuracy_score(ys_test, ys_pred)
-    f1_single = f1_score(ys_test, ys_pred, zero_division=0)
-
-    # -------------------------
-    # Model 2: Fused Sensors (All numeric sensors)
-    # -------------------------
-    X_fused = df.drop("Machine failure", axis=1)
-
-    Xf_train, Xf_test, yf_train, yf_test = train_test_split(
-        X_fused, y, test_size=0.2, random_state=42, stratify=y
-    )
-
-    model_fused = RandomForestClassifier(
-        n_estimators=200,
-        random_state=42,
-        class_weight="balanced"
-    )
-
-    model_fused.fit(Xf_train, yf_train)
-    yf_pred = model_fused.predict(Xf_test)
-
-    acc_fused = accuracy_score(yf_test, yf_pred)
-    f1_fused = f1_score(yf_test, yf_pred, zero_division=0)
-
-    # -------------------------
-    # Save RQ1 table
-    # -------------------------
-    os.makedirs("tables", exist_ok=True)
-
-    rq1_table = pd.DataFrame({
-        "Model": ["Single Sensor (Torque)", "Fused Sensors (All Sensors)"],
-        "Accuracy": [acc_single, acc_fused],
-        "F1-score": [f1_single, f1_fused]
-    })
-
-    rq1_table.to_excel("tables/RQ1_Table1.xlsx", index=False)
-
-    print("RQ1 table saved as tables/RQ1_Table1.xlsx")
-    print(rq1_table)
-
-    # -------------------------
-    # Feature Importance (VALID NOW)
-    # -------------------------
-    importances = model_fused.feature_importances_
-
-    feature_names = X_fused.columns
-    importance_df = pd.DataFrame({
-        "Feature": feature_names,
-        "Importance": importances
-    }).sort_values(by="Importance", ascending=False).head(10)
-
-    # -------------------------
-    # Save RQ1 figure
-    # -------------------------
-    os.makedirs("figures", exist_ok=True)
-
-    plt.figure(figsize=(8, 5))
-    plt.barh(
-        importance_df["Feature"],
-        importance_df["Importance"]
-    )
-    plt.gca().invert_yaxis()
-    plt.title("RQ1: Top 10 Feature Importances (RAW Sensor Fusion)")
-    plt.xlabel("Importance")
-    plt.tight_layout()
-    plt.savefig("figures/RQ1_Fig1.pdf")
-    plt.close()
-
-    print("RQ1 figure saved as figures/RQ1_Fig1.pdf")
-    print(importance_df)
-
-
-if __name__ == "__main__":
-    run_rq1_experiment("data/raw/ai4i2020_snapshot.csv")
+import argparse
+
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+
+from src.evaluation.experiment_grid import ALL_FEATURES, experiment_grid, load_grid_results, run_grid
+from src.io.partitioned import parse_filter
+from src.pipeline.instrumentation import log, stage, step
+from src.reporting.report import save_result
+
+
+def rq1_grid(input_path: str, filters=None):
+    # Single sensor (torque only) vs all sensors of the RAW operational data
+    return experiment_grid(
+        "RQ1", input_path,
+        feature_sets={
+            "Single Sensor (Torque)": ["Torque [Nm]"],
+            "Fused Sensors (All Sensors)": ALL_FEATURES
+        },
+        estimators={
+            "RandomForest": (RandomForestClassifier, {"n_estimators": 200, "class_weight": "balanced"})
+        },
+        filters=filters,
+        importance_repeats=5
+    )
+
+
+@stage("rq1_single_vs_fused")
+def run_rq1_experiment(input_path: str = None, filters=None, grid_dir: str = None):
+    """
+    ``filters`` restricts the comparison to a slice of the operational data,
+    e.g. ``[("Type", "==", "L")]`` for one machine type. With ``grid_dir``,
+    the tables are built from the RQ1 results the experiment_results stage
+    saved there instead of running the grid again.
+    """
+
+    log("Running RQ1: Single-sensor vs Fused-sensor comparison (RAW data)", filters=filters)
+
+    if grid_dir is not None:
+        results = load_grid_results("RQ1", grid_dir)
+    else:
+        results = run_grid(rq1_grid(input_path, filters))
+    fused = results[1]
+
+    # -------------------------
+    # RQ1 table
+    # -------------------------
+    rq1_table = pd.DataFrame({
+        "Model": [r["Feature Set"] for r in results],
+        "Accuracy": [r["Accuracy"] for r in results],
+        "F1-score": [r["F1-score"] for r in results]
+    })
+
+    # -------------------------
+    # Feature Importance (VALID NOW)
+    # -------------------------
+    # Impurity importances next to the drop in a held-out score when the
+    # feature is permuted, which is not biased toward many-valued features
+    permuted = fused["permutation_importances"].set_index("Feature")
+    importance_df = pd.DataFrame({
+        "Feature": list(fused["importances"]),
+        "Importance": list(fused["importances"].values())
+    })
+    importance_df["Permutation Importance"] = importance_df["Feature"].map(permuted["Importance"])
+    importance_df["Permutation Std"] = importance_df["Feature"].map(permuted["Std"])
+    importance_df["Permutation Scoring"] = permuted["Scoring"].iloc[0]
+    importance_df = importance_df.sort_values(by="Permutation Importance", ascending=False, kind="stable")
+
+    # Tables and figures are rendered by the report stage
+    with step("save_results") as s:
+        s.wrote(save_result("RQ1_Table1", rq1_table))
+        s.wrote(save_result("RQ1_Importances", importance_df))
+
+    log("RQ1 results saved", table=rq1_table.to_dict("records"),
+        importances=dict(zip(importance_df["Feature"][:10], importance_df["Importance"][:10].round(4))),
+        permutation_importances=dict(zip(importance_df["Feature"][:10],
+                                         importance_df["Permutation Importance"][:10].round(4))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RQ1: single-sensor vs fused-sensor comparison")
+    parser.add_argument("--input", default="data/raw/ai4i2020_partitioned")
+    parser.add_argument("--where", action="append", type=parse_filter, default=[],
+                        help="row filter such as 'Type == L'; repeatable")
+    args = parser.parse_args()
+
+    run_rq1_experiment(args.input, args.where or None)
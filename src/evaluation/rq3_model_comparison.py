@@ -1,95 +1,195 @@
-import pandas as pd
-import os
-import matplotlib.pyplot as plt
-
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, f1_score
-
-
-def run_rq3_experiment(input_path: str):
-    print("Running RQ3: Model capacity comparison")
-
-    df = pd.read_csv(input_path)
-
-    y = df["Machine failure"]
-
-    # -------------------------
-    # Model 1: Random Forest (Reduced feature set)
-    # -------------------------
-    reduced_features = [
-        "Air temperature [K]",
-        "Process temperature [K]",
-        "Rotational speed [rpm]",
-        "Torque [Nm]",
-        "Tool wear [min]"
-    ]
-
-    X_reduced = df[reduced_features]
-
-    Xr_train, Xr_test, yr_train, yr_test = train_test_split(
-        X_reduced, y, test_size=0.2, random_state=42, stratify=y
-    )
-
-    rf_reduced = RandomForestClassifier(
-        n_estimators=100,
-        random_state=42,
-        class_weight="balanced"
-    )
-
-    rf_reduced.fit(Xr_train, yr_train)
-    yr_pred = rf_reduced.predict(Xr_test)
-
-    acc_reduced = accuracy_score(yr_test, yr_pred)
-    f1_reduced = f1_score(yr_test, yr_pred, zero_division=0)
-
-    # -------------------------
-    # Model 2: Random Forest (Full feature set)
-    # -------------------------
-    X_full = df.drop("Machine failure", axis=1)
-
-    Xf_train, Xf_test, yf_train, yf_test = train_test_split(
-        X_full, y, test_size=0.2, random_state=42, stratify=y
-    )
-
-    rf_full = RandomForestClassifier(
-        n_estimators=100,
-        random_state=42,
-        class_weight="balanced"
-    )
-
-    rf_full.fit(Xf_train, yf_train)
-    yf_pred = rf_full.predict(Xf_test)
-
-    acc_full = accuracy_score(yf_test, yf_pred)
-    f1_full = f1_score(yf_test, yf_pred, zero_division=0)
-
-    # -------------------------
-    # Create figure
-    # -------------------------
-    os.makedirs("figures", exist_ok=True)
-
-    comparison_df = pd.DataFrame({
-        "Model": ["RF (Reduced Features)", "RF (Full Feature Set)"],
-        "Accuracy": [acc_reduced, acc_full],
-        "F1-score": [f1_reduced, f1_full]
-    })
-
-    comparison_df.set_index("Model").plot(
-        kind="bar",
-        figsize=(7, 5)
-    )
-
-    plt.title("RQ3: Effect of Model Capacity on Performance")
-    plt.ylabel("Score")
-    plt.xticks(rotation=0)
-    plt.tight_layout()
-    plt.savefig("figures/RQ3_Fig1.pdf")
-    plt.close()
-
-    print("RQ3 figure saved as figures/RQ3_Fig1.pdf")
-    print(comparison_df)
-
-
-if __name__ == "__main__":
-    run_rq3_experiment("data/processed/abt.csv")
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+from src.evaluation.experiment_grid import (
+    ALL_FEATURES, ID_COLUMNS, TARGET, experiment_grid, load_grid_results, run_grid
+)
+from src.evaluation.thresholds import evaluate_scores
+from src.io.dataset import read_dataset
+from src.pipeline.instrumentation import log, stage, step
+from src.reporting.report import save_result
+
+REDUCED_FEATURES = [
+    "Air temperature [K]",
+    "Process temperature [K]",
+    "Rotational speed [rpm]",
+    "Torque [Nm]",
+    "Tool wear [min]"
+]
+
+# Forest sizes at which the capacity curve is evaluated
+CAPACITY_SIZES = (10, 20, 50, 100, 200, 500, 1000)
+
+
+def rq3_grid(input_path: str):
+    # Random Forest on the reduced vs the full feature set
+    return experiment_grid(
+        "RQ3", input_path,
+        feature_sets={
+            "RF (Reduced Features)": REDUCED_FEATURES,
+            "RF (Full Feature Set)": ALL_FEATURES
+        },
+        estimators={
+            "RandomForest": (RandomForestClassifier, {"n_estimators": 100, "class_weight": "balanced"})
+        }
+    )
+
+
+@stage("rq3_model_comparison")
+def run_rq3_experiment(input_path: str = None, grid_dir: str = None):
+    """
+    With ``grid_dir``, the table is built from the RQ3 results the
+    experiment_results stage saved there instead of running the grid again.
+    """
+
+    log("Running RQ3: Model capacity comparison")
+
+    if grid_dir is not None:
+        results = load_grid_results("RQ3", grid_dir)
+    else:
+        results = run_grid(rq3_grid(input_path))
+    scores = {
+        "Accuracy": [r["Accuracy"] for r in results],
+        "F1-score": [r["F1-score"] for r in results]
+    }
+
+    # -------------------------
+    # Save results (the figure is rendered by the report stage)
+    # -------------------------
+    comparison_df = pd.DataFrame({
+        "Model": [r["Feature Set"] for r in results],
+        **scores
+    })
+
+    with step("save_results") as s:
+        s.wrote(save_result("RQ3_Capacity", comparison_df))
+
+    log("RQ3 results saved", table=comparison_df.to_dict("records"))
+
+
+# -------------------------
+# Capacity curve
+# -------------------------
+# A single forest is grown through increasing sizes with warm_start, so
+# each step only fits the new trees. Test-set probabilities are kept as a
+# running sum of per-tree predictions, so each step also only predicts
+# with the new trees. The out-of-bag votes are kept the same way: each new
+# tree adds its probabilities to the training rows outside its bootstrap
+# sample (``estimators_samples_``), which gives sklearn's OOB accuracy
+# without re-scoring every tree at every size as ``oob_score=True`` does.
+# Fit and scoring time are reported separately. Class weights are computed
+# per bootstrap sample ("balanced_subsample"): sklearn draws bootstrap
+# samples in proportion to the sample weights, so with "balanced" nearly
+# every failure row is in every sample and never gets an out-of-bag
+# prediction.
+def capacity_curve(X: pd.DataFrame, y: pd.Series, sizes=CAPACITY_SIZES,
+                   random_state: int = 42, n_jobs: int = -1) -> pd.DataFrame:
+    """
+    Metrics of one warm-started forest at each size in ``sizes``, with the
+    cumulative fit and scoring time needed to reach it.
+    """
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    X_fit = np.ascontiguousarray(X_train, dtype=np.float32)
+    X_eval = np.ascontiguousarray(X_test, dtype=np.float32)
+    y_fit = np.asarray(y_train)
+
+    model = RandomForestClassifier(
+        warm_start=True,
+        class_weight="balanced_subsample",
+        random_state=random_state,
+        n_jobs=n_jobs
+    )
+
+    rows = []
+    proba_sum = None
+    oob_sum = None
+    fit_seconds = 0.0
+    score_seconds = 0.0
+
+    for size in sorted(set(sizes)):
+        n_before = len(getattr(model, "estimators_", []))
+        model.set_params(n_estimators=size)
+
+        start = time.perf_counter()
+        with warnings.catch_warnings():
+            # Every step refits on the same training data, which is the case
+            # this warning does not apply to
+            warnings.filterwarnings("ignore", message="class_weight presets")
+            model.fit(X_train, y_train)
+        fit_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        if proba_sum is None:
+            proba_sum = np.zeros((len(X_eval), model.n_classes_))
+            oob_sum = np.zeros((len(X_fit), model.n_classes_))
+        for tree, in_bag in zip(model.estimators_[n_before:], model.estimators_samples_[n_before:]):
+            proba_sum += tree.predict_proba(X_eval, check_input=False)
+            oob = np.ones(len(X_fit), dtype=bool)
+            oob[in_bag] = False
+            oob_sum[oob] += tree.predict_proba(X_fit[oob], check_input=False)
+
+        # Rows that were never out of bag vote for the first class, as in sklearn
+        oob_accuracy = float(np.mean(model.classes_[oob_sum.argmax(axis=1)] == y_fit))
+        proba = proba_sum / size
+        scores = proba[:, list(model.classes_).index(1)] if 1 in model.classes_ else np.zeros(len(proba))
+        metrics, _ = evaluate_scores(y_test, scores)
+        score_seconds += time.perf_counter() - start
+
+        rows.append({
+            "Trees": size,
+            "Fit Seconds": fit_seconds,
+            "Score Seconds": score_seconds,
+            "OOB Accuracy": oob_accuracy,
+            "Accuracy": metrics["accuracy"],
+            "F1-score": metrics["f1"],
+            "AUC": metrics["auc"]
+        })
+
+    return pd.DataFrame(rows)
+
+
+@stage("rq3_capacity_curve")
+def run_capacity_curve(input_path: str, sizes=CAPACITY_SIZES):
+    log("Running RQ3: Capacity curve", sizes=list(sizes))
+
+    with step("read") as s:
+        df = read_dataset(input_path)
+        s.read(input_path)
+        s.rows_in = s.rows_out = len(df)
+
+    X = df.drop(columns=[c for c in [TARGET, *ID_COLUMNS] if c in df.columns])
+    y = df[TARGET].astype("int64")
+
+    with step("grow_forest", rows_in=len(X)) as s:
+        curve = capacity_curve(X, y, sizes)
+        s.rows_out = len(curve)
+
+    with step("save_results") as s:
+        s.wrote(save_result("RQ3_Capacity_Curve", curve))
+
+    log("RQ3 capacity curve saved", curve=curve.round(4).to_dict("records"))
+    return curve
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RQ3 model capacity comparison")
+    parser.add_argument("--input", default="data/processed/abt.arrow")
+    parser.add_argument("--capacity-curve", action="store_true",
+                        help="grow one forest through --sizes trees instead")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(CAPACITY_SIZES))
+    args = parser.parse_args()
+
+    if args.capacity_curve:
+        run_capacity_curve(args.input, args.sizes)
+    else:
+        run_rq3_experiment(args.input)
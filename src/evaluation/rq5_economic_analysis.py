@@ -1,83 +1,266 @@
-import pandas as pd
-import os
-import matplotlib.pyplot as plt
-
-
-def run_rq5_analysis(input_path: str):
-    print("Running RQ5: Economic and reliability analysis")
-
-    df = pd.read_csv(input_path)
-
-    # -------------------------
-    # Basic assumptions
-    # -------------------------
-    cost_per_failure = 1000  # Euros
-    detection_rate = 0.3     # Assume 30% of failures are avoided
-
-    # -------------------------
-    # Failure statistics
-    # -------------------------
-    total_failures = df["Machine failure"].sum()
-
-    failures_avoided = int(total_failures * detection_rate)
-    failures_remaining = total_failures - failures_avoided
-
-    cost_before = total_failures * cost_per_failure
-    cost_after = failures_remaining * cost_per_failure
-    cost_saved = cost_before - cost_after
-
-    # -------------------------
-    # Save table
-    # -------------------------
-    os.makedirs("tables", exist_ok=True)
-
-    rq5_table = pd.DataFrame({
-        "Metric": [
-            "Total Failures",
-            "Failures Avoided",
-            "Failures Remaining",
-            "Cost Before PdM (€)",
-            "Cost After PdM (€)",
-            "Estimated Cost Savings (€)"
-        ],
-        "Value": [
-            total_failures,
-            failures_avoided,
-            failures_remaining,
-            cost_before,
-            cost_after,
-            cost_saved
-        ]
-    })
-
-    rq5_table.to_excel("tables/RQ5_Table1.xlsx", index=False)
-
-    # -------------------------
-    # Save figure
-    # -------------------------
-    os.makedirs("figures", exist_ok=True)
-
-    cost_df = pd.DataFrame({
-        "Scenario": ["Before PdM", "After PdM"],
-        "Cost (€)": [cost_before, cost_after]
-    })
-
-    cost_df.set_index("Scenario").plot(
-        kind="bar",
-        figsize=(6, 4),
-        legend=False
-    )
-
-    plt.title("RQ5: Estimated Maintenance Cost Reduction")
-    plt.ylabel("Cost (€)")
-    plt.xticks(rotation=0)
-    plt.tight_layout()
-    plt.savefig("figures/RQ5_Fig1.pdf")
-    plt.close()
-
-    print("RQ5 figure and table saved successfully.")
-    print(rq5_table)
-
-
-if __name__ == "__main__":
-    run_rq5_analysis("data/raw/ai4i2020_snapshot.csv")
\ No newline at end of file
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from src.data_cleaning.quantile_sketch import make_quantile_summary
+from src.io.dataset import bytes_scanned, read_dataset
+from src.io.partitioned import parse_filter
+from src.pipeline.instrumentation import log, stage, step
+from src.reporting.report import result_path, save_result
+
+
+# -------------------------
+# Monte Carlo cost model
+# -------------------------
+# A scenario is one plausible repeat of the observed period:
+#   - failures per mode ~ Poisson(observed count)
+#   - the model's detection rate ~ Beta(TP + 1, FN + 1) and its false-alarm
+#     rate ~ Beta(FP + 1, TN + 1), from its test-set confusion matrix
+#   - the cost of a failure of each mode, and of a false alarm, is drawn
+#     from a lognormal around the assumed median
+# A detected failure is repaired as planned maintenance at a fraction of
+# its breakdown cost; every false alarm costs one inspection. Scenarios are
+# drawn in vectorized chunks, and only running sums and quantile summaries
+# are kept, so memory does not grow with the number of scenarios. Without
+# failures in the test split (TP + FN = 0) the detection rate would be the
+# Beta(1, 1) prior alone, so no savings are estimated: the tables hold NaN
+# and the assumptions table says why.
+
+# Breakdown cost per failure (median €, lognormal sigma). Failures with
+# several modes count as their most expensive mode; failures without a
+# recorded mode as "Other".
+FAILURE_COSTS = {
+    "OSF": (2000, 0.6),  # overstrain: spindle/tool damage
+    "PWF": (1500, 0.5),  # power failure
+    "HDF": (1200, 0.5),  # heat dissipation failure
+    "RNF": (1000, 0.8),  # random failure
+    "Other": (1000, 0.5),
+    "TWF": (800, 0.4),   # tool wear failure: tool replacement
+}
+FALSE_ALARM_COST = (150, 0.5)   # inspection without a finding
+PLANNED_REPAIR_SHARE = 0.2      # planned repair cost relative to a breakdown
+
+QUANTILES = {"CI 2.5%": 0.025, "Median": 0.5, "CI 97.5%": 0.975}
+METRICS = [
+    "Total Failures", "Failures Avoided", "Failures Remaining", "False Alarms",
+    "Cost Before PdM (€)", "Cost After PdM (€)", "Estimated Cost Savings (€)"
+]
+
+
+def failure_counts(df: pd.DataFrame) -> dict:
+    """
+    Failures per mode, each failure counted once under its most expensive mode.
+    """
+
+    failures = df[df["Machine failure"] == 1]
+    remaining = np.ones(len(failures), dtype=bool)
+    counts = {}
+
+    for mode in FAILURE_COSTS:
+        if mode == "Other":
+            continue
+        hit = remaining & (failures[mode].to_numpy() == 1)
+        counts[mode] = int(hit.sum())
+        remaining &= ~hit
+
+    counts["Other"] = int(remaining.sum())
+    return {mode: counts[mode] for mode in FAILURE_COSTS}
+
+
+def simulate_scenarios(counts: dict, confusion: dict, n_negatives: int, n_scenarios: int,
+                       chunk_size: int = None, seed: int = 42):
+    """
+    Yield per-scenario metric arrays (one dict per chunk of scenarios).
+    """
+
+    rng = np.random.default_rng(seed)
+    chunk_size = chunk_size or n_scenarios
+
+    lam = np.array([counts[m] for m in FAILURE_COSTS], dtype="float64")
+    mu = np.log([FAILURE_COSTS[m][0] for m in FAILURE_COSTS])
+    sigma = np.array([FAILURE_COSTS[m][1] for m in FAILURE_COSTS])
+
+    for start in range(0, n_scenarios, chunk_size):
+        n = min(chunk_size, n_scenarios - start)
+
+        # Poisson thinning: detected and missed failures are independent
+        # Poisson counts, which is faster than a binomial split of the total
+        detection = rng.beta(confusion["TP"] + 1, confusion["FN"] + 1, size=(n, 1))
+        avoided = rng.poisson(lam * detection)
+        failures = avoided + rng.poisson(lam * (1 - detection))
+        cost = rng.lognormal(mu, sigma, size=(n, lam.size))
+
+        false_alarm_rate = rng.beta(confusion["FP"] + 1, confusion["TN"] + 1, size=n)
+        false_alarms = rng.binomial(n_negatives, false_alarm_rate)
+        false_alarm_cost = rng.lognormal(np.log(FALSE_ALARM_COST[0]), FALSE_ALARM_COST[1], size=n)
+
+        before = (failures * cost).sum(axis=1)
+        after = (
+            ((failures - avoided) + PLANNED_REPAIR_SHARE * avoided) * cost
+        ).sum(axis=1) + false_alarms * false_alarm_cost
+
+        total = failures.sum(axis=1)
+        total_avoided = avoided.sum(axis=1)
+        yield {
+            "Total Failures": total,
+            "Failures Avoided": total_avoided,
+            "Failures Remaining": total - total_avoided,
+            "False Alarms": false_alarms,
+            "Cost Before PdM (€)": before,
+            "Cost After PdM (€)": after,
+            "Estimated Cost Savings (€)": before - after
+        }
+
+
+def summarize_scenarios(chunks, quantile_method: str = "exact") -> dict:
+    """
+    Mean, Monte Carlo standard error and quantile summary per metric.
+    """
+
+    sums, squares, summaries = {}, {}, {}
+    positive = 0
+    n = 0
+
+    for chunk in chunks:
+        n += len(chunk["Total Failures"])
+        positive += int((chunk["Estimated Cost Savings (€)"] > 0).sum())
+        for metric, values in chunk.items():
+            values = values.astype("float64")
+            sums[metric] = sums.get(metric, 0.0) + values.sum()
+            squares[metric] = squares.get(metric, 0.0) + (values ** 2).sum()
+            summaries.setdefault(metric, make_quantile_summary(quantile_method, k=2000)).update(values)
+
+    stats = {}
+    for metric in sums:
+        mean = sums[metric] / n
+        std = np.sqrt(max(squares[metric] / n - mean ** 2, 0.0))
+        stats[metric] = {"mean": mean, "std": std, "se": std / np.sqrt(n), "summary": summaries[metric]}
+    stats["n"] = n
+    stats["p_positive"] = positive / n
+    return stats
+
+
+@stage("rq5_economic_analysis")
+def run_rq5_analysis(input_path: str, confusion_path: str = result_path("Model_Confusion"),
+                     n_scenarios: int = 1_000_000, chunk_size: int = 250_000, seed: int = 42,
+                     filters=None):
+    """
+    ``filters`` restricts the observed failure counts to a slice of the
+    operational data, e.g. ``[("Type", "==", "H")]``.
+    """
+
+    log("Running RQ5: Economic and reliability analysis", filters=filters)
+
+    columns = ["Machine failure", "TWF", "HDF", "PWF", "OSF", "RNF"]
+    with step("read") as s:
+        df = read_dataset(input_path, columns, filters)
+        s.bytes_read += bytes_scanned(input_path, columns, filters)
+        s.rows_in = s.rows_out = len(df)
+
+    # -------------------------
+    # Observed failures and model quality
+    # -------------------------
+    counts = failure_counts(df)
+    n_negatives = int((df["Machine failure"] == 0).sum())
+    with step("read_confusion") as s:
+        confusion = read_dataset(confusion_path).iloc[0]
+        confusion = {k: int(confusion[k]) for k in ["TN", "FP", "FN", "TP"]}
+        s.read(confusion_path)
+    log("Cost model inputs", failures=counts, confusion=confusion)
+
+    estimable = confusion["TP"] + confusion["FN"] > 0
+    if not estimable:
+        message = ("The model's test split has no failures (TP + FN = 0), so its detection "
+                   "rate is unknown; cost savings are not estimated")
+        warnings.warn(message)
+        log(message)
+
+    # -------------------------
+    # Simulate
+    # -------------------------
+    # Bounded memory needs the quantile sketch; one chunk can be exact
+    method = "exact" if chunk_size is None or chunk_size >= n_scenarios else "sketch"
+    percentiles = np.arange(1, 100)
+
+    start = time.perf_counter()
+    if estimable:
+        with step("simulate", scenarios=n_scenarios, chunk_size=chunk_size, quantiles=method) as s:
+            stats = summarize_scenarios(
+                simulate_scenarios(counts, confusion, n_negatives, n_scenarios, chunk_size, seed),
+                method
+            )
+            s.rows_out = n_scenarios
+        means = {metric: stats[metric]["mean"] for metric in METRICS}
+        quantiles = {
+            metric: stats[metric]["summary"].quantile(list(QUANTILES.values())) for metric in METRICS
+        }
+        p_positive = stats["p_positive"]
+        savings_quantiles = stats["Estimated Cost Savings (€)"]["summary"].quantile(percentiles / 100)
+    else:
+        means = {metric: np.nan for metric in METRICS}
+        quantiles = {metric: [np.nan] * len(QUANTILES) for metric in METRICS}
+        p_positive = np.nan
+        savings_quantiles = np.full(percentiles.size, np.nan)
+    elapsed = time.perf_counter() - start
+
+    # -------------------------
+    # Save results (tables and figures are rendered by the report stage)
+    # -------------------------
+    rq5_table = pd.DataFrame([
+        {"Metric": metric, "Mean": means[metric], **dict(zip(QUANTILES, quantiles[metric]))}
+        for metric in METRICS
+    ])
+    rq5_table.loc[len(rq5_table)] = {"Metric": "P(Savings > 0)", "Mean": p_positive}
+
+    assumptions = pd.DataFrame([
+        {"Failure Mode": mode, "Observed Failures": counts[mode],
+         "Median Cost (€)": median, "Cost Sigma (log)": sigma}
+        for mode, (median, sigma) in FAILURE_COSTS.items()
+    ] + [{"Failure Mode": "False alarm", "Observed Failures": confusion["FP"],
+          "Median Cost (€)": FALSE_ALARM_COST[0], "Cost Sigma (log)": FALSE_ALARM_COST[1]},
+         {"Failure Mode": "Detected by model", "Observed Failures": confusion["TP"],
+          "Note": "Model_Confusion is the test-set confusion at the model's cost-optimal "
+                  f"threshold, not at 0.5; TP + FN = {confusion['TP'] + confusion['FN']} test failures" + (
+                      "" if estimable else "; no detection rate, savings not estimated (NaN)")}])
+
+    cost_df = pd.DataFrame({
+        "Scenario": ["Before PdM", "After PdM"],
+        "Cost (€)": [means["Cost Before PdM (€)"], means["Cost After PdM (€)"]]
+    })
+
+    savings_df = pd.DataFrame({
+        "Percentile": percentiles,
+        "Savings (€)": savings_quantiles
+    })
+
+    with step("save_results") as s:
+        s.wrote(save_result("RQ5_Table1", rq5_table))
+        s.wrote(save_result("RQ5_Assumptions", assumptions))
+        s.wrote(save_result("RQ5_Costs", cost_df))
+        s.wrote(save_result("RQ5_Savings_Quantiles", savings_df))
+
+    if estimable:
+        savings = stats["Estimated Cost Savings (€)"]
+        log(f"RQ5 simulated {n_scenarios} scenarios in {elapsed:.2f}s",
+            mean_savings=round(savings["mean"], 2), se=round(savings["se"], 2),
+            ci_95=[round(float(v), 2) for v in savings["summary"].quantile([0.025, 0.975])],
+            p_positive=round(stats["p_positive"], 4))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RQ5 Monte Carlo economic analysis")
+    parser.add_argument("--input", default="data/raw/ai4i2020_partitioned")
+    parser.add_argument("--confusion", default=result_path("Model_Confusion"))
+    parser.add_argument("--scenarios", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=250_000,
+                        help="scenarios per vectorized batch (bounds memory)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--where", action="append", type=parse_filter, default=[],
+                        help="row filter such as 'Type == H'; repeatable")
+    args = parser.parse_args()
+
+    run_rq5_analysis(args.input, args.confusion, args.scenarios, args.chunk_size, args.seed,
+                     args.where or None)
@@ -0,0 +1,164 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.evaluation.rq5_economic_analysis import FAILURE_COSTS, FALSE_ALARM_COST, PLANNED_REPAIR_SHARE
+
+
+# -------------------------
+# Single-pass all-threshold evaluation
+# -------------------------
+# The scores are sorted once (descending). Predicting "failure" for every
+# row scoring at or above a threshold then makes the true and false
+# positives at each distinct threshold a cumulative sum over the sorted
+# labels, so the confusion matrix at every threshold, and the ROC, PR, F1
+# and cost curves built from it, cost O(n log n) in total instead of one
+# metric pass per threshold.
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """
+    Cost (€) of each outcome of an alarm decision.
+    """
+
+    false_alarm: float
+    missed_failure: float
+    detected_failure: float
+
+
+# Point estimates of the RQ5 cost assumptions: the median breakdown cost
+# averaged over the failure modes, and the planned repair share of it
+_BREAKDOWN = float(np.mean([median for median, _ in FAILURE_COSTS.values()]))
+DEFAULT_COSTS = CostModel(
+    false_alarm=FALSE_ALARM_COST[0],
+    missed_failure=_BREAKDOWN,
+    detected_failure=PLANNED_REPAIR_SHARE * _BREAKDOWN
+)
+
+
+def positive_scores(model, X) -> np.ndarray:
+    """
+    Failure scores of ``model`` on ``X``: the probability of class 1, zeros
+    if the model never saw a failure, or the 0/1 prediction for models
+    without ``predict_proba``.
+    """
+
+    classes = list(model.classes_)
+    if not hasattr(model, "predict_proba"):
+        return (np.asarray(model.predict(X)) == 1).astype("float64")
+    if 1 not in classes:
+        return np.zeros(len(X))
+    return np.asarray(model.predict_proba(X))[:, classes.index(1)]
+
+
+def threshold_curve(y_true, scores, costs: CostModel = DEFAULT_COSTS) -> pd.DataFrame:
+    """
+    Confusion matrix and metrics at every distinct score, predicting a
+    failure when ``score >= Threshold``. Thresholds descend; the first row
+    (Threshold = inf) predicts no failures at all.
+    """
+
+    y_true = np.asarray(y_true) == 1
+    scores = np.asarray(scores, dtype="float64")
+
+    order = np.argsort(-scores, kind="stable")
+    scores = scores[order]
+    hits = y_true[order]
+
+    # Last position of each run of equal scores
+    ends = np.r_[np.flatnonzero(np.diff(scores)), scores.size - 1] if scores.size else np.array([], int)
+    tp = np.r_[0, np.cumsum(hits)[ends]]
+    fp = np.r_[0, ends + 1 - tp[1:]]
+
+    positives = int(y_true.sum())
+    negatives = y_true.size - positives
+    fn = positives - tp
+    tn = negatives - fp
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        curve = pd.DataFrame({
+            "Threshold": np.r_[np.inf, scores[ends]],
+            "TP": tp, "FP": fp, "FN": fn, "TN": tn,
+            "TPR": tp / positives if positives else np.full(tp.size, np.nan),
+            "FPR": fp / negatives if negatives else np.full(fp.size, np.nan),
+            "Precision": np.where(tp + fp > 0, tp / (tp + fp), np.nan),
+            "F1-score": np.where(tp > 0, 2 * tp / (2 * tp + fp + fn), 0.0),
+            "Accuracy": (tp + tn) / y_true.size if y_true.size else np.nan,
+            "Cost": fp * costs.false_alarm + fn * costs.missed_failure + tp * costs.detected_failure
+        })
+    curve["Recall"] = curve["TPR"]
+    return curve
+
+
+def roc_auc(curve: pd.DataFrame) -> float:
+    """
+    Area under the ROC curve (trapezoidal); NaN unless both classes occur.
+    """
+
+    if curve["TPR"].isna().any() or curve["FPR"].isna().any():
+        return np.nan
+    return float(np.trapezoid(curve["TPR"], curve["FPR"]))
+
+
+def average_precision(curve: pd.DataFrame) -> float:
+    """
+    Precision averaged over the recall steps; NaN without positives.
+    """
+
+    if curve["TPR"].isna().any():
+        return np.nan
+    recall_steps = np.diff(curve["Recall"].to_numpy())
+    return float((recall_steps * curve["Precision"].to_numpy()[1:]).sum())
+
+
+def at_threshold(curve: pd.DataFrame, threshold: float = 0.5) -> dict:
+    """
+    Curve row for predicting a failure when ``score > threshold``. At 0.5
+    this matches ``predict`` of a binary classifier (ties go to class 0).
+    """
+
+    # Rows with Threshold > threshold are a prefix of the descending curve
+    above = np.searchsorted(-curve["Threshold"].to_numpy(), -threshold, side="left")
+    return curve.iloc[max(above - 1, 0)].to_dict()
+
+
+def cost_optimal(curve: pd.DataFrame) -> dict:
+    """
+    Lowest-cost curve row (the highest threshold among ties). Its
+    ``Threshold`` is applied as ``score >= Threshold``.
+    """
+
+    return curve.iloc[int(curve["Cost"].to_numpy().argmin())].to_dict()
+
+
+def evaluate_scores(y_true, scores, threshold: float = 0.5,
+                    costs: CostModel = DEFAULT_COSTS):
+    """
+    Metrics at ``threshold``, threshold-free summaries and the cost-optimal
+    operating point, from a single sort of the scores. Without positives
+    the operating point's threshold is NaN: never alarming is trivially
+    optimal then and says nothing about the model.
+
+    Returns ``(metrics, curve)``.
+    """
+
+    curve = threshold_curve(y_true, scores, costs)
+    point = at_threshold(curve, threshold)
+    best = cost_optimal(curve)
+    positives = int(curve["FN"].iloc[0]) if len(curve) else 0
+    metrics = {
+        "accuracy": point["Accuracy"],
+        "f1": point["F1-score"],
+        "auc": roc_auc(curve),
+        "average_precision": average_precision(curve),
+        "confusion": {k: int(point[k]) for k in ["TN", "FP", "FN", "TP"]},
+        "operating_point": {
+            "threshold": float(best["Threshold"]) if positives else np.nan,
+            "cost": float(best["Cost"]),
+            "f1": float(best["F1-score"]),
+            "confusion": {k: int(best[k]) for k in ["TN", "FP", "FN", "TP"]}
+        }
+    }
+    return metrics, curve
@@ -1,52 +1,390 @@
-import pandas as pd
-import os
-from scipy.stats import zscore
-
-def build_features(input_path: str, output_path: str):
-    print("Loading cleaned data from:", input_path)
-
-    df = pd.read_csv(input_path)
-    print("Data loaded. Shape:", df.shape)
-
-    df = df.sort_values(by="UDI").reset_index(drop=True)
-
-    df["Torque_roll_mean"] = df["Torque [Nm]"].rolling(window=5).mean()
-    df["Speed_roll_mean"] = df["Rotational speed [rpm]"].rolling(window=5).mean()
-    df["Temp_roll_mean"] = df["Process temperature [K]"].rolling(window=5).mean()
-
-    df["Torque_z"] = zscore(df["Torque [Nm]"])
-    df["Speed_z"] = zscore(df["Rotational speed [rpm]"])
-    df["Temp_z"] = zscore(df["Process temperature [K]"])
-
-    df = df.dropna().reset_index(drop=True)
-
-    abt_columns = [
-        "Air temperature [K]",
-        "Process temperature [K]",
-        "Rotational speed [rpm]",
-        "Torque [Nm]",
-        "Tool wear [min]",
-        "Torque_roll_mean",
-        "Speed_roll_mean",
-        "Temp_roll_mean",
-        "Torque_z",
-        "Speed_z",
-        "Temp_z",
-        "Machine failure"
-    ]
-
-    abt = df[abt_columns]
-
-    print("Saving ABT to:", output_path)
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    abt.to_csv(output_path, index=False)
-
-    print("ABT saved successfully. Shape:", abt.shape)
-    return abt
-
-
-if __name__ == "__main__":
-    build_features(
-        input_path="data/cleaned/ai4i2020_cleaned.csv",
-        output_path="data/processed/abt.csv"
-    )
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from src.feature_engineering.feature_engine import compute_features
+from src.feature_engineering.feature_registry import FEATURE_SETS
+from src.io.dataset import append_dataset, dataset_rows, iter_dataset, read_dataset, write_dataset
+from src.io.partitioned import append_partition, is_partitioned, partition_dataset, window_size
+from src.io.schema import Column, enforce_schema
+from src.pipeline.instrumentation import log, stage, step
+
+ROLLING_WINDOW = 5
+
+# Engineered column -> source sensor column
+ROLLING_FEATURES = {
+    "Torque_roll_mean": "Torque [Nm]",
+    "Speed_roll_mean": "Rotational speed [rpm]",
+    "Temp_roll_mean": "Process temperature [K]"
+}
+
+ZSCORE_FEATURES = {
+    "Torque_z": "Torque [Nm]",
+    "Speed_z": "Rotational speed [rpm]",
+    "Temp_z": "Process temperature [K]"
+}
+
+ABT_COLUMNS = [
+    "Air temperature [K]",
+    "Process temperature [K]",
+    "Rotational speed [rpm]",
+    "Torque [Nm]",
+    "Tool wear [min]",
+    "Torque_roll_mean",
+    "Speed_roll_mean",
+    "Temp_roll_mean",
+    "Torque_z",
+    "Speed_z",
+    "Temp_z",
+    "Machine failure"
+]
+
+# Features are computed in float64 and stored as float32
+ABT_SCHEMA = tuple(Column(c, "float32") for c in ABT_COLUMNS[:-1]) + (
+    Column("Machine failure", "uint8", 0, 1),
+)
+
+# The partitioned ABT splits the (UDI-ordered) rows into about four windows
+# of a multiple of this many rows
+ABT_WINDOWS = 4
+ABT_ROWS_MULTIPLE = 2_500
+
+# Machine grouping after Type has been one-hot encoded by clean_data
+MACHINE_GROUP_COLUMNS = ("Type_L", "Type_M")
+
+
+def _fit_z_params(df) -> dict:
+    # Population mean and standard deviation (as scipy's zscore) per sensor
+    params = {}
+    for col in ZSCORE_FEATURES.values():
+        values = df[col].to_numpy(dtype="float64")
+        params[col] = {"mean": float(values.mean()), "std": float(values.std())}
+    return params
+
+
+def z_params(state: dict) -> dict:
+    """
+    ``{sensor: (mean, std)}`` the ABT's z-scores were computed with.
+    """
+
+    return {col: (p["mean"], p["std"]) for col, p in state["z_params"].items()}
+
+
+def _compute_abt(df, feature_specs=None, group_by=None, params=None):
+    df = df.sort_values(by="UDI").reset_index(drop=True)
+
+    df["Torque_roll_mean"] = df["Torque [Nm]"].rolling(window=ROLLING_WINDOW).mean()
+    df["Speed_roll_mean"] = df["Rotational speed [rpm]"].rolling(window=ROLLING_WINDOW).mean()
+    df["Temp_roll_mean"] = df["Process temperature [K]"].rolling(window=ROLLING_WINDOW).mean()
+
+    # Standardized over the whole history unless given frozen parameters
+    params = params or _fit_z_params(df)
+    for feature, col in ZSCORE_FEATURES.items():
+        df[feature] = (df[col].astype("float64") - params[col]["mean"]) / params[col]["std"]
+
+    abt_columns = list(ABT_COLUMNS)
+
+    # Additional registry features, computed per machine group
+    if feature_specs:
+        features, timings = compute_features(df, feature_specs, group_by=group_by)
+        df = pd.concat([df, features], axis=1)
+        abt_columns[-1:-1] = list(features.columns)
+
+        slowest = sorted(timings.items(), key=lambda kv: -kv[1])[:10]
+        log(f"Computed {len(features.columns)} registry features "
+            f"in {sum(timings.values()):.2f}s",
+            slowest_ms={name: round(seconds * 1000, 1) for name, seconds in slowest})
+
+    rows = len(df)
+    df = df.dropna().reset_index(drop=True)
+    log("Dropped rows with incomplete windows", rows=rows - len(df))
+
+    abt, _ = enforce_schema(df[abt_columns], ABT_SCHEMA)
+    return abt
+
+
+@stage("build_features")
+def build_features(input_path: str, output_path: str, state_path: str = None,
+                   feature_set: str = "default", group_by=MACHINE_GROUP_COLUMNS):
+    """
+    Build the ABT. ``feature_set`` names a list of registry features (see
+    ``feature_registry.FEATURE_SETS``) added to the default ones, computed
+    per ``group_by`` machine group. With ``state_path``, the state
+    ``build_features_incremental`` continues from is saved as well.
+    """
+
+    if feature_set not in FEATURE_SETS:
+        raise ValueError(f"Unknown feature set {feature_set!r}; expected one of {sorted(FEATURE_SETS)}")
+    feature_specs = FEATURE_SETS[feature_set]
+
+    with step("read") as s:
+        df = read_dataset(input_path)
+        s.read(input_path)
+        s.rows_in = s.rows_out = len(df)
+    log("Loaded cleaned data", path=input_path, shape=df.shape)
+
+    with step("compute_features", rows_in=len(df)) as s:
+        abt = _compute_abt(df, feature_specs, group_by)
+        s.rows_out = len(abt)
+
+    with step("write", rows_in=len(abt)) as s:
+        write_dataset(abt, output_path)
+        s.rows_out = len(abt)
+        s.wrote(output_path)
+
+        if state_path is not None:
+            _save_state(_state_from_history(df, len(abt), feature_set), state_path)
+            s.wrote(state_path)
+
+    log("ABT saved", path=output_path, shape=abt.shape)
+    return abt
+
+
+@stage("partition_abt")
+def partition_abt(input_path: str, output_path: str, range_size: int = None):
+    """
+    Write the ABT as a dataset partitioned into windows of consecutive
+    rows, with per-window column statistics for pruning.
+    """
+
+    range_size = range_size or window_size(input_path, ABT_WINDOWS, ABT_ROWS_MULTIPLE)
+    with step("partition") as s:
+        manifest = partition_dataset(input_path, output_path, range_size=range_size)
+        s.read(input_path)
+        s.rows_in = s.rows_out = manifest["rows"]
+        s.bytes_written += sum(sum(p["column_bytes"].values()) for p in manifest["partitions"])
+
+    log("ABT partitioned", path=output_path, partitions=len(manifest["partitions"]),
+        rows_per_window=range_size)
+    return manifest
+
+
+# -------------------------
+# Incremental mode
+# -------------------------
+def _history_hash(chunks, start: int = 0) -> int:
+    """
+    Digest of cleaned rows: the sum (mod 2**64) of the hashes of every row
+    together with its position, so any changed, moved or filtered row
+    changes it, and the digest of the history plus new rows is the sum of
+    both digests.
+    """
+
+    total = 0
+    for chunk in chunks:
+        chunk = chunk.set_axis(pd.RangeIndex(start, start + len(chunk)))
+        total = (total + int(pd.util.hash_pandas_object(chunk, index=True).to_numpy().sum(dtype="uint64"))) % 2 ** 64
+        start += len(chunk)
+    return total
+
+
+def _state_from_history(df, abt_rows: int, feature_set: str = "default"):
+    history_hash = _history_hash([df])
+    df = df.sort_values(by="UDI")
+    sensors = sorted(set(ROLLING_FEATURES.values()) | set(ZSCORE_FEATURES.values()))
+
+    return {
+        "last_udi": int(df["UDI"].iloc[-1]) if len(df) else -1,
+        "n_rows": len(df),
+        "history_hash": history_hash,
+        "abt_rows": abt_rows,
+        "feature_set": feature_set,
+        "tail": {
+            col: df[col].iloc[-(ROLLING_WINDOW - 1):].tolist()
+            for col in sensors
+        },
+        "z_params": _fit_z_params(df)
+    }
+
+
+def _save_state(state, state_path):
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with open(state_path, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def _load_state(state_path):
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def _history_matches(input_path: str, state: dict, chunksize: int = 100_000) -> bool:
+    # The cleaned input must still start with exactly the rows the state
+    # covers: a re-clean with other medians or IQR bounds changes the digest
+    n_rows = state["n_rows"]
+    if dataset_rows(input_path) < n_rows:
+        return False
+
+    def prefix():
+        remaining = n_rows
+        for chunk in iter_dataset(input_path, chunksize):
+            if remaining <= 0:
+                return
+            yield chunk.iloc[:remaining]
+            remaining -= len(chunk)
+
+    return _history_hash(prefix()) == state["history_hash"]
+
+
+def _full_build(input_path: str, output_path: str, state_path: str,
+                partitioned_path: str = None, feature_set: str = "default"):
+    abt = build_features(input_path, output_path, state_path, feature_set)
+    if partitioned_path:
+        partition_abt(output_path, partitioned_path)
+    return abt
+
+
+@stage("build_features")
+def build_features_incremental(input_path: str, output_path: str, state_path: str,
+                               partitioned_path: str = None, verify: bool = False):
+    """
+    Append the features of the cleaned rows added since the last run to
+    the ABT ``output_path`` and, if given, to its partitioned copy.
+
+    Only the rows after the ``n_rows`` already processed are featurized.
+    Rolling means are continued from the persisted tail window, and the
+    z-scores use the parameters frozen at the last full build, so existing
+    ABT rows never change. The ABT file's record batches are copied as they
+    are, and the partitioned copy only rewrites its last partition. The
+    processed history is checked against its digest in the state, which
+    reads (but does not featurize) the cleaned rows once.
+
+    Falls back to a full build when there is no state, the cleaned history
+    no longer matches it or the ABT has registry features (which are not
+    computed incrementally). With ``verify=True`` the result is
+    compared against a full recompute with the frozen parameters.
+    """
+
+    if not (os.path.exists(state_path) and os.path.exists(output_path)):
+        log("No incremental state found, running full build")
+        return _full_build(input_path, output_path, state_path, partitioned_path)
+
+    start = time.perf_counter()
+    state = _load_state(state_path)
+
+    feature_set = state.get("feature_set", "default")
+    if feature_set != "default":
+        log("Registry features are not computed incrementally, running full build", feature_set=feature_set)
+        return _full_build(input_path, output_path, state_path, partitioned_path, feature_set)
+
+    if "history_hash" not in state or not _history_matches(input_path, state):
+        log("Cleaned history changed since last run, running full build")
+        return _full_build(input_path, output_path, state_path, partitioned_path)
+
+    # -------------------------
+    # Read only the rows after the processed history
+    # -------------------------
+    with step("read_delta") as s:
+        chunks = list(iter_dataset(input_path, start=state["n_rows"]))
+        new_rows = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+        s.rows_in = s.rows_out = len(new_rows)
+
+    log("New rows since last run", rows=len(new_rows))
+
+    if new_rows.empty:
+        if verify:
+            verify_incremental(input_path, read_dataset(output_path), state)
+        return new_rows
+
+    if (new_rows["UDI"] <= state["last_udi"]).any():
+        log("New rows do not follow the processed history, running full build")
+        return _full_build(input_path, output_path, state_path, partitioned_path)
+
+    delta = new_rows.sort_values(by="UDI").reset_index(drop=True)
+
+    # -------------------------
+    # Rolling means continued from the tail window
+    # -------------------------
+    n_tail = len(state["tail"]["Torque [Nm]"])
+
+    for feature, col in ROLLING_FEATURES.items():
+        series = pd.concat([
+            pd.Series(state["tail"][col], dtype="float64"),
+            delta[col].astype("float64")
+        ], ignore_index=True)
+        delta[feature] = series.rolling(window=ROLLING_WINDOW).mean().iloc[n_tail:].to_numpy()
+
+    # -------------------------
+    # Frozen z-scores
+    # -------------------------
+    for feature, col in ZSCORE_FEATURES.items():
+        p = state["z_params"][col]
+        delta[feature] = (delta[col].astype("float64") - p["mean"]) / p["std"]
+
+    tail = {
+        col: (values + delta[col].tolist())[-(ROLLING_WINDOW - 1):]
+        for col, values in state["tail"].items()
+    }
+    delta = delta.dropna().reset_index(drop=True)
+
+    # -------------------------
+    # Append the new rows
+    # -------------------------
+    with step("append", rows_in=len(delta)) as s:
+        abt_delta, _ = enforce_schema(delta[ABT_COLUMNS], ABT_SCHEMA)
+        if len(abt_delta):
+            append_dataset(output_path, abt_delta)
+            s.wrote(output_path)
+            if partitioned_path and is_partitioned(partitioned_path):
+                append_partition(partitioned_path, abt_delta)
+                s.wrote(partitioned_path)
+        s.rows_out = len(abt_delta)
+
+    state.update(
+        last_udi=int(new_rows["UDI"].max()),
+        n_rows=state["n_rows"] + len(new_rows),
+        history_hash=(state["history_hash"] + _history_hash([new_rows], state["n_rows"])) % 2 ** 64,
+        abt_rows=state.get("abt_rows", 0) + len(abt_delta),
+        tail=tail
+    )
+    _save_state(state, state_path)
+
+    log(f"Incremental ABT update took {time.perf_counter() - start:.2f}s",
+        rows_appended=len(abt_delta), abt_rows=state["abt_rows"])
+
+    if verify:
+        verify_incremental(input_path, read_dataset(output_path), state)
+
+    return abt_delta
+
+
+def verify_incremental(input_path: str, abt, state: dict):
+    """
+    Check an incrementally built ABT against a full recompute with the
+    same frozen z-score parameters. Both are computed in float64 and
+    stored as float32, so they can differ in the last float32 digit.
+    """
+
+    full = _compute_abt(read_dataset(input_path), params=state["z_params"])
+    pd.testing.assert_frame_equal(
+        abt.reset_index(drop=True), full.reset_index(drop=True),
+        check_exact=False, rtol=1e-6, atol=1e-6
+    )
+
+    max_diff = (abt[ABT_COLUMNS].astype("float64") - full[ABT_COLUMNS].astype("float64")).abs().max().max()
+    log("Incremental ABT matches full recompute", max_abs_diff=max_diff)
+    return max_diff
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the analytical base table")
+    parser.add_argument("--input", default="data/cleaned/ai4i2020_cleaned.arrow")
+    parser.add_argument("--output", default="data/processed/abt.arrow")
+    parser.add_argument("--partitioned", default="data/processed/abt_partitioned")
+    parser.add_argument("--state", default="data/processed/abt_state.json")
+    parser.add_argument("--feature-set", default="default", choices=sorted(FEATURE_SETS),
+                        help="registry features added to the ABT (full builds)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="append the features of new cleaned rows to the ABT and its partitioned copy")
+    parser.add_argument("--verify", action="store_true",
+                        help="with --incremental, compare against a full recompute")
+    args = parser.parse_args()
+
+    if args.incremental:
+        build_features_incremental(args.input, args.output, args.state, args.partitioned, verify=args.verify)
+    else:
+        build_features(args.input, args.output, args.state, args.feature_set)
+        partition_abt(args.output, args.partitioned)
@@ -0,0 +1,242 @@
+import pandas as pd
+import pyarrow as pa
+import os
+
+
+# -------------------------
+# Shared dataset layer
+# -------------------------
+# Intermediate tables are stored as uncompressed Arrow IPC files. They can be
+# memory-mapped, so reading a subset of columns only touches those columns'
+# pages, and float64 values round-trip bit-exactly (unlike CSV text).
+# A directory written by ``src.io.partitioned`` is read through the same
+# functions, with its partitions pruned by ``filters``.
+
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+
+def write_dataset(df: pd.DataFrame, path: str):
+    """
+    Write a DataFrame as an uncompressed Arrow IPC file.
+    """
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    return path
+
+
+def read_table(path: str, columns=None) -> pa.Table:
+    """
+    Memory-map an Arrow IPC file and return the (projected) Arrow table.
+
+    The file handle is closed on return; the table's buffers keep the
+    mapping alive until they are released.
+    """
+
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+
+    if columns is not None:
+        table = table.select(list(columns))
+
+    return table
+
+
+def read_dataset(path: str, columns=None, filters=None) -> pd.DataFrame:
+    """
+    Load a dataset, reading only the requested columns and, with
+    ``filters`` ((column, op, value) tuples), only the matching rows.
+
+    Arrow IPC files are memory-mapped; CSV is still accepted for raw inputs.
+    Partitioned datasets skip the partitions that cannot match.
+    """
+
+    from src.io.partitioned import apply_filters, is_partitioned, read_partitioned
+
+    if is_partitioned(path):
+        return read_partitioned(path, columns, filters)
+
+    load = columns
+    if filters and columns is not None:
+        load = list(columns) + [f[0] for f in filters if f[0] not in columns]
+
+    if path.endswith(ARROW_EXTENSIONS):
+        df = read_table(path, load).to_pandas()
+    elif path.endswith(".csv"):
+        df = pd.read_csv(path, usecols=load)
+    else:
+        raise ValueError(f"Unsupported dataset format: {path}")
+
+    if not filters:
+        return df
+    df = apply_filters(df, filters)
+    return (df if columns is None else df[list(columns)]).reset_index(drop=True)
+
+
+def bytes_scanned(path: str, columns=None, filters=None) -> int:
+    """
+    Bytes a ``read_dataset`` call touches: the requested columns of the
+    unpruned partitions, or the whole file for flat datasets.
+    """
+
+    from src.io.partitioned import is_partitioned, scan
+
+    if is_partitioned(path):
+        return scan(path, columns, filters)["bytes"]
+    return os.path.getsize(path)
+
+
+def dataset_rows(path: str) -> int:
+    """
+    Return the number of rows of a dataset without loading them.
+    """
+
+    from src.io.partitioned import is_partitioned, load_manifest
+
+    if is_partitioned(path):
+        return load_manifest(path)["rows"]
+
+    if path.endswith(ARROW_EXTENSIONS):
+        with pa.memory_map(path, "r") as source:
+            return pa.ipc.open_file(source).count_rows()
+
+    return sum(len(chunk) for chunk in pd.read_csv(path, usecols=[0], chunksize=1_000_000))
+
+
+def dataset_columns(path: str):
+    """
+    Return the column names of a dataset without loading its rows.
+    """
+
+    from src.io.partitioned import is_partitioned, load_manifest
+
+    if is_partitioned(path):
+        return load_manifest(path)["columns"]
+
+    if path.endswith(ARROW_EXTENSIONS):
+        with pa.memory_map(path, "r") as source:
+            return pa.ipc.open_file(source).schema.names
+
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def iter_rows(path: str, rows, columns=None, chunksize: int = 50_000):
+    """
+    Yield the rows at positions ``rows`` of an Arrow dataset, in that order,
+    as DataFrames of at most ``chunksize`` rows. Only the current chunk is
+    materialized.
+    """
+
+    table = read_table(path, columns)
+    for offset in range(0, len(rows), chunksize):
+        yield table.take(rows[offset:offset + chunksize]).to_pandas()
+
+
+def iter_dataset(path: str, chunksize: int = 50_000, columns=None, start: int = 0):
+    """
+    Yield a dataset as DataFrames of at most ``chunksize`` rows, from row
+    ``start`` on.
+
+    Arrow record batches are sliced zero-copy from the memory map, so only
+    the current chunk is materialized in pandas, and batches before
+    ``start`` are skipped without being read. Partitioned datasets are
+    yielded one range window at a time, in the row order of the
+    unpartitioned dataset.
+    """
+
+    from src.io.partitioned import is_partitioned, iter_partitioned
+
+    if is_partitioned(path):
+        yield from iter_partitioned(path, chunksize, columns, start=start)
+        return
+
+    if path.endswith(".csv"):
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize,
+                               skiprows=range(1, start + 1) if start else None)
+        return
+
+    if not path.endswith(ARROW_EXTENSIONS):
+        raise ValueError(f"Unsupported dataset format: {path}")
+
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if start >= batch.num_rows:
+                start -= batch.num_rows
+                continue
+            batch, start = batch.slice(start), 0
+            if columns is not None:
+                batch = batch.select(list(columns))
+
+            for offset in range(0, batch.num_rows, chunksize):
+                yield batch.slice(offset, chunksize).to_pandas()
+
+
+def append_dataset(path: str, df: pd.DataFrame) -> str:
+    """
+    Append the rows of ``df`` to the Arrow IPC file ``path``. An IPC file
+    ends with a footer, so its record batches are copied as they are (not
+    converted to pandas) into a new file that then replaces it.
+    """
+
+    tmp = path + ".tmp"
+    with pa.memory_map(path, "r") as source:
+        reader = pa.ipc.open_file(source)
+        with pa.ipc.new_file(tmp, reader.schema) as writer:
+            for i in range(reader.num_record_batches):
+                writer.write_batch(reader.get_batch(i))
+            writer.write_table(pa.Table.from_pandas(df, preserve_index=False).cast(reader.schema))
+    os.replace(tmp, path)
+    return path
+
+
+class DatasetWriter:
+    """
+    Append DataFrame chunks to an Arrow IPC file.
+
+    The schema is ``schema`` if given, else fixed by the first chunk; the
+    other chunks are cast to it. Closing a writer that got no chunks still
+    writes a file without rows (and without columns unless ``schema`` is
+    given), so readers find the output of an empty input.
+    """
+
+    def __init__(self, path: str, schema: pa.Schema = None):
+        self.path = path
+        self.rows_written = 0
+        self._writer = None
+        self._schema = schema
+
+    def _open(self, schema: pa.Schema):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._schema = schema
+        self._writer = pa.ipc.new_file(self.path, schema)
+
+    def write(self, df: pd.DataFrame):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        if self._writer is None:
+            self._open(self._schema or table.schema)
+        if table.schema is not self._schema:
+            table = table.cast(self._schema)
+
+        self._writer.write_table(table)
+        self.rows_written += len(df)
+
+    def close(self):
+        if self._writer is None:
+            self._open(self._schema or pa.schema([]))
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
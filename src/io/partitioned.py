@@ -0,0 +1,452 @@
+import json
+import operator
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from src.io.dataset import DatasetWriter, dataset_rows, iter_dataset, read_table
+
+
+# -------------------------
+# Partitioned dataset layout
+# -------------------------
+# A partitioned dataset is a directory of Arrow IPC files, one per value
+# of the ``partition_by`` columns and per ``range_size`` window of a
+# numeric ``range_column`` (consecutive rows when there is none):
+#
+#   <path>/Type=L/UDI=0000001-0002500.arrow
+#   <path>/_manifest.json
+#
+# The manifest lists every partition with its row count, the bytes of each
+# column and each column's min/max. A read prunes the partitions whose
+# statistics cannot satisfy the filters, memory-maps only the requested
+# columns of the rest and applies the filters to the remaining rows.
+# Filters are (column, op, value) tuples with op in ==, !=, <, <=, >, >=,
+# in. The manifest is written last, into a temporary directory that
+# replaces the old dataset, so readers never see a partial layout.
+
+MANIFEST = "_manifest.json"
+
+OPS = {
+    "==": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "in": lambda column, values: column.isin(values)
+}
+
+
+def is_partitioned(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def load_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def _scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _column_stats(values: pd.Series):
+    values = values.dropna()
+    if values.empty:
+        return None
+    if pd.api.types.is_bool_dtype(values):
+        values = values.astype("int64")
+    elif not pd.api.types.is_numeric_dtype(values):
+        # Strings and categoricals compare lexicographically
+        values = values.astype("str")
+    return [_scalar(values.min()), _scalar(values.max())]
+
+
+def _merge_stats(a, b):
+    if a is None or b is None:
+        return a or b
+    return [min(a[0], b[0]), max(a[1], b[1])]
+
+
+class PartitionedWriter:
+    """
+    Append DataFrame chunks to a partitioned dataset.
+
+    Rows are expected in ``range_column`` order (or row order); a
+    partition's file is closed once the chunks have moved past its range.
+    """
+
+    def __init__(self, path: str, partition_by=(), range_column: str = None,
+                 range_size: int = 100_000):
+        self.path = path
+        self.partition_by = list(partition_by)
+        self.range_column = range_column
+        self.range_size = range_size
+        self.rows_written = 0
+        self._origin = None
+        self._open = {}
+        self._closed = set()
+        self._partitions = {}
+        self._columns = None
+
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+
+    def _file_name(self, keys: tuple, range_id: int) -> str:
+        parts = [f"{col}={value}" for col, value in zip(self.partition_by, keys)]
+        start = self._origin + range_id * self.range_size
+        label = self.range_column or "rows"
+        parts.append(f"{label}={start:07d}-{start + self.range_size - 1:07d}.arrow")
+        return os.path.join(*parts)
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        if self._columns is None:
+            self._columns = list(df.columns)
+
+        if self.range_column is None:
+            position = np.arange(self.rows_written, self.rows_written + len(df))
+        else:
+            position = df[self.range_column].to_numpy()
+        if self._origin is None:
+            self._origin = int(position.min())
+        range_ids = (position - self._origin) // self.range_size
+
+        keys = [df[col].astype("str").to_numpy() for col in self.partition_by]
+        groups = pd.DataFrame({**{i: k for i, k in enumerate(keys)}, "range": range_ids}).groupby(
+            list(range(len(keys))) + ["range"], sort=False
+        ).indices
+
+        for group, rows in groups.items():
+            group = group if isinstance(group, tuple) else (group,)
+            name = self._file_name(group[:-1], int(group[-1]))
+            if name in self._closed:
+                raise ValueError(f"Rows for {name} arrived after its range was closed; "
+                                 f"sort the input by {self.range_column or 'row'}")
+
+            part = df.iloc[rows]
+            if name not in self._open:
+                self._open[name] = DatasetWriter(os.path.join(self._tmp, name))
+                self._partitions[name] = {
+                    "path": name,
+                    "keys": dict(zip(self.partition_by, group[:-1])),
+                    "range": int(group[-1]),
+                    "rows": 0,
+                    "stats": {}
+                }
+            self._open[name].write(part)
+
+            entry = self._partitions[name]
+            entry["rows"] += len(part)
+            for col in part.columns:
+                entry["stats"][col] = _merge_stats(entry["stats"].get(col), _column_stats(part[col]))
+
+        self.rows_written += len(df)
+
+        # Ranges below this chunk's last one are complete
+        last = int(range_ids[-1])
+        for name in [n for n, p in self._partitions.items() if n in self._open and p["range"] < last]:
+            self._close(name)
+
+    def _close(self, name: str):
+        self._open.pop(name).close()
+        self._closed.add(name)
+
+        table = read_table(os.path.join(self._tmp, name))
+        self._partitions[name]["column_bytes"] = {
+            col: table.column(col).nbytes for col in table.column_names
+        }
+
+    def close(self):
+        for name in list(self._open):
+            self._close(name)
+
+        partitions = sorted(self._partitions.values(), key=lambda p: (p["range"], p["path"]))
+        manifest = {
+            "columns": self._columns or [],
+            "partition_by": self.partition_by,
+            "range_column": self.range_column,
+            "range_size": self.range_size,
+            "rows": self.rows_written,
+            "partitions": partitions
+        }
+        with open(os.path.join(self._tmp, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=1)
+
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        os.replace(self._tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for writer in self._open.values():
+                writer.close()
+            shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+def window_size(path: str, windows: int = 4, multiple: int = 2_500) -> int:
+    """
+    Range size that splits the rows of the dataset ``path`` into about
+    ``windows`` windows, rounded up to a multiple of ``multiple``, so the
+    number of files does not grow with the data.
+    """
+
+    rows = dataset_rows(path)
+    return max(1, -(-rows // (windows * multiple))) * multiple
+
+
+def partition_dataset(input_path: str, output_path: str, partition_by=(), range_column: str = None,
+                      range_size: int = 100_000, chunksize: int = 50_000) -> dict:
+    """
+    Rewrite a dataset as a partitioned dataset, chunk by chunk.
+    Returns the manifest.
+    """
+
+    with PartitionedWriter(output_path, partition_by, range_column, range_size) as writer:
+        for chunk in iter_dataset(input_path, chunksize):
+            writer.write(chunk)
+    return load_manifest(output_path)
+
+
+def append_partition(path: str, df: pd.DataFrame) -> list:
+    """
+    Add the rows of ``df`` to a dataset partitioned into row windows (no
+    ``partition_by`` or ``range_column``). The last partition is topped up
+    to ``range_size`` rows and the rest is split into full windows, so the
+    number of partitions grows with the rows, not with the appends; only
+    the last partition is rewritten. The manifest is replaced last, so
+    readers see either the old or the new rows. Returns the entries of the
+    written partitions.
+    """
+
+    manifest = load_manifest(path)
+    if manifest["partition_by"] or manifest["range_column"]:
+        raise ValueError(f"{path} is partitioned by columns; only row windows can be appended to")
+    if manifest["columns"] and list(df.columns) != manifest["columns"]:
+        raise ValueError(f"Columns {list(df.columns)} do not match {path}: {manifest['columns']}")
+
+    partitions = manifest["partitions"]
+    size = manifest.get("range_size") or max(len(df), 1)
+    start = manifest["rows"]
+    range_id = max((p["range"] for p in partitions), default=-1) + 1
+
+    replaced = None
+    if partitions and partitions[-1]["rows"] < size:
+        replaced = partitions.pop()
+        start -= replaced["rows"]
+        range_id = replaced["range"]
+        old = read_table(os.path.join(path, replaced["path"])).to_pandas()
+        df = pd.concat([old, df], ignore_index=True)
+
+    entries = []
+    for offset in range(0, len(df), size):
+        part = df.iloc[offset:offset + size]
+        first = start + offset
+        name = f"rows={first:07d}-{first + len(part) - 1:07d}.arrow"
+        tmp = os.path.join(path, name + ".tmp")
+        with DatasetWriter(tmp) as writer:
+            writer.write(part)
+        os.replace(tmp, os.path.join(path, name))
+
+        table = read_table(os.path.join(path, name))
+        entries.append({
+            "path": name,
+            "keys": {},
+            "range": range_id,
+            "rows": len(part),
+            "stats": {col: _column_stats(part[col]) for col in part.columns},
+            "column_bytes": {col: table.column(col).nbytes for col in table.column_names}
+        })
+        range_id += 1
+
+    manifest["partitions"] = partitions + entries
+    manifest["rows"] = start + len(df)
+    manifest["columns"] = list(df.columns)
+
+    tmp = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+
+    if replaced is not None and replaced["path"] not in {e["path"] for e in entries}:
+        os.remove(os.path.join(path, replaced["path"]))
+    return entries
+
+
+# -------------------------
+# Pruned, projected reads
+# -------------------------
+def _may_match(stats, op: str, value) -> bool:
+    # Whether any value within [min, max] can satisfy the filter
+    if stats is None:
+        return op == "!="
+    low, high = stats
+    try:
+        if op == "==":
+            return low <= value <= high
+        if op == "!=":
+            return not (low == high == value)
+        if op == "<":
+            return low < value
+        if op == "<=":
+            return low <= value
+        if op == ">":
+            return high > value
+        if op == ">=":
+            return high >= value
+        if op == "in":
+            return any(low <= v <= high for v in value)
+    except TypeError:
+        # Value and statistics of different types: cannot prune
+        return True
+    raise ValueError(f"Unsupported filter operator {op!r}; use one of {list(OPS)}")
+
+
+def scan(path: str, columns=None, filters=None) -> dict:
+    """
+    Plan a read: the partitions left after pruning, the columns to load and
+    the bytes they hold, next to the dataset totals.
+    """
+
+    manifest = load_manifest(path)
+    filters = [tuple(f) for f in filters or []]
+    for col, op, _ in filters:
+        if col not in manifest["columns"]:
+            raise KeyError(f"Filter column {col!r} is not in {path}")
+
+    wanted = list(manifest["columns"] if columns is None else columns)
+    load = wanted + [col for col, _, _ in filters if col not in wanted]
+
+    partitions = [
+        p for p in manifest["partitions"]
+        if all(_may_match(p["stats"].get(col), op, value) for col, op, value in filters)
+    ]
+    return {
+        "columns": wanted,
+        "load": load,
+        "filters": filters,
+        "partitions": partitions,
+        "bytes": sum(p["column_bytes"].get(col, 0) for p in partitions for col in load),
+        "total_partitions": len(manifest["partitions"]),
+        "total_bytes": sum(sum(p["column_bytes"].values()) for p in manifest["partitions"]),
+        "partition_by": manifest["partition_by"],
+        "range_column": manifest["range_column"]
+    }
+
+
+def apply_filters(df: pd.DataFrame, filters) -> pd.DataFrame:
+    """
+    Rows of ``df`` satisfying every (column, op, value) filter.
+    """
+
+    mask = np.ones(len(df), dtype=bool)
+    for col, op, value in filters or []:
+        mask &= np.asarray(OPS[op](df[col], value), dtype=bool)
+    return df if mask.all() else df[mask]
+
+
+def read_partitioned(path: str, columns=None, filters=None, preserve_order: bool = True) -> pd.DataFrame:
+    """
+    Load the ``columns`` of the rows matching ``filters``.
+
+    Partitions are read in range order. When rows come from several
+    ``partition_by`` groups and ``preserve_order`` is set, they are put back
+    in ``range_column`` order, as in the unpartitioned dataset.
+    """
+
+    plan = scan(path, columns, filters)
+    load = list(plan["load"])
+
+    groups = {tuple(p["keys"].values()) for p in plan["partitions"]}
+    reorder = preserve_order and plan["range_column"] is not None and len(groups) > 1
+    if reorder and plan["range_column"] not in load:
+        load.append(plan["range_column"])
+
+    frames = [
+        read_table(os.path.join(path, p["path"]), columns=load).to_pandas()
+        for p in plan["partitions"]
+    ]
+    if not frames:
+        # Keep the column dtypes of an empty result
+        first = load_manifest(path)["partitions"]
+        if not first:
+            return pd.DataFrame(columns=plan["columns"])
+        return read_table(os.path.join(path, first[0]["path"]), columns=plan["columns"]).slice(0, 0).to_pandas()
+
+    df = apply_filters(pd.concat(frames, ignore_index=True), plan["filters"])
+    if reorder:
+        df = df.iloc[np.argsort(df[plan["range_column"]].to_numpy(), kind="stable")]
+    return df[plan["columns"]].reset_index(drop=True)
+
+
+def iter_partitioned(path: str, chunksize: int = 50_000, columns=None, filters=None, start: int = 0):
+    """
+    Yield the matching rows one range window at a time, as DataFrames of at
+    most ``chunksize`` rows, skipping the first ``start``.
+
+    The ``partition_by`` groups of a window are merged back in
+    ``range_column`` order, so rows come in the order of the unpartitioned
+    dataset and ``start`` skips the same rows as there. Only one window is
+    held in memory.
+    """
+
+    plan = scan(path, columns, filters)
+    load = list(plan["load"])
+    reorder = plan["range_column"] is not None and bool(plan["partition_by"])
+    if reorder and plan["range_column"] not in load:
+        load.append(plan["range_column"])
+
+    windows = {}
+    for p in plan["partitions"]:
+        windows.setdefault(p["range"], []).append(p)
+
+    for _, parts in sorted(windows.items()):
+        rows = sum(p["rows"] for p in parts)
+        if not plan["filters"] and start >= rows:
+            # Skipped from the manifest row counts, without reading
+            start -= rows
+            continue
+        df = pd.concat([
+            read_table(os.path.join(path, p["path"]), columns=load).to_pandas()
+            for p in parts
+        ], ignore_index=True)
+        df = apply_filters(df, plan["filters"])
+        if reorder and len(parts) > 1:
+            df = df.iloc[np.argsort(df[plan["range_column"]].to_numpy(), kind="stable")]
+        df = df[plan["columns"]]
+        if start:
+            skip = min(start, len(df))
+            df, start = df.iloc[skip:], start - skip
+        for offset in range(0, len(df), chunksize):
+            yield df.iloc[offset:offset + chunksize].reset_index(drop=True)
+
+
+def parse_filter(text: str):
+    """
+    ``"Torque [Nm] > 60"`` -> ``("Torque [Nm]", ">", 60.0)``; ``in`` takes a
+    comma-separated list. Numeric values are converted.
+    """
+
+    for op in ["==", "!=", "<=", ">=", "<", ">", " in "]:
+        if op in text:
+            col, value = text.split(op, 1)
+            values = [_parse_value(v) for v in value.split(",")] if op == " in " else _parse_value(value)
+            return col.strip(), op.strip(), values
+    raise ValueError(f"Cannot parse filter {text!r}; expected '<column> <op> <value>'")
+
+
+def _parse_value(text: str):
+    text = text.strip()
+    try:
+        return float(text)
+    except ValueError:
+        return text
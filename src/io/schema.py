@@ -0,0 +1,188 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+# -------------------------
+# Declared data contracts
+# -------------------------
+# A schema is a tuple of Columns. ``enforce_schema`` validates a frame
+# against it (presence, parseable values, nulls, ranges, categories) and
+# casts every column to its compact storage type: sensors as float32,
+# 0/1 flags as uint8, row ids as uint32 and low-cardinality labels as
+# categoricals with a fixed category list, so every chunk of a dataset
+# shares one Arrow dictionary. Rows that break the contract either stop
+# the stage (``on_error="raise"``) or are returned separately for
+# quarantine (``on_error="quarantine"``).
+
+QUARANTINE_REASON = "Schema Violation"
+
+
+class SchemaError(ValueError):
+    """
+    A frame that does not satisfy its declared schema.
+    """
+
+
+@dataclass(frozen=True)
+class Column:
+    """
+    One declared column: storage dtype, optional closed value range,
+    whether nulls are allowed and, for categoricals, the allowed labels.
+    """
+
+    name: str
+    dtype: str
+    min: float = None
+    max: float = None
+    nullable: bool = False
+    categories: tuple = None
+
+
+def _sensor(name, low, high):
+    # Sensors may have gaps; clean_data imputes them
+    return Column(name, "float32", low, high, nullable=True)
+
+
+def _flag(name):
+    return Column(name, "uint8", 0, 1)
+
+
+AI4I_SCHEMA = (
+    Column("UDI", "uint32", 1),
+    Column("Product ID", "str"),
+    Column("Type", "category", categories=("H", "L", "M")),
+    _sensor("Air temperature [K]", 250, 350),
+    _sensor("Process temperature [K]", 250, 400),
+    _sensor("Rotational speed [rpm]", 0, 10_000),
+    _sensor("Torque [Nm]", 0, 500),
+    _sensor("Tool wear [min]", 0, 1_000),
+    _flag("Machine failure"),
+    _flag("TWF"),
+    _flag("HDF"),
+    _flag("PWF"),
+    _flag("OSF"),
+    _flag("RNF")
+)
+
+
+def _is_numeric(column: Column) -> bool:
+    return column.dtype not in ("str", "category")
+
+
+# pandas' masked integer dtypes, which can hold gaps
+_NULLABLE_INTEGERS = {
+    "int8": "Int8", "int16": "Int16", "int32": "Int32", "int64": "Int64",
+    "uint8": "UInt8", "uint16": "UInt16", "uint32": "UInt32", "uint64": "UInt64"
+}
+
+
+def _nullable(dtype: str) -> str:
+    return _NULLABLE_INTEGERS.get(dtype, dtype)
+
+
+def csv_dtypes(schema, strict: bool = True) -> dict:
+    """
+    ``read_csv`` dtypes for ``schema``. Strict parsing reads straight into
+    the storage types and raises on unparseable values; otherwise numeric
+    columns are left to inference so bad values can be quarantined.
+    Integer columns are read as nullable integers either way, so a gap
+    reaches ``enforce_schema`` (and the profiling) instead of failing the
+    parse.
+    """
+
+    if strict:
+        return {c.name: _nullable(c.dtype) for c in schema}
+    return {c.name: c.dtype for c in schema if not _is_numeric(c)}
+
+
+def arrow_schema(schema) -> pa.Schema:
+    fields = []
+    for c in schema:
+        if c.dtype == "category":
+            fields.append((c.name, pa.dictionary(pa.int8(), pa.string())))
+        elif c.dtype == "str":
+            fields.append((c.name, pa.string()))
+        else:
+            fields.append((c.name, pa.from_numpy_dtype(c.dtype)))
+    return pa.schema(fields)
+
+
+def check_columns(df: pd.DataFrame, schema):
+    """
+    Raise ``SchemaError`` if ``df`` lacks any column of ``schema``.
+    """
+
+    missing = [c.name for c in schema if c.name not in df.columns]
+    if missing:
+        raise SchemaError(f"Missing columns: {missing}")
+
+
+def enforce_schema(df: pd.DataFrame, schema, on_error: str = "raise"):
+    """
+    Validate ``df`` and cast its declared columns to their storage dtypes;
+    other columns are kept as they are.
+
+    Returns ``(df, rejected)``: ``rejected`` holds the offending rows with
+    a ``Schema Violation`` column (empty unless ``on_error="quarantine"``).
+    Missing columns always raise ``SchemaError``.
+    """
+
+    if on_error not in ("raise", "quarantine"):
+        raise ValueError(f"on_error must be 'raise' or 'quarantine', not {on_error!r}")
+
+    check_columns(df, schema)
+
+    reasons = np.full(len(df), None, dtype=object)
+    valid = np.ones(len(df), dtype=bool)
+    values = {}
+
+    def flag(mask, reason):
+        # Keep the first violation per row; nullable comparisons give NA
+        # for missing values, which ``nullable`` handles separately
+        mask = np.asarray(pd.array(mask, dtype="boolean").fillna(False), dtype=bool) & valid
+        if mask.any():
+            reasons[mask] = reason
+            valid[mask] = False
+
+    for c in schema:
+        raw = df[c.name]
+
+        if c.dtype == "category":
+            cast = pd.Categorical(raw, categories=list(c.categories))
+            flag(raw.notna() & pd.isna(cast), f"{c.name}: not one of {list(c.categories)}")
+        elif c.dtype == "str":
+            cast = raw.astype("str")
+        else:
+            cast = raw if pd.api.types.is_numeric_dtype(raw) else pd.to_numeric(raw, errors="coerce")
+            flag(raw.notna() & cast.isna(), f"{c.name}: not a number")
+            if np.dtype(c.dtype).kind in "iu" and cast.dtype.kind == "f":
+                flag(cast.notna() & (cast % 1 != 0), f"{c.name}: not an integer")
+            if c.min is not None:
+                flag(cast < c.min, f"{c.name}: below {c.min}")
+            if c.max is not None:
+                flag(cast > c.max, f"{c.name}: above {c.max}")
+
+        if not c.nullable:
+            flag(pd.isna(cast), f"{c.name}: missing")
+        values[c.name] = cast
+
+    bad = ~valid
+    if bad.any() and on_error == "raise":
+        examples = dict(zip(df.index[bad][:5], reasons[bad][:5]))
+        raise SchemaError(f"{int(bad.sum())} rows violate the schema, e.g. {examples}")
+
+    rejected = df[bad].assign(**{QUARANTINE_REASON: reasons[bad]})
+
+    out = df[~bad].copy() if bad.any() else df.copy()
+    for c in schema:
+        cast = values[c.name][~bad] if bad.any() else values[c.name]
+        if c.dtype in ("category", "str"):
+            out[c.name] = cast
+        else:
+            # Masked integers hold no NA here: missing values were rejected
+            out[c.name] = pd.Series(cast).to_numpy(dtype="float64" if c.nullable else c.dtype).astype(c.dtype)
+
+    return out, rejected
@@ -0,0 +1,350 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data_cleaning.quantile_sketch import KLLSketch
+from src.io.dataset import dataset_columns, dataset_rows, iter_dataset
+from src.pipeline.instrumentation import log, stage, step
+from src.pipeline.stages import DRIFT_DECISION, DRIFT_REFERENCE
+from src.reporting.report import save_result
+
+
+# -------------------------
+# Feature drift summaries
+# -------------------------
+# Every feature is summarized by its running moments (count, mean, M2,
+# min, max, missing values), a KLL quantile sketch and the counts of a
+# histogram over bins fixed by the reference data (its deciles). All three
+# are built in one pass over chunks, merge exactly (the sketch within its
+# rank error) and serialize to a few KB of JSON, so the summary of the
+# training rows is stored next to the model, with the row count of the
+# dataset it was trained on. The rows added since then are summarized over
+# the reference bins and compared per feature with:
+#
+#   PSI   sum((p_cur - p_ref) * ln(p_cur / p_ref)) over the bins
+#   KS    max |F_cur(x) - F_ref(x)| of the sketched CDFs
+#   shift (mean_cur - mean_ref) / std_ref
+#
+# PSI above 0.2 is the usual "significant shift" rule of thumb.
+
+TARGET = "Machine failure"
+
+DRIFT_COLUMNS = ["Feature", "PSI", "KS", "Mean Shift (std)", "Reference Mean", "Current Mean", "Missing"]
+
+# Bin proportions are floored so empty bins keep the PSI finite
+PSI_EPSILON = 1e-4
+
+
+class FeatureSummary:
+    """
+    Mergeable one-pass summary of a numeric feature: moments, a KLL sketch
+    and histogram counts over ``edges`` (bin i holds edges[i-1] < x <= edges[i]).
+    """
+
+    def __init__(self, edges=(), k: int = 200):
+        self.n = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.edges = np.asarray(edges, dtype="float64")
+        self.counts = np.zeros(len(self.edges) + 1, dtype="int64")
+        self.sketch = KLLSketch(k)
+
+    def update(self, values) -> "FeatureSummary":
+        values = np.asarray(values, dtype="float64").ravel()
+        nan = np.isnan(values)
+        self.missing += int(nan.sum())
+        values = values[~nan]
+        if not values.size:
+            return self
+
+        mean = values.mean()
+        self._merge_moments(values.size, mean, float(((values - mean) ** 2).sum()))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.counts += np.bincount(np.searchsorted(self.edges, values, side="left"),
+                                   minlength=len(self.counts))
+        self.sketch.update(values)
+        return self
+
+    def merge(self, other: "FeatureSummary") -> "FeatureSummary":
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge summaries with different histogram edges")
+        self._merge_moments(other.n, other.mean, other.m2)
+        self.missing += other.missing
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.counts += other.counts
+        self.sketch.merge(other.sketch)
+        return self
+
+    def _merge_moments(self, n: int, mean: float, m2: float):
+        # Chan et al. pairwise update of the mean and the sum of squared deviations
+        if not n:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta ** 2 * self.n * n / total
+        self.n = total
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else 0.0
+
+    def proportions(self) -> np.ndarray:
+        return self.counts / max(self.counts.sum(), 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "n": self.n,
+            "missing": self.missing,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+            "edges": self.edges.tolist(),
+            "counts": self.counts.tolist(),
+            "sketch": self.sketch.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FeatureSummary":
+        summary = cls(data["edges"], data["sketch"]["k"])
+        summary.n = data["n"]
+        summary.missing = data["missing"]
+        summary.mean = data["mean"]
+        summary.m2 = data["m2"]
+        summary.min = np.inf if data["min"] is None else data["min"]
+        summary.max = -np.inf if data["max"] is None else data["max"]
+        summary.counts = np.asarray(data["counts"], dtype="int64")
+        summary.sketch = KLLSketch.from_dict(data["sketch"])
+        return summary
+
+
+def reference_edges(X: pd.DataFrame, bins: int = 10) -> dict:
+    """
+    Inner quantile edges of every column of ``X`` (duplicates dropped, so
+    discrete and constant features get fewer bins).
+    """
+
+    q = np.linspace(0, 1, bins + 1)[1:-1]
+    edges = {}
+    for col in X.columns:
+        values = X[col].to_numpy(dtype="float64")
+        values = values[~np.isnan(values)]
+        edges[col] = np.unique(np.quantile(values, q)) if values.size else np.empty(0)
+    return edges
+
+
+def summarize(chunks, edges: dict, k: int = 200) -> dict:
+    """
+    Summaries of the ``edges`` features over an iterable of DataFrames, in
+    one pass.
+    """
+
+    summaries = {col: FeatureSummary(e, k) for col, e in edges.items()}
+    for chunk in chunks:
+        for col, summary in summaries.items():
+            summary.update(chunk[col].to_numpy(dtype="float64"))
+    return summaries
+
+
+def reference_summary(X: pd.DataFrame, bins: int = 10, k: int = 200) -> dict:
+    """
+    Summaries of the training features ``X`` over their own decile bins.
+    """
+
+    return summarize([X], reference_edges(X, bins), k)
+
+
+def chunked_reference_summary(chunks, bins: int = 10, k: int = 200) -> dict:
+    """
+    ``reference_summary`` in two passes over ``chunks()``, a callable
+    returning an iterable of DataFrames, so memory is bounded by a chunk.
+    The bin edges are the deciles of the first pass's KLL sketches, so they
+    are exact only to within the sketches' rank error.
+    """
+
+    sketches = None
+    for chunk in chunks():
+        if sketches is None:
+            sketches = {col: FeatureSummary((), k) for col in chunk.columns}
+        for col, summary in sketches.items():
+            summary.update(chunk[col].to_numpy(dtype="float64"))
+
+    q = np.linspace(0, 1, bins + 1)[1:-1]
+    edges = {
+        col: np.unique(summary.sketch.quantile(q)) if summary.n else np.empty(0)
+        for col, summary in (sketches or {}).items()
+    }
+    return summarize(chunks(), edges, k)
+
+
+def save_summary(summaries: dict, path: str, rows: int = None) -> str:
+    """
+    Write ``summaries`` to ``path`` with ``rows``, the row count of the
+    dataset they were built from (None if unknown).
+    """
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"rows": rows, "features": {col: s.to_dict() for col, s in summaries.items()}}, f)
+    os.replace(tmp, path)
+    return path
+
+
+def load_summary(path: str) -> dict:
+    with open(path) as f:
+        return {col: FeatureSummary.from_dict(data) for col, data in json.load(f)["features"].items()}
+
+
+def summary_rows(path: str):
+    # Row count of the dataset the summaries at ``path`` were built from
+    with open(path) as f:
+        return json.load(f)["rows"]
+
+
+# -------------------------
+# Drift statistics
+# -------------------------
+def psi(reference: FeatureSummary, current: FeatureSummary) -> float:
+    p = np.maximum(reference.proportions(), PSI_EPSILON)
+    q = np.maximum(current.proportions(), PSI_EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks(reference: FeatureSummary, current: FeatureSummary) -> float:
+    # Both CDFs are step functions that only change at sketch items
+    if not reference.n or not current.n:
+        return float("nan")
+    points = np.unique(np.concatenate(reference.sketch.levels + current.sketch.levels))
+    return float(np.abs(reference.sketch.cdf(points) - current.sketch.cdf(points)).max())
+
+
+def drift_table(reference: dict, current: dict) -> pd.DataFrame:
+    """
+    PSI, KS and standardized mean shift of every feature, most drifted first.
+    """
+
+    rows = []
+    for col, ref in reference.items():
+        cur = current[col]
+        rows.append({
+            "Feature": col,
+            "PSI": psi(ref, cur),
+            "KS": ks(ref, cur),
+            "Mean Shift (std)": (cur.mean - ref.mean) / ref.std if ref.std > 0 else 0.0,
+            "Reference Mean": ref.mean,
+            "Current Mean": cur.mean,
+            "Missing": cur.missing
+        })
+    return pd.DataFrame(rows, columns=DRIFT_COLUMNS).sort_values(by="PSI", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def should_retrain(decision_path: str = DRIFT_DECISION) -> bool:
+    """
+    Whether the last drift check asks for retraining (yes without one).
+    """
+
+    try:
+        with open(decision_path) as f:
+            return bool(json.load(f)["retrain"])
+    except (OSError, ValueError, KeyError):
+        return True
+
+
+@stage("drift_check")
+def check_drift(input_path: str, reference_path: str = DRIFT_REFERENCE,
+                output_path: str = DRIFT_DECISION, psi_threshold: float = 0.2,
+                ks_threshold: float = 0.1, chunksize: int = 50_000,
+                new_rows_only: bool = True) -> dict:
+    """
+    Compare the features of the dataset ``input_path`` with the summary of
+    the current model's training rows. With ``new_rows_only``, only the rows
+    appended since the reference was built are compared (all of them if the
+    dataset shrank, i.e. was rebuilt); otherwise ``input_path`` is a batch
+    compared as a whole. Retraining is needed when any feature's PSI or KS
+    reaches its threshold, when the features changed or when there is no
+    reference yet, but not when no rows were added. Writes the decision to
+    ``output_path``.
+    """
+
+    decision = {
+        "retrain": True,
+        "reason": "no reference summary",
+        "drifted": [],
+        "max_psi": None,
+        "max_ks": None,
+        "psi_threshold": psi_threshold,
+        "ks_threshold": ks_threshold,
+        "first_row": None,
+        "rows": None
+    }
+    table = pd.DataFrame(columns=DRIFT_COLUMNS)
+
+    if os.path.exists(reference_path):
+        reference = load_summary(reference_path)
+        features = [c for c in dataset_columns(input_path) if c != TARGET]
+
+        start = (summary_rows(reference_path) or 0) if new_rows_only else 0
+        if start > dataset_rows(input_path):
+            start = 0
+
+        if sorted(features) != sorted(reference):
+            decision["reason"] = "features changed"
+        elif start == dataset_rows(input_path):
+            decision.update(retrain=False, reason="no new rows", first_row=start, rows=0)
+        else:
+            with step("summarize", chunksize=chunksize, first_row=start) as s:
+                edges = {col: ref.edges for col, ref in reference.items()}
+                current = summarize(iter_dataset(input_path, chunksize, columns=list(reference), start=start),
+                                    edges)
+                first = next(iter(current.values()))
+                rows = first.n + first.missing
+                s.read(input_path)
+                s.rows_in = s.rows_out = rows
+
+            table = drift_table(reference, current)
+            drifted = table[(table["PSI"] >= psi_threshold) | (table["KS"] >= ks_threshold)]
+            decision.update(
+                retrain=not drifted.empty,
+                reason="feature drift" if not drifted.empty else "no drift",
+                drifted=drifted["Feature"].tolist(),
+                max_psi=float(table["PSI"].max()),
+                max_ks=float(table["KS"].max()),
+                first_row=start,
+                rows=int(rows)
+            )
+
+    save_result("Drift_Report", table)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(decision, f, indent=2)
+
+    log("Drift check", retrain=decision["retrain"], reason=decision["reason"],
+        first_row=decision["first_row"], rows=decision["rows"], max_psi=decision["max_psi"], max_ks=decision["max_ks"], drifted=decision["drifted"])
+    return decision
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a batch of features for drift from the training data")
+    parser.add_argument("--input", default="data/processed/abt.arrow")
+    parser.add_argument("--reference", default=DRIFT_REFERENCE)
+    parser.add_argument("--output", default=DRIFT_DECISION)
+    parser.add_argument("--psi-threshold", type=float, default=0.2)
+    parser.add_argument("--ks-threshold", type=float, default=0.1)
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--all-rows", action="store_true",
+                        help="compare every row of --input (a separate batch), not only the rows added since training")
+    args = parser.parse_args()
+
+    check_drift(args.input, args.reference, args.output, args.psi_threshold,
+                args.ks_threshold, args.chunksize, new_rows_only=not args.all_rows)
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import sklearn
+
+from src.modeling.compiled_forest import MAX_COMPILED_ROWS, CompiledForest, compile_forest
+from src.modeling.drift_monitor import save_summary
+from src.modeling.model_store import data_fingerprint
+from src.pipeline.instrumentation import log
+
+
+# -------------------------
+# Versioned model registry
+# -------------------------
+# Every registered model gets its own version directory:
+#
+#   <REGISTRY_DIR>/<name>/v0003/
+#       metadata.json   data fingerprint, features, params, metrics,
+#                       alarm threshold
+#       model.joblib    the estimator, uncompressed
+#       compiled/       flat tree arrays as .npy files (forests only)
+#       drift_reference.json
+#                       feature summaries of the training rows
+#
+# Loading is lazy: ``load_model`` only reads the metadata, and the arrays
+# are memory-mapped on first use. sklearn copies tree nodes when it
+# unpickles, so the compiled arrays are what concurrent scorers share
+# without copying: every process maps the same pages of the page cache.
+# Registering a model identical to the latest version's (same
+# ``model_digest``) returns that version instead of adding a duplicate.
+
+REGISTRY_DIR = os.environ.get("PDM_MODEL_REGISTRY", "models/registry")
+
+_VERSION_PREFIX = "v"
+_loaded = {}
+
+
+def _version_dir(name: str, version: int, registry_dir: str) -> str:
+    return os.path.join(registry_dir, name, f"{_VERSION_PREFIX}{version:04d}")
+
+
+def list_versions(name: str = "random_forest", registry_dir: str = REGISTRY_DIR):
+    """
+    Complete versions of ``name`` in ascending order.
+    """
+
+    model_dir = os.path.join(registry_dir, name)
+    if not os.path.isdir(model_dir):
+        return []
+
+    versions = []
+    for entry in os.listdir(model_dir):
+        if entry.startswith(_VERSION_PREFIX) and entry[1:].isdigit():
+            # The metadata is written last, so its presence marks a complete version
+            if os.path.exists(os.path.join(model_dir, entry, "metadata.json")):
+                versions.append(int(entry[1:]))
+    return sorted(versions)
+
+
+def resolve_version(name: str = "random_forest", version="latest",
+                    registry_dir: str = REGISTRY_DIR) -> int:
+    versions = list_versions(name, registry_dir)
+    if not versions:
+        raise FileNotFoundError(f"No registered versions of {name!r} in {registry_dir}")
+    if version == "latest":
+        return versions[-1]
+    if int(version) not in versions:
+        raise FileNotFoundError(f"{name!r} has no version {version}; available: {versions}")
+    return int(version)
+
+
+def get_metadata(name: str = "random_forest", version="latest",
+                 registry_dir: str = REGISTRY_DIR) -> dict:
+    version = resolve_version(name, version, registry_dir)
+    with open(os.path.join(_version_dir(name, version, registry_dir), "metadata.json")) as f:
+        return json.load(f)
+
+
+class _DigestPickler(pickle.Pickler):
+    # Arrays are pickled as a plain ("ndarray", dtype, shape, values) tuple
+    # with structured arrays split by field, so memory-mapped copies and the
+    # padding bytes of sklearn's tree node records do not change the digest.
+    # Memoization is off, so shared references (lost in a reload) do not
+    # either. The stream is only hashed, never loaded.
+    def __init__(self, file):
+        super().__init__(file, protocol=4)
+        self.fast = True
+
+    def reducer_override(self, obj):
+        if not isinstance(obj, np.ndarray):
+            return NotImplemented
+        if obj.dtype.names:
+            tagged = ("ndarray", "fields", obj.shape, [(name, obj[name]) for name in obj.dtype.names])
+        elif obj.dtype.hasobject:
+            tagged = ("ndarray", obj.dtype.str, obj.shape, obj.tolist())
+        else:
+            tagged = ("ndarray", obj.dtype.str, obj.shape, np.ascontiguousarray(obj).tobytes())
+        return tuple, (tagged,)
+
+
+class _HashWriter:
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+
+    def write(self, data):
+        self.digest.update(data)
+
+
+def model_digest(model) -> str:
+    """
+    SHA-256 of a fitted model's content, the same for a model and its
+    reloaded or memory-mapped copies.
+    """
+
+    writer = _HashWriter()
+    _DigestPickler(writer).dump(model)
+    return writer.digest.hexdigest()
+
+
+def register_model(model, X, y, metrics: dict = None, name: str = "random_forest",
+                   registry_dir: str = REGISTRY_DIR, operating_point: dict = None,
+                   drift_reference: dict = None, fingerprint: str = None) -> dict:
+    """
+    Store ``model`` (fitted on ``X``/``y``) as the next version of ``name``,
+    with the alarm ``operating_point`` (threshold, cost, confusion) chosen
+    for it and the ``drift_reference`` feature summaries of its training
+    rows. Returns the version metadata, that of the latest version if it
+    holds the same model.
+
+    ``X`` may be None when the ``fingerprint`` of the training data is
+    given; the features are then taken from the model.
+    """
+
+    model_dir = os.path.join(registry_dir, name)
+    os.makedirs(model_dir, exist_ok=True)
+
+    # Write everything into a temporary directory, then claim the next
+    # version number with an atomic rename
+    tmp_dir = tempfile.mkdtemp(dir=model_dir, prefix=".tmp-")
+    try:
+        digest = model_digest(model)
+        versions = list_versions(name, registry_dir)
+        if versions:
+            latest = get_metadata(name, versions[-1], registry_dir)
+            if latest.get("model_digest") == digest:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                log(f"{name} version {latest['version']} already holds this model")
+                return latest
+
+        joblib.dump(model, os.path.join(tmp_dir, "model.joblib"))
+
+        compiled = hasattr(model, "estimators_") and hasattr(model.estimators_[0], "tree_")
+        if compiled:
+            compile_forest(model).save_arrays(os.path.join(tmp_dir, "compiled"))
+
+        if drift_reference is not None:
+            save_summary(drift_reference, os.path.join(tmp_dir, "drift_reference.json"))
+
+        metadata = {
+            "name": name,
+            "created": time.time(),
+            "estimator": type(model).__module__ + "." + type(model).__name__,
+            "sklearn_version": sklearn.__version__,
+            "model_digest": digest,
+            "data_fingerprint": fingerprint or data_fingerprint(X, y),
+            "n_rows": int(len(y)),
+            "features": list(map(str, model.feature_names_in_ if X is None else X.columns)),
+            "params": {k: v for k, v in model.get_params().items()},
+            "metrics": metrics or {},
+            "operating_point": operating_point or {},
+            "compiled": compiled,
+            "drift_reference": drift_reference is not None
+        }
+
+        while True:
+            versions = list_versions(name, registry_dir)
+            version = (versions[-1] if versions else 0) + 1
+            target = _version_dir(name, version, registry_dir)
+            metadata["version"] = version
+            with open(os.path.join(tmp_dir, "metadata.json"), "w") as f:
+                json.dump(metadata, f, indent=2, default=str)
+            try:
+                os.rename(tmp_dir, target)
+                break
+            except OSError:
+                # Another process registered this version first
+                if not os.path.exists(target):
+                    raise
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    log(f"Registered {name} version {version}", path=target)
+    return metadata
+
+
+class RegisteredModel:
+    """
+    Lazily loaded registry version. ``predict_proba`` uses the memory-mapped
+    compiled forest for batches of up to MAX_COMPILED_ROWS rows when there
+    is one, and the estimator otherwise.
+    """
+
+    def __init__(self, path: str, metadata: dict):
+        self.path = path
+        self.metadata = metadata
+        self.version = metadata["version"]
+        self._model = None
+        self._compiled = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = joblib.load(os.path.join(self.path, "model.joblib"), mmap_mode="r")
+        return self._model
+
+    @property
+    def compiled(self):
+        if self._compiled is None and self.metadata.get("compiled"):
+            self._compiled = CompiledForest.load_arrays(os.path.join(self.path, "compiled"))
+        return self._compiled
+
+    @property
+    def classes_(self):
+        return (self.compiled or self.model).classes_
+
+    @property
+    def feature_names_in_(self):
+        return self.metadata["features"]
+
+    @property
+    def threshold(self):
+        # Failure probability at or above which to raise an alarm; None when
+        # the test split had no failures to choose it on
+        return self.metadata.get("operating_point", {}).get("threshold")
+
+    def _estimator(self, X):
+        if self.compiled is not None and len(X) <= MAX_COMPILED_ROWS:
+            return self.compiled
+        return self.model
+
+    def predict_proba(self, X):
+        return self._estimator(X).predict_proba(X)
+
+    def predict(self, X):
+        return self._estimator(X).predict(X)
+
+
+def load_model(name: str = "random_forest", version="latest",
+               registry_dir: str = REGISTRY_DIR) -> RegisteredModel:
+    """
+    Registry version ``version`` (a number or "latest") of ``name``; the
+    model files are only read when first used.
+    """
+
+    version = resolve_version(name, version, registry_dir)
+    path = _version_dir(name, version, registry_dir)
+
+    if path not in _loaded:
+        _loaded[path] = RegisteredModel(path, get_metadata(name, version, registry_dir))
+    return _loaded[path]
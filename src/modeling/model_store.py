@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import joblib
+import pandas as pd
+import sklearn
+from sklearn.model_selection import train_test_split
+
+from src.pipeline.cache import evict_lru
+from src.pipeline.instrumentation import log, step
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+
+# -------------------------
+# Fingerprint-based model store
+# -------------------------
+# Fitted estimators are stored under a key built from the training data
+# fingerprint, the feature list, the split parameters and the estimator
+# parameters (and the scikit-learn version, since pickles do not load
+# across versions). Identical fits across train_model and the RQ scripts
+# (and across runs) happen once; later requests load the uncompressed
+# joblib file with mmap_mode so the arrays are paged in lazily. Like the
+# stage cache, the store evicts least-recently-used models once it grows
+# beyond MODEL_STORE_MAX_BYTES.
+
+MODEL_STORE_DIR = os.environ.get("PDM_MODEL_STORE", ".cache/models")
+MODEL_STORE_MAX_BYTES = int(os.environ.get("PDM_MODEL_STORE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Parameters that do not change the fitted model
+_IGNORED_PARAMS = {"n_jobs", "verbose"}
+
+_loaded = {}
+
+
+def data_fingerprint(X: pd.DataFrame, y: pd.Series) -> str:
+    """
+    SHA-256 over the row hashes, column names and dtypes of ``X`` and ``y``.
+    """
+
+    return chunked_fingerprint([X], y)
+
+
+def chunked_fingerprint(chunks, y: pd.Series) -> str:
+    """
+    ``data_fingerprint`` of the row-wise concatenation of the feature
+    DataFrames ``chunks`` and ``y``, without holding all chunks at once.
+    """
+
+    digest = hashlib.sha256()
+
+    def update(frame, header):
+        if header:
+            digest.update(json.dumps([list(map(str, frame.columns)),
+                                      list(map(str, frame.dtypes))]).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+
+    for i, X in enumerate(chunks):
+        update(X, i == 0)
+    update(y.to_frame(), True)
+    return digest.hexdigest()
+
+
+def model_key(estimator, X, y, split_params: dict) -> str:
+    params = {
+        k: v for k, v in estimator.get_params().items()
+        if k not in _IGNORED_PARAMS
+    }
+    spec = {
+        "data": data_fingerprint(X, y),
+        "features": list(map(str, X.columns)),
+        "split": split_params,
+        "estimator": type(estimator).__module__ + "." + type(estimator).__name__,
+        "params": params,
+        "sklearn": sklearn.__version__
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _KeyLock:
+    """
+    Exclusive per-key file lock so concurrent processes fit a model once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+
+
+def evict(store_dir: str = MODEL_STORE_DIR, max_bytes: int = MODEL_STORE_MAX_BYTES, keep=()):
+    """
+    Remove least-recently-used models until the store fits ``max_bytes``.
+    """
+
+    entries = []
+    for name in os.listdir(store_dir):
+        if name.endswith(".joblib"):
+            path = os.path.join(store_dir, name)
+            entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+    evict_lru(entries, max_bytes, keep)
+
+
+def fit_or_load(estimator, X: pd.DataFrame, y: pd.Series,
+                test_size: float = 0.2, random_state: int = 42,
+                stratify: bool = True, store_dir: str = MODEL_STORE_DIR,
+                max_bytes: int = MODEL_STORE_MAX_BYTES):
+    """
+    Split ``X``/``y`` and return ``(model, (X_train, X_test, y_train, y_test))``.
+
+    The model is fitted on the training split only if no identical fit is
+    stored yet; otherwise it is loaded memory-mapped from the store.
+    """
+
+    split_params = {"test_size": test_size, "random_state": random_state, "stratify": stratify}
+    split = train_test_split(
+        X, y,
+        test_size=test_size,
+        random_state=random_state,
+        stratify=y if stratify else None
+    )
+    X_train, _, y_train, _ = split
+
+    key = model_key(estimator, X, y, split_params)
+    if key in _loaded:
+        return _loaded[key], split
+
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, f"{key}.joblib")
+
+    with _KeyLock(path + ".lock"):
+        if os.path.exists(path):
+            start = time.perf_counter()
+            with step("model_store_load", key=key[:12]) as s:
+                model = joblib.load(path, mmap_mode="r")
+                s.read(path)
+            os.utime(path)
+            log(f"[model store] loaded {type(estimator).__name__} {key[:12]} "
+                f"({time.perf_counter() - start:.2f}s)")
+        else:
+            start = time.perf_counter()
+            with step("fit", rows_in=len(X_train), key=key[:12]) as s:
+                model = estimator.fit(X_train, y_train)
+            log(f"[model store] fitted {type(estimator).__name__} {key[:12]} "
+                f"({time.perf_counter() - start:.2f}s)")
+
+            with step("model_store_save", key=key[:12]) as s:
+                fd, tmp = tempfile.mkstemp(dir=store_dir, suffix=".tmp")
+                os.close(fd)
+                joblib.dump(model, tmp)
+                os.replace(tmp, path)
+                s.wrote(path)
+
+    evict(store_dir, max_bytes, keep={path})
+    _loaded[key] = model
+    return model, split
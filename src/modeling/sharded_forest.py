@@ -0,0 +1,175 @@
+import copy
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree._tree import Tree
+
+from src.io.dataset import ARROW_EXTENSIONS, read_table
+from src.pipeline.instrumentation import log, step
+
+
+# -------------------------
+# Data-parallel sharded forest training
+# -------------------------
+# The training rows are split into stratified shards, so every shard keeps
+# its share of failure examples. One worker process per shard (standing in
+# for a node) memory-maps the Arrow dataset, materializes only its own rows
+# and fits a sub-forest on them. The sub-forests are merged into a single
+# RandomForestClassifier whose trees are the union of all shards' trees, so
+# predict_proba, the compiled export and the registry work unchanged.
+# Workers are fresh spawned processes, so each one's peak memory covers its
+# shard only. A class with fewer rows than shards is dealt out round-robin,
+# so some shards never see it; their trees are widened to the full class
+# list (probability 0 for the missing classes) before merging.
+
+
+def shard_rows(y, n_shards: int, random_state: int = 42):
+    """
+    Split the positions of ``y`` into ``n_shards`` shards with the same
+    class proportions. Returns one sorted index array per shard.
+
+    The rows of a class with fewer rows than shards go to one shard each,
+    round-robin across such classes, so they are not all in the first
+    shards.
+    """
+
+    y = np.asarray(y)
+    rng = np.random.default_rng(random_state)
+    shards = [[] for _ in range(n_shards)]
+    next_shard = 0
+
+    for cls in np.unique(y):
+        rows = rng.permutation(np.flatnonzero(y == cls))
+        if rows.size < n_shards:
+            for row in rows:
+                shards[next_shard].append(row[None])
+                next_shard = (next_shard + 1) % n_shards
+            continue
+        for shard, part in zip(shards, np.array_split(rows, n_shards)):
+            shard.append(part)
+
+    return [np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype="int64") for parts in shards]
+
+
+def _fit_shard(path: str, features, target: str, rows, shard: int,
+               n_estimators: int, random_state: int, params: dict):
+    # Runs in a worker process; only this shard's rows are materialized
+    with step("fit_shard", rows_in=len(rows), shard=shard, trees=n_estimators) as s:
+        df = read_table(path, columns=list(features) + [target]).take(rows).to_pandas()
+        model = RandomForestClassifier(
+            n_estimators=n_estimators,
+            random_state=random_state,
+            n_jobs=1,
+            **params
+        ).fit(df[list(features)], df[target])
+        s.rows_out = len(df)
+
+    record = s.record
+    rss_start = None if record["rss_mb"] is None else record["rss_mb"] - record["rss_delta_mb"]
+    return model, {
+        "shard": shard,
+        "rows": len(rows),
+        "failures": int(df[target].sum()),
+        "trees": n_estimators,
+        "seconds": record["wall_s"],
+        "peak_rss_mb": record["peak_rss_mb"],
+        # Peak above the worker's footprint before loading its shard
+        "shard_mb": None if rss_start is None or record["peak_rss_mb"] is None
+        else record["peak_rss_mb"] - rss_start
+    }
+
+
+def widen_classes(forest, classes):
+    """
+    Re-express a fitted forest over ``classes``, a superset of its own
+    ``classes_``; the added classes get probability 0 in every leaf.
+    """
+
+    classes = np.asarray(classes)
+    if np.array_equal(forest.classes_, classes):
+        return forest
+
+    columns = np.searchsorted(classes, forest.classes_)
+    for tree in forest.estimators_:
+        state = tree.tree_.__getstate__()
+        values = np.zeros(state["values"].shape[:2] + (classes.size,))
+        values[:, :, columns] = state["values"]
+        state["values"] = values
+
+        widened = Tree(tree.n_features_in_, np.array([classes.size], dtype=np.intp), 1)
+        widened.__setstate__(state)
+        tree.tree_ = widened
+        # Trees of a forest are fitted on the encoded classes 0..n-1
+        tree.classes_ = np.arange(classes.size, dtype="float64")
+        tree.n_classes_ = classes.size
+
+    forest.classes_ = classes
+    forest.n_classes_ = classes.size
+    return forest
+
+
+def merge_forests(forests) -> RandomForestClassifier:
+    """
+    One forest holding the trees of all ``forests`` (fitted on the same
+    features and classes).
+    """
+
+    first = forests[0]
+    for forest in forests[1:]:
+        if not np.array_equal(forest.classes_, first.classes_):
+            raise ValueError(f"Cannot merge forests with classes {first.classes_} and {forest.classes_}")
+        if forest.n_features_in_ != first.n_features_in_:
+            raise ValueError("Cannot merge forests fitted on different features")
+
+    merged = copy.copy(first)
+    merged.estimators_ = [tree for forest in forests for tree in forest.estimators_]
+    merged.n_estimators = len(merged.estimators_)
+    return merged
+
+
+def fit_sharded(path: str, features, target: str = "Machine failure", rows=None,
+                n_shards: int = 4, workers: int = None, n_estimators: int = 100,
+                random_state: int = 42, **params):
+    """
+    Fit a forest of ``n_estimators`` trees on the ``rows`` of an Arrow dataset
+    (default: all) across ``n_shards`` stratified shards.
+
+    Returns ``(model, shard_stats)``.
+    """
+
+    if not path.endswith(ARROW_EXTENSIONS):
+        raise ValueError(f"Sharded training needs an Arrow dataset: {path}")
+
+    y = read_table(path, columns=[target]).column(0).to_numpy()
+    rows = np.arange(y.size) if rows is None else np.asarray(rows)
+    shards = [rows[part] for part in shard_rows(y[rows], n_shards, random_state)]
+    if any(shard.size == 0 for shard in shards):
+        raise ValueError(f"{rows.size} rows are too few for {n_shards} shards")
+
+    # Split the trees as evenly as possible; each shard gets its own seed
+    trees = [n_estimators // n_shards + (i < n_estimators % n_shards) for i in range(n_shards)]
+    workers = min(n_shards, workers or os.cpu_count() or 1)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        max_tasks_per_child=1
+    ) as pool:
+        futures = [
+            pool.submit(_fit_shard, path, features, target, shard, i, trees[i], random_state + i, params)
+            for i, shard in enumerate(shards)
+        ]
+        results = [f.result() for f in futures]
+
+    classes = np.unique(y[rows])
+    model = merge_forests([widen_classes(m, classes) for m, _ in results])
+    stats = [s for _, s in results]
+    log(f"[sharded] {n_shards} shards on {workers} workers, {model.n_estimators} trees "
+        f"in {time.perf_counter() - start:.2f}s",
+        peak_rss_mb=max(s["peak_rss_mb"] or 0 for s in stats))
+    return model, stats
@@ -1,84 +1,188 @@
-import pandas as pd
-import os
-import joblib
-
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
-import matplotlib.pyplot as plt
-
-
-def train_model(input_path: str):
-    print("Loading ABT from:", input_path)
-
-    df = pd.read_csv(input_path)
-    print("ABT shape:", df.shape)
-
-    X = df.drop("Machine failure", axis=1)
-    y = df["Machine failure"]
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X,
-        y,
-        test_size=0.2,
-        random_state=42,
-        stratify=y
-    )
-
-    model = RandomForestClassifier(
-        n_estimators=100,
-        random_state=42,
-        class_weight="balanced"
-    )
-
-    model.fit(X_train, y_train)
-
-    y_pred = model.predict(X_test)
-
-    accuracy = accuracy_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-
-    print("Accuracy:", accuracy)
-    print("F1-score:", f1)
-
-    # AUC only if both classes exist
-    if len(model.classes_) > 1:
-        y_prob = model.predict_proba(X_test)[:, 1]
-        auc = roc_auc_score(y_test, y_prob)
-        print("AUC:", auc)
-    else:
-        auc = "Not defined"
-        print("AUC: Not defined (single-class prediction)")
-
-    # Save metrics table
-    os.makedirs("tables", exist_ok=True)
-    metrics_df = pd.DataFrame({
-        "Metric": ["Accuracy", "F1-score", "AUC"],
-        "Value": [accuracy, f1, auc]
-    })
-    metrics_df.to_excel("tables/RQ3_Table1.xlsx", index=False)
-
-    # Feature importance figure
-    os.makedirs("figures", exist_ok=True)
-    importances = pd.Series(
-        model.feature_importances_,
-        index=X.columns
-    ).sort_values(ascending=False)
-
-    plt.figure(figsize=(8, 5))
-    importances.head(10).plot(kind="bar")
-    plt.title("Top 10 Feature Importances")
-    plt.ylabel("Importance")
-    plt.tight_layout()
-    plt.savefig("figures/RQ1_Fig1.pdf")
-    plt.close()
-
-    # Save trained model
-    os.makedirs("models", exist_ok=True)
-    joblib.dump(model, "models/random_forest_model.pkl")
-
-    print("Model, figures, and tables saved successfully.")
-
-
-if __name__ == "__main__":
-    train_model("data/processed/abt.csv")
+import argparse
+import pandas as pd
+import numpy as np
+import os
+import warnings
+import joblib
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+from src.evaluation.permutation_importance import correlated_groups, permutation_importance
+from src.evaluation.thresholds import evaluate_scores, positive_scores
+from src.io.dataset import dataset_columns, iter_rows, read_dataset
+from src.modeling.compiled_forest import compile_forest
+from src.modeling.drift_monitor import chunked_reference_summary, reference_summary, save_summary
+from src.modeling.model_registry import register_model
+from src.modeling.model_store import chunked_fingerprint, fit_or_load
+from src.modeling.sharded_forest import fit_sharded
+from src.pipeline.instrumentation import log, stage, step
+from src.pipeline.stages import DRIFT_REFERENCE
+from src.reporting.report import save_result
+
+
+@stage("train_model")
+def train_model(input_path: str, shards: int = None, workers: int = 1,
+                importance_repeats: int = 5, group_threshold: float = 0.8):
+    """
+    Train, evaluate, export and register the failure classifier. With
+    ``shards``, the forest is fitted as merged sub-forests in worker
+    processes, one per stratified shard of the training rows; the parent
+    then only holds the target column and the test rows, and reads the
+    training rows chunk by chunk for the drift reference. Permutation
+    importances are computed on the test split, per feature and per group
+    of features correlated above ``group_threshold``. The training features
+    are summarized as the reference of the drift check.
+    """
+
+    if shards:
+        features = [c for c in dataset_columns(input_path) if c != "Machine failure"]
+
+        with step("read_target") as s:
+            y = read_dataset(input_path, ["Machine failure"])["Machine failure"]
+            s.rows_in = s.rows_out = len(y)
+        log("Loaded ABT target", path=input_path, rows=len(y))
+
+        # Same stratified split as fit_or_load, by row position
+        train_rows, test_rows = train_test_split(
+            np.arange(len(y)), test_size=0.2, random_state=42, stratify=y
+        )
+        y_train, y_test = y.iloc[train_rows], y.iloc[test_rows].reset_index(drop=True)
+
+        with step("fit_sharded", rows_in=len(train_rows), shards=shards) as s:
+            model, shard_stats = fit_sharded(
+                input_path, features, rows=train_rows,
+                n_shards=shards, workers=workers,
+                n_estimators=100, random_state=42, class_weight="balanced"
+            )
+            s.rows_out = len(train_rows)
+        log("Sharded fit", shards=shard_stats)
+
+        with step("read_test", rows_in=len(test_rows)) as s:
+            X_test = pd.concat(iter_rows(input_path, test_rows, features), ignore_index=True)
+            s.rows_out = len(X_test)
+
+        def train_chunks():
+            return iter_rows(input_path, train_rows, features)
+    else:
+        with step("read") as s:
+            df = read_dataset(input_path)
+            s.read(input_path)
+            s.rows_in = s.rows_out = len(df)
+        log("Loaded ABT", path=input_path, shape=df.shape)
+
+        X = df.drop("Machine failure", axis=1)
+        y = df["Machine failure"]
+        features = list(X.columns)
+
+        # Fit (or reuse an identical stored fit) on the stratified split
+        with step("fit", rows_in=len(X)) as s:
+            model, (X_train, X_test, y_train, y_test) = fit_or_load(
+                RandomForestClassifier(
+                    n_estimators=100,
+                    random_state=42,
+                    class_weight="balanced"
+                ),
+                X,
+                y,
+                test_size=0.2,
+                random_state=42,
+                stratify=True
+            )
+            s.rows_out = len(X_train)
+
+    with step("drift_reference", rows_in=len(y_train)) as s:
+        # Compared with new batches by the drift_check stage
+        drift_reference = chunked_reference_summary(train_chunks) if shards else reference_summary(X_train)
+        # The ABT row count lets the drift check compare only later rows
+        s.wrote(save_summary(drift_reference, DRIFT_REFERENCE, rows=len(y)))
+    log("Drift reference saved", path=DRIFT_REFERENCE, kb=round(os.path.getsize(DRIFT_REFERENCE) / 1024, 1))
+
+    with step("evaluate", rows_in=len(X_test)) as s:
+        # One sort of the test scores gives the metrics at every threshold
+        metrics, curve = evaluate_scores(y_test, positive_scores(model, X_test))
+        s.rows_out = len(curve)
+
+    accuracy, f1 = metrics["accuracy"], metrics["f1"]
+    # AUC only if both classes exist (None is reported as "Not defined")
+    auc = None if pd.isna(metrics["auc"]) else metrics["auc"]
+    operating_point = metrics["operating_point"]
+
+    log("Model evaluated", accuracy=accuracy, f1=f1, auc=auc,
+        operating_point=operating_point)
+    if np.isnan(operating_point["threshold"]):
+        # Reported as NaN, registered as null: scorers fall back to 0.5
+        message = "The test split has no failures; no cost-optimal alarm threshold is chosen"
+        warnings.warn(message)
+        log(message)
+
+    with step("permutation_importance", rows_in=len(X_test)):
+        permuted = permutation_importance(model, X_test, y_test, importance_repeats, workers=workers)
+        # Sharded: correlations of the test rows, the training rows are not held
+        grouped = permutation_importance(model, X_test, y_test, importance_repeats,
+                                         groups=correlated_groups(X_test if shards else X_train,
+                                                                  group_threshold),
+                                         workers=workers)
+    log("Permutation importances", top=dict(zip(permuted["Feature"][:5], permuted["Importance"][:5].round(4))),
+        groups=dict(zip(grouped["Feature"], grouped["Importance"].round(4))))
+
+    # Metrics table and feature importances (rendered by the report stage)
+    with step("save_results") as s:
+        metrics_df = pd.DataFrame({
+            "Metric": ["Accuracy", "F1-score", "AUC", "Cost-optimal Threshold", "F1-score at Cost-optimal Threshold"],
+            "Value": [accuracy, f1, auc, operating_point["threshold"], operating_point["f1"]]
+        }).astype({"Value": "float64"})
+        importances = pd.DataFrame({
+            "Feature": features,
+            "Importance": model.feature_importances_
+        }).sort_values(by="Importance", ascending=False)
+
+        s.wrote(save_result("RQ3_Table1", metrics_df))
+        s.wrote(save_result("Model_Feature_Importances", importances))
+        s.wrote(save_result("Model_Permutation_Importances", permuted))
+        s.wrote(save_result("Model_Group_Importances", grouped))
+        # Test-set confusion matrix at the cost-optimal operating point,
+        # used by the RQ5 cost model
+        s.wrote(save_result("Model_Confusion", pd.DataFrame([operating_point["confusion"]])))
+        # The "no alarms" row has an infinite threshold and is not plotted
+        s.wrote(save_result("Model_Threshold_Curve", curve.iloc[1:].reset_index(drop=True)))
+
+    with step("save_model") as s:
+        # Save trained model
+        os.makedirs("models", exist_ok=True)
+        joblib.dump(model, "models/random_forest_model.pkl")
+
+        # Export flat-array version for fast batch inference
+        compile_forest(model).save("models/random_forest_compiled.npz")
+        s.wrote("models/random_forest_model.pkl")
+        s.wrote("models/random_forest_compiled.npz")
+
+    # Versioned copy with metadata, loadable lazily and memory-mapped
+    with step("register_model"):
+        register_model(
+            model, None if shards else X_train, y_train,
+            fingerprint=chunked_fingerprint(train_chunks(), y_train) if shards else None,
+            metrics={"accuracy": accuracy, "f1": f1, "auc": auc},
+            operating_point={
+                **operating_point,
+                "threshold": None if np.isnan(operating_point["threshold"]) else operating_point["threshold"]
+            },
+            drift_reference=drift_reference
+        )
+
+    log("Model, figures, and tables saved successfully.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the failure classifier")
+    parser.add_argument("--input", default="data/processed/abt.arrow")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="fit merged sub-forests on this many stratified shards")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--importance-repeats", type=int, default=5)
+    parser.add_argument("--group-threshold", type=float, default=0.8,
+                        help="permute features with |correlation| >= this together")
+    args = parser.parse_args()
+
+    train_model(args.input, shards=args.shards, workers=args.workers,
+                importance_repeats=args.importance_repeats, group_threshold=args.group_threshold)
@@ -0,0 +1,314 @@
+import ast
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: the file index is updated without a lock
+    fcntl = None
+
+from contextlib import contextmanager
+
+from src.pipeline.instrumentation import log, stage_summary
+
+# -------------------------
+# Content-addressed stage cache
+# -------------------------
+# A stage's cache key hashes the bytes of its input files, its keyword
+# arguments and the source code of its module plus every ``src.*`` module
+# it (transitively) imports, found from the import statements (so imported
+# constants count too, and imports inside functions). Outputs are copied
+# into CACHE_DIR/<key>/ and restored on a hit. Entries are evicted
+# least-recently-used once the cache grows beyond CACHE_MAX_BYTES. Inputs
+# and outputs may also be directories (partitioned datasets), hashed and
+# copied file by file. Stages with side effects beyond their declared
+# outputs (``cacheable=False``) always run.
+
+CACHE_DIR = os.environ.get("PDM_CACHE_DIR", ".cache/stages")
+CACHE_MAX_BYTES = int(os.environ.get("PDM_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+_FILE_INDEX = "file_index.json"
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_write_json(obj, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _locked(path: str):
+    # Exclusive lock on ``path``.lock, held across processes (stages run
+    # concurrently under the parallel runner and Airflow)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_index(index_path: str) -> dict:
+    try:
+        with open(index_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def file_digest(path: str, cache_dir: str = CACHE_DIR) -> str:
+    """
+    SHA-256 of a file, memoized on (size, mtime) so unchanged large inputs
+    are not re-read on every run. The index is re-read and updated under a
+    file lock, so concurrent stages do not drop each other's entries.
+    """
+
+    index_path = os.path.join(cache_dir, _FILE_INDEX)
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    entry = _read_index(index_path).get(key)
+
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    digest = _sha256_file(path)
+    with _locked(index_path):
+        index = _read_index(index_path)
+        index[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+        _atomic_write_json(index, index_path)
+    return digest
+
+
+def path_digest(path: str, cache_dir: str = CACHE_DIR) -> str:
+    """
+    ``file_digest`` of a file, or of every file below a directory together
+    with its relative path. A missing path (an optional input such as the
+    drift reference before the first training run) hashes as absent.
+    """
+
+    if not os.path.exists(path):
+        return "missing"
+    if not os.path.isdir(path):
+        return file_digest(path, cache_dir)
+
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            digest.update(os.path.relpath(full, path).encode())
+            digest.update(file_digest(full, cache_dir).encode())
+    return digest.hexdigest()
+
+
+def _copy(source: str, target: str):
+    if os.path.isdir(source):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        shutil.copytree(source, target)
+    else:
+        shutil.copy2(source, target)
+
+
+def _is_source_module(name: str) -> bool:
+    # ``from src.a import b`` names a submodule only if src.a.b has a file
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return False
+    return spec is not None and bool(spec.origin) and spec.origin.endswith(".py")
+
+
+def _imported_modules(source: str) -> set:
+    """
+    ``src.*`` modules named by the import statements of ``source``,
+    including imports inside functions.
+    """
+
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return {n for n in names if n.startswith("src.") and _is_source_module(n)}
+
+
+def source_digest(module_name: str) -> str:
+    """
+    Hash of a module's source and of all ``src.*`` modules it depends on.
+    """
+
+    seen = set()
+    pending = [module_name]
+    digest = hashlib.sha256()
+
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+
+        source = inspect.getsource(importlib.import_module(name))
+        digest.update(name.encode())
+        digest.update(source.encode())
+        pending.extend(sorted(_imported_modules(source) - seen))
+
+    return digest.hexdigest()
+
+
+def stage_key(stage, cache_dir: str = CACHE_DIR) -> str:
+    digest = hashlib.sha256()
+    digest.update(stage.target.encode())
+    digest.update(json.dumps(stage.kwargs, sort_keys=True, default=str).encode())
+    digest.update(source_digest(stage.target.split(":")[0]).encode())
+
+    for path in stage.inputs:
+        digest.update(path.encode())
+        digest.update(path_digest(path, cache_dir).encode())
+
+    return digest.hexdigest()
+
+
+def _entry_size(entry_dir: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(entry_dir)
+        for name in files
+    )
+
+
+def evict_lru(entries, max_bytes: int, keep=()):
+    """
+    Remove the least-recently-used of ``entries`` (``(last_used, size,
+    path)`` tuples, files or directories) until their total size fits
+    ``max_bytes``. Paths in ``keep`` are never removed.
+    """
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+        total -= size
+        log(f"Evicted cache entry {os.path.basename(path)[:12]} ({size} bytes)")
+
+
+def evict(cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+    """
+    Remove least-recently-used entries until the cache fits ``max_bytes``.
+    """
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        manifest = os.path.join(cache_dir, name, "manifest.json")
+        if os.path.exists(manifest):
+            entries.append((os.path.getmtime(manifest), _entry_size(os.path.join(cache_dir, name)),
+                            os.path.join(cache_dir, name)))
+    evict_lru(entries, max_bytes)
+
+
+def run_cached(stage, cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+    """
+    Run ``stage`` unless an identical run is cached; restore its outputs
+    either way. Returns the stage result on a miss and None on a hit.
+    """
+
+    if not stage.cacheable:
+        log(f"[cache] {stage.name}: not cacheable, running stage")
+        return stage.resolve()(**stage.kwargs)
+
+    start = time.perf_counter()
+    key = stage_key(stage, cache_dir)
+    entry_dir = os.path.join(cache_dir, key)
+    manifest_path = os.path.join(entry_dir, "manifest.json")
+
+    # -------------------------
+    # Cache hit: restore outputs
+    # -------------------------
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        for stored, output in manifest["outputs"]:
+            if os.path.dirname(output):
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+            _copy(os.path.join(entry_dir, stored), output)
+
+        os.utime(manifest_path)
+        log(f"[cache] {stage.name}: hit {key[:12]} "
+            f"({time.perf_counter() - start:.2f}s)")
+        return None
+
+    # -------------------------
+    # Cache miss: run and store outputs
+    # -------------------------
+    log(f"[cache] {stage.name}: miss {key[:12]}, running stage")
+    result = stage.resolve()(**stage.kwargs)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    outputs = []
+
+    for i, output in enumerate(stage.outputs):
+        stored = f"{i}_{os.path.basename(output)}"
+        _copy(output, os.path.join(tmp_dir, stored))
+        outputs.append((stored, output))
+
+    _atomic_write_json(
+        {"stage": stage.name, "key": key, "outputs": outputs, "created": time.time()},
+        os.path.join(tmp_dir, "manifest.json")
+    )
+
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # Another process stored the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    evict(cache_dir, max_bytes)
+    log(f"[cache] {stage.name}: stored {key[:12]} "
+        f"({time.perf_counter() - start:.2f}s)")
+    return result
+
+
+if __name__ == "__main__":
+    from src.pipeline.stages import STAGES
+
+    for name in sys.argv[1:] or STAGES:
+        run_cached(STAGES[name])
+
+        # The last stdout line is pushed to XCom by the Airflow BashOperator
+        summary = stage_summary(name) or {"stage": name, "status": "ok"}
+        summary["cache"] = "miss" if "wall_s" in summary else "hit"
+        print(json.dumps(summary))
@@ -0,0 +1,318 @@
+import cProfile
+import functools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS from getrusage
+    resource = None
+
+
+# -------------------------
+# Structured stage instrumentation
+# -------------------------
+# ``stage`` (decorator) and ``step`` (context manager) record wall time,
+# CPU time, rows in/out, bytes read/written and memory for a pipeline
+# stage and its sub-steps. Records and ``log`` messages are appended as
+# JSON lines to PDM_METRICS_PATH and echoed to stdout in readable form.
+#
+# Environment switches:
+#   PDM_METRICS_PATH   JSON lines file (default logs/metrics.jsonl, "" disables)
+#   PDM_PROFILE        comma-separated stage names (or "all") to run under cProfile
+#   PDM_PROFILE_DIR    where .prof files are written (default logs/profiles)
+#   PDM_TRACE_MEMORY   "1" to record Python-allocated peak memory per step
+
+METRICS_PATH = os.environ.get("PDM_METRICS_PATH", "logs/metrics.jsonl")
+PROFILE_DIR = os.environ.get("PDM_PROFILE_DIR", "logs/profiles")
+
+_local = threading.local()
+_records = []
+_write_lock = threading.Lock()
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _emit(record: dict):
+    record = {"ts": time.time(), "host": socket.gethostname(), "pid": os.getpid(), **record}
+    _records.append(record)
+
+    path = os.environ.get("PDM_METRICS_PATH", METRICS_PATH)
+    if path:
+        line = json.dumps(record, default=str) + "\n"
+        with _write_lock:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "a") as f:
+                f.write(line)
+
+
+def _rss_mb():
+    # Current resident set size (Linux); None where /proc is unavailable
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mb():
+    # VmHWM (Linux) belongs to the current address space; ru_maxrss survives
+    # exec, so a spawned process would report its parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 1024
+
+
+def file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def current_stage():
+    stack = _stack()
+    return stack[0].stage if stack else None
+
+
+def log(message: str, **fields):
+    """
+    Structured replacement for ``print``: emits a log record and prints
+    ``message`` followed by the fields.
+    """
+
+    stack = _stack()
+    _emit({
+        "event": "log",
+        "stage": stack[0].stage if stack else None,
+        "step": stack[-1].name if stack else None,
+        "message": message,
+        **fields
+    })
+
+    details = " ".join(f"{k}={v}" for k, v in fields.items())
+    print(f"{message} {details}".rstrip())
+
+
+class Span:
+    """
+    Measurements of one stage or sub-step. ``rows_in``/``rows_out`` and the
+    byte counters can be set inside the ``with`` block.
+    """
+
+    def __init__(self, name: str, rows_in: int = None, **fields):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.fields = fields
+        self.stage = None
+        self.parent = None
+        self.record = None
+        self._peak = 0
+
+    def read(self, path: str):
+        self.bytes_read += file_size(path)
+
+    def wrote(self, path: str):
+        self.bytes_written += file_size(path)
+
+    def __enter__(self):
+        stack = _stack()
+        if stack:
+            self.parent = stack[-1]
+            self.stage = stack[0].stage
+        else:
+            self.stage = self.name
+
+        if tracemalloc.is_tracing():
+            if self.parent is not None:
+                self.parent._peak = max(self.parent._peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        stack.append(self)
+        self._rss_start = _rss_mb()
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        _stack().pop()
+
+        rss = _rss_mb()
+        record = {
+            "event": "stage" if self.parent is None else "step",
+            "stage": self.stage,
+            "step": self.name,
+            "parent": None if self.parent is None else self.parent.name,
+            "status": "ok" if exc_type is None else "failed",
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "rss_mb": rss,
+            "rss_delta_mb": None if rss is None or self._rss_start is None else rss - self._rss_start,
+            "peak_rss_mb": _peak_rss_mb(),
+            **self.fields
+        }
+
+        if tracemalloc.is_tracing():
+            peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            record["py_peak_mb"] = peak / 2 ** 20
+            if self.parent is not None:
+                self.parent._peak = max(self.parent._peak, peak)
+            tracemalloc.reset_peak()
+
+        # Roll counters up so the stage record covers its sub-steps: bytes
+        # add up, rows in come from the first step that reports them and
+        # rows out from the last
+        if self.parent is not None:
+            self.parent.bytes_read += self.bytes_read
+            self.parent.bytes_written += self.bytes_written
+            if self.parent.rows_in is None:
+                self.parent.rows_in = self.rows_in
+            if self.rows_out is not None:
+                self.parent.rows_out = self.rows_out
+
+        self.record = record
+        _emit(record)
+        return False
+
+
+def step(name: str, rows_in: int = None, **fields) -> Span:
+    """
+    Context manager timing a sub-step of the current stage.
+    """
+
+    return Span(name, rows_in=rows_in, **fields)
+
+
+def _profiled(name: str) -> bool:
+    selected = {s.strip() for s in os.environ.get("PDM_PROFILE", "").split(",") if s.strip()}
+    return "all" in selected or name in selected
+
+
+def stage(name: str):
+    """
+    Decorator recording a pipeline stage (or, when called from another
+    instrumented stage, a sub-step of it). Runs the stage under cProfile
+    when its name is listed in PDM_PROFILE.
+    """
+
+    def decorator(func):
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            top_level = not _stack()
+            trace = top_level and os.environ.get("PDM_TRACE_MEMORY") == "1"
+            if trace and not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+            profiler = cProfile.Profile() if top_level and _profiled(name) else None
+
+            try:
+                with Span(name):
+                    if profiler is None:
+                        return func(*args, **kwargs)
+                    return profiler.runcall(func, *args, **kwargs)
+            finally:
+                if profiler is not None:
+                    os.makedirs(PROFILE_DIR, exist_ok=True)
+                    path = os.path.join(PROFILE_DIR, f"{name}-{os.getpid()}.prof")
+                    profiler.dump_stats(path)
+                    log("Profile written", path=path)
+                if trace:
+                    tracemalloc.stop()
+
+        return wrapper
+
+    return decorator
+
+
+# -------------------------
+# Summaries
+# -------------------------
+def stage_summary(name: str = None) -> dict:
+    """
+    Compact summary of the last recorded stage (for logs and Airflow XCom).
+    """
+
+    stages = [r for r in _records if r["event"] == "stage" and (name is None or r["stage"] == name)]
+    if not stages:
+        return {}
+
+    last = stages[-1]
+    steps = [
+        r for r in _records
+        if r["event"] == "step" and r["stage"] == last["stage"] and r["pid"] == last["pid"]
+        and last["ts"] - last["wall_s"] <= r["ts"] <= last["ts"]
+    ]
+    keys = ["wall_s", "cpu_s", "rows_in", "rows_out", "bytes_read", "bytes_written", "peak_rss_mb"]
+    return {
+        "stage": last["stage"],
+        "status": last["status"],
+        **{k: last[k] for k in keys},
+        "steps": {r["step"]: r["wall_s"] for r in steps if r["parent"] == last["stage"]}
+    }
+
+
+# -------------------------
+# Request latency
+# -------------------------
+class LatencyStats:
+    """
+    Request counters and a bounded window of latencies for percentiles,
+    shared by the scoring service and the streaming anomaly detector.
+    """
+
+    def __init__(self, window: int = 10_000):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record_batch(self, latencies):
+        with self._lock:
+            self.latencies.extend(latencies)
+            self.requests += len(latencies)
+            self.batches += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lat = np.array(self.latencies) * 1000
+            elapsed = time.perf_counter() - self.started
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "throughput_rps": self.requests / elapsed if elapsed else 0.0,
+                "p50_ms": float(np.percentile(lat, 50)) if lat.size else None,
+                "p99_ms": float(np.percentile(lat, 99)) if lat.size else None
+            }
@@ -0,0 +1,148 @@
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from src.pipeline.stages import (
+    DRIFT_CHECK, DRIFT_DECISION, STAGES, ancestors, topological_order, validate_graph
+)
+
+
+# -------------------------
+# Local multiprocess pipeline runner
+# -------------------------
+# Executes the stage graph from src/pipeline/stages.py without Airflow:
+# every stage whose dependencies have finished is submitted to a process
+# pool, so independent analyses run side by side and the wall-clock time
+# approaches the critical path rather than the sum of all stages. With
+# ``gate_on_drift``, the gated stages are dropped (and treated as done by
+# their dependents) when the drift check finds no feature drift, as the
+# Airflow DAG's drift gate does.
+
+
+def _run_stage(name: str, use_cache: bool):
+    # Figures are rendered in worker processes without a display
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    # Stages already run side by side here; grids must not start a pool
+    # of their own inside each of them
+    os.environ.setdefault("PDM_GRID_CORES", "1")
+
+    start = time.perf_counter()
+    stage = STAGES[name]
+
+    if use_cache:
+        from src.pipeline.cache import run_cached
+        run_cached(stage)
+    else:
+        stage.resolve()(**stage.kwargs)
+
+    return time.perf_counter() - start
+
+
+def critical_path(durations: dict, stages=STAGES):
+    """
+    Longest chain of dependent stages by measured duration.
+    """
+
+    finish = {}
+    previous = {}
+
+    for name in topological_order(stages):
+        if name not in durations:
+            continue
+        deps = [d for d in stages[name].depends_on if d in finish]
+        before = max(deps, key=finish.get, default=None)
+        previous[name] = before
+        finish[name] = durations[name] + (finish[before] if before else 0.0)
+
+    name = max(finish, key=finish.get)
+    path = []
+    while name:
+        path.append(name)
+        name = previous[name]
+    return path[::-1], max(finish.values())
+
+
+def run_pipeline(targets=None, workers: int = None, use_cache: bool = True,
+                 gate_on_drift: bool = False):
+    """
+    Run ``targets`` (default: every stage) and their upstream stages
+    concurrently. Returns the per-stage durations in seconds.
+    """
+
+    validate_graph()
+
+    selected = set(targets or STAGES)
+    for name in list(selected):
+        selected |= ancestors(name)
+
+    pending = {name: set(STAGES[name].depends_on) & selected for name in selected}
+    durations = {}
+    failed = []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+
+        while pending or running:
+            # Submit every stage whose dependencies are done
+            for name in [n for n, deps in pending.items() if not deps]:
+                del pending[name]
+                running[pool.submit(_run_stage, name, use_cache)] = name
+                print(f"[run] started {name}")
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    durations[name] = future.result()
+                except Exception as exc:
+                    failed.append(name)
+                    print(f"[run] FAILED {name}: {exc!r}")
+                    continue
+
+                print(f"[run] finished {name} in {durations[name]:.2f}s")
+                done = [name]
+
+                if name == DRIFT_CHECK and gate_on_drift:
+                    from src.modeling.drift_monitor import should_retrain
+
+                    if not should_retrain(DRIFT_DECISION):
+                        gated = [n for n in pending if STAGES[n].gated]
+                        for n in gated:
+                            del pending[n]
+                            print(f"[run] skipped {n}: no feature drift")
+                        done += gated
+
+                for deps in pending.values():
+                    deps.difference_update(done)
+
+    wall = time.perf_counter() - start
+    skipped = sorted(pending)
+
+    if durations:
+        path, path_time = critical_path(durations)
+        print(f"Wall-clock: {wall:.2f}s | sum of stages: {sum(durations.values()):.2f}s "
+              f"| critical path: {path_time:.2f}s ({' -> '.join(path)})")
+
+    if failed:
+        raise RuntimeError(f"Stages failed: {failed}; not run: {skipped}")
+
+    return durations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the PdM pipeline locally in parallel")
+    parser.add_argument("stages", nargs="*", help="target stages (default: all)")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the stage cache")
+    parser.add_argument("--gate-on-drift", action="store_true",
+                        help="skip the gated (model-fitting) stages when no feature drift is found")
+    args = parser.parse_args()
+
+    run_pipeline(args.stages, workers=args.workers, use_cache=not args.no_cache,
+                 gate_on_drift=args.gate_on_drift)
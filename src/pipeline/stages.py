@@ -0,0 +1,297 @@
+from dataclasses import dataclass, field
+import importlib
+import os
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One pipeline step: the function to call, its keyword arguments, the
+    files it reads and writes and the stages that must finish first.
+    Gated stages refit models on the ABT and are skipped when the drift
+    check finds no feature drift; their previous outputs stay in place.
+    Stages that are not ``cacheable`` write more than their outputs and
+    always run instead of being restored from the stage cache.
+    """
+
+    name: str
+    target: str
+    kwargs: dict = field(default_factory=dict)
+    inputs: tuple = ()
+    outputs: tuple = ()
+    depends_on: tuple = ()
+    gated: bool = False
+    cacheable: bool = True
+
+    def resolve(self):
+        module_name, func_name = self.target.split(":")
+        return getattr(importlib.import_module(module_name), func_name)
+
+
+RAW_DATA = "data/raw/ai4i2020.csv"
+SNAPSHOT = "data/raw/ai4i2020_snapshot.arrow"
+SNAPSHOT_PARTS = "data/raw/ai4i2020_partitioned"
+CLEANED = "data/cleaned/ai4i2020_cleaned.arrow"
+ABT = "data/processed/abt.arrow"
+ABT_STATE = "data/processed/abt_state.json"
+ABT_PARTS = "data/processed/abt_partitioned"
+RESULTS = "data/results"
+DRIFT_REFERENCE = "models/drift_reference.json"
+DRIFT_DECISION = f"{RESULTS}/drift_decision.json"
+DRIFT_CHECK = "drift_check"
+
+# Registry features added to the ABT (see feature_registry.FEATURE_SETS)
+FEATURE_SET = os.environ.get("PDM_FEATURE_SET", "default")
+
+
+def result(name: str) -> str:
+    # Result frame saved by an analysis for the report stage
+    return f"{RESULTS}/{name}.arrow"
+
+
+# Saved results of the consolidated RQ1-RQ3 experiment grid
+GRID_RESULTS = (result("Experiment_Results"), result("Experiment_Importances"))
+
+# Analysis stages whose results the report stage renders
+ANALYSES = (
+    "drift_check", "train_model", "rq1_single_vs_fused", "rq2_fusion_strategy", "rq3_model_comparison",
+    "rq3_capacity_curve", "experiment_results", "rq4_anomaly_detection", "rq5_economic_analysis"
+)
+
+
+STAGES = {
+    stage.name: stage for stage in [
+        Stage(
+            name="ingest_data",
+            target="src.data_ingestion.ingest_data:ingest_data_streaming",
+            kwargs={"input_path": RAW_DATA, "output_path": SNAPSHOT},
+            inputs=(RAW_DATA,),
+            outputs=(SNAPSHOT,)
+        ),
+        Stage(
+            name="partition_snapshot",
+            target="src.data_ingestion.ingest_data:partition_snapshot",
+            kwargs={"input_path": SNAPSHOT, "output_path": SNAPSHOT_PARTS},
+            inputs=(SNAPSHOT,),
+            outputs=(SNAPSHOT_PARTS,),
+            depends_on=("ingest_data",)
+        ),
+        Stage(
+            name="clean_data",
+            target="src.data_cleaning.clean_data:clean_dataset",
+            kwargs={"input_path": SNAPSHOT, "output_path": CLEANED},
+            inputs=(SNAPSHOT,),
+            outputs=(CLEANED,),
+            depends_on=("ingest_data",)
+        ),
+        Stage(
+            name="build_features",
+            target="src.feature_engineering.build_features:build_features",
+            kwargs={"input_path": CLEANED, "output_path": ABT, "state_path": ABT_STATE,
+                    "feature_set": FEATURE_SET},
+            inputs=(CLEANED,),
+            outputs=(ABT, ABT_STATE),
+            depends_on=("clean_data",)
+        ),
+        Stage(
+            name="partition_abt",
+            target="src.feature_engineering.build_features:partition_abt",
+            kwargs={"input_path": ABT, "output_path": ABT_PARTS},
+            inputs=(ABT,),
+            outputs=(ABT_PARTS,),
+            depends_on=("build_features",)
+        ),
+        Stage(
+            name=DRIFT_CHECK,
+            target="src.modeling.drift_monitor:check_drift",
+            kwargs={"input_path": ABT, "reference_path": DRIFT_REFERENCE, "output_path": DRIFT_DECISION},
+            # The reference is written by the previous train_model run
+            # (absent before the first one)
+            inputs=(ABT, DRIFT_REFERENCE),
+            outputs=(DRIFT_DECISION, result("Drift_Report")),
+            depends_on=("build_features",)
+        ),
+        Stage(
+            name="train_model",
+            target="src.modeling.train_model:train_model",
+            kwargs={"input_path": ABT},
+            inputs=(ABT,),
+            outputs=(
+                result("RQ3_Table1"),
+                result("Model_Feature_Importances"),
+                result("Model_Permutation_Importances"),
+                result("Model_Group_Importances"),
+                result("Model_Confusion"),
+                result("Model_Threshold_Curve"),
+                "models/random_forest_model.pkl",
+                "models/random_forest_compiled.npz",
+                DRIFT_REFERENCE
+            ),
+            depends_on=("build_features", DRIFT_CHECK),
+            gated=True,
+            # Registers a new model version, which a restored cache entry
+            # would not
+            cacheable=False
+        ),
+        # RQ1-RQ3 tables are built from the consolidated grid's results
+        Stage(
+            name="rq1_single_vs_fused",
+            target="src.evaluation.rq1_single_vs_fused:run_rq1_experiment",
+            kwargs={"grid_dir": RESULTS},
+            inputs=GRID_RESULTS,
+            outputs=(result("RQ1_Table1"), result("RQ1_Importances")),
+            depends_on=("experiment_results",)
+        ),
+        Stage(
+            name="rq2_fusion_strategy",
+            target="src.evaluation.rq2_fusion_strategy:run_rq2_experiment",
+            kwargs={"grid_dir": RESULTS},
+            inputs=GRID_RESULTS,
+            outputs=(result("RQ2_Table1"),),
+            depends_on=("experiment_results",)
+        ),
+        Stage(
+            name="rq3_model_comparison",
+            target="src.evaluation.rq3_model_comparison:run_rq3_experiment",
+            kwargs={"grid_dir": RESULTS},
+            inputs=GRID_RESULTS,
+            outputs=(result("RQ3_Capacity"),),
+            depends_on=("experiment_results",)
+        ),
+        Stage(
+            name="rq3_capacity_curve",
+            target="src.evaluation.rq3_model_comparison:run_capacity_curve",
+            kwargs={"input_path": ABT},
+            inputs=(ABT,),
+            outputs=(result("RQ3_Capacity_Curve"),),
+            depends_on=("build_features", DRIFT_CHECK),
+            gated=True
+        ),
+        Stage(
+            name="experiment_results",
+            target="src.evaluation.experiment_grid:run_all_experiments",
+            kwargs={"raw_path": SNAPSHOT, "abt_path": ABT},
+            inputs=(SNAPSHOT, ABT),
+            outputs=GRID_RESULTS,
+            depends_on=("ingest_data", "build_features", DRIFT_CHECK),
+            gated=True
+        ),
+        Stage(
+            name="rq4_anomaly_detection",
+            target="src.evaluation.anomaly_detection:run_anomaly_detection",
+            kwargs={"input_path": ABT_PARTS},
+            inputs=(ABT_PARTS,),
+            outputs=(result("RQ4_Table1"),),
+            depends_on=("partition_abt", DRIFT_CHECK),
+            gated=True
+        ),
+        Stage(
+            name="rq5_economic_analysis",
+            target="src.evaluation.rq5_economic_analysis:run_rq5_analysis",
+            kwargs={"input_path": SNAPSHOT_PARTS, "confusion_path": result("Model_Confusion")},
+            inputs=(SNAPSHOT_PARTS, result("Model_Confusion")),
+            outputs=(
+                result("RQ5_Table1"), result("RQ5_Assumptions"),
+                result("RQ5_Costs"), result("RQ5_Savings_Quantiles")
+            ),
+            depends_on=("partition_snapshot", "train_model")
+        )
+    ]
+}
+
+# All tables and figures are rendered in one batch once the analyses are done
+STAGES["report"] = Stage(
+    name="report",
+    target="src.reporting.report:build_report",
+    inputs=tuple(o for name in ANALYSES for o in STAGES[name].outputs if o.startswith(RESULTS)),
+    outputs=(
+        "tables/Results.xlsx",
+        *(f"tables/csv/{name}.csv" for name in [
+            "RQ1_Table1", "RQ2_Table1", "RQ3_Table1", "RQ3_Capacity_Curve", "RQ4_Table1", "RQ5_Table1",
+            "RQ5_Assumptions", "Experiment_Results", "Drift_Report"
+        ]),
+        "figures/RQ1_Fig1.pdf",
+        "figures/RQ1_Fig2.pdf",
+        "figures/RQ2_Fig1.pdf",
+        "figures/RQ3_Fig1.pdf",
+        "figures/RQ3_Fig2.pdf",
+        "figures/RQ3_Fig3.pdf",
+        "figures/RQ4_Fig1.pdf",
+        "figures/RQ5_Fig1.pdf",
+        "figures/RQ5_Fig2.pdf",
+        "figures/Model_Feature_Importances.pdf",
+        "figures/Model_Permutation_Importances.pdf",
+        "figures/Model_Group_Importances.pdf",
+        "figures/Model_ROC_Curve.pdf",
+        "figures/Model_PR_Curve.pdf",
+        "figures/Model_Threshold_Curve.pdf",
+        f"{RESULTS}/report_manifest.json"
+    ),
+    depends_on=ANALYSES
+)
+
+
+def ancestors(name: str, stages=STAGES) -> set:
+    """
+    All stages that ``name`` transitively depends on.
+    """
+
+    found = set()
+    pending = list(stages[name].depends_on)
+    while pending:
+        dep = pending.pop()
+        if dep not in found:
+            found.add(dep)
+            pending.extend(stages[dep].depends_on)
+    return found
+
+
+def topological_order(stages=STAGES) -> list:
+    """
+    Stage names ordered so every stage follows its dependencies.
+    """
+
+    order = []
+    done = set()
+
+    def visit(name, path=()):
+        if name in done:
+            return
+        if name in path:
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + (name,))}")
+        for dep in stages[name].depends_on:
+            visit(dep, path + (name,))
+        done.add(name)
+        order.append(name)
+
+    for name in stages:
+        visit(name)
+    return order
+
+
+def validate_graph(stages=STAGES):
+    """
+    Check dependencies exist, form no cycle, that gated stages wait for the
+    drift check, and that stages which may run concurrently never write the
+    same output file.
+    """
+
+    for stage in stages.values():
+        for dep in stage.depends_on:
+            if dep not in stages:
+                raise ValueError(f"{stage.name} depends on unknown stage {dep}")
+        if stage.gated and DRIFT_CHECK not in stage.depends_on:
+            raise ValueError(f"Gated stage {stage.name} must depend on {DRIFT_CHECK}")
+
+    topological_order(stages)
+
+    writers = {}
+    for stage in stages.values():
+        for output in stage.outputs:
+            writers.setdefault(output, []).append(stage.name)
+
+    for output, names in writers.items():
+        for i, a in enumerate(names):
+            for b in names[i + 1:]:
+                if a not in ancestors(b, stages) and b not in ancestors(a, stages):
+                    raise ValueError(f"{a} and {b} may run concurrently but both write {output}")
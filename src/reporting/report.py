@@ -0,0 +1,323 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+from src.io.dataset import read_dataset, write_dataset
+from src.pipeline.instrumentation import log, stage, step
+
+
+# -------------------------
+# Batched report rendering
+# -------------------------
+# Analysis stages only compute: they store their result frames as Arrow
+# files in RESULTS_DIR with ``save_result``. The ``report`` stage turns all
+# of them into the deliverables at once:
+#
+#   tables/Results.xlsx    one sheet per table
+#   tables/csv/<name>.csv  plain copies of the same tables
+#   figures/*.pdf          rendered in parallel worker processes
+#
+# matplotlib is only imported by the workers (with the Agg backend), and a
+# manifest stores a hash of every artifact's definition and input results,
+# so a re-run only rebuilds artifacts whose results changed.
+
+RESULTS_DIR = os.environ.get("PDM_RESULTS_DIR", "data/results")
+WORKBOOK = "tables/Results.xlsx"
+CSV_DIR = "tables/csv"
+
+
+@dataclass(frozen=True)
+class Table:
+    """
+    A result frame written as a workbook sheet and a CSV file.
+    """
+
+    name: str
+    result: str
+    na_rep: str = ""
+
+
+@dataclass(frozen=True)
+class Figure:
+    """
+    A bar (or line) chart of ``columns`` against ``index`` of a result frame.
+    Axis labels may name columns in braces, filled from the first row.
+    """
+
+    path: str
+    result: str
+    index: str
+    columns: tuple
+    kind: str = "bar"
+    title: str = ""
+    xlabel: str = None
+    ylabel: str = None
+    figsize: tuple = (7, 5)
+    legend: bool = True
+    rotation: int = None
+    top: int = None
+    invert_yaxis: bool = False
+    logx: bool = False
+    marker: str = None
+
+
+TABLES = [
+    Table("RQ1_Table1", "RQ1_Table1"),
+    Table("RQ2_Table1", "RQ2_Table1"),
+    Table("RQ3_Table1", "RQ3_Table1", na_rep="Not defined"),
+    Table("RQ3_Capacity_Curve", "RQ3_Capacity_Curve"),
+    Table("RQ4_Table1", "RQ4_Table1"),
+    Table("RQ5_Table1", "RQ5_Table1"),
+    Table("RQ5_Assumptions", "RQ5_Assumptions"),
+    Table("Experiment_Results", "Experiment_Results"),
+    Table("Drift_Report", "Drift_Report")
+]
+
+FIGURES = [
+    Figure(
+        "figures/RQ1_Fig1.pdf", "RQ1_Importances", "Feature", ("Importance",),
+        kind="barh", title="RQ1: Top 10 Feature Importances (RAW Sensor Fusion)",
+        xlabel="Importance", figsize=(8, 5), legend=False, top=10, invert_yaxis=True
+    ),
+    Figure(
+        "figures/RQ1_Fig2.pdf", "RQ1_Importances", "Feature", ("Permutation Importance",),
+        kind="barh", title="RQ1: Top 10 Permutation Importances (RAW Sensor Fusion)",
+        xlabel="Drop in test {Permutation Scoring}", figsize=(8, 5), legend=False, top=10, invert_yaxis=True
+    ),
+    Figure(
+        "figures/RQ2_Fig1.pdf", "RQ2_Table1", "Fusion Strategy", ("Accuracy", "F1-score"),
+        title="RQ2: Sensor Fusion Strategy Comparison", ylabel="Score", rotation=0
+    ),
+    Figure(
+        "figures/RQ3_Fig1.pdf", "RQ3_Capacity", "Model", ("Accuracy", "F1-score"),
+        title="RQ3: Effect of Model Capacity on Performance", ylabel="Score", rotation=0
+    ),
+    Figure(
+        "figures/RQ3_Fig2.pdf", "RQ3_Capacity_Curve", "Trees", ("OOB Accuracy", "Accuracy", "F1-score", "AUC"),
+        kind="line", title="RQ3: Performance vs Number of Trees", xlabel="Trees (log scale)",
+        ylabel="Score", logx=True, marker="o"
+    ),
+    Figure(
+        "figures/RQ3_Fig3.pdf", "RQ3_Capacity_Curve", "Fit Seconds", ("OOB Accuracy", "Accuracy", "F1-score", "AUC"),
+        kind="line", title="RQ3: Performance vs Cumulative Fit Time", xlabel="Fit time (s)",
+        ylabel="Score", marker="o"
+    ),
+    Figure(
+        "figures/RQ4_Fig1.pdf", "RQ4_Table1", "Label", ("Count",),
+        title="Anomaly Detection Results", ylabel="Number of Observations",
+        figsize=(6, 4), legend=False
+    ),
+    Figure(
+        "figures/RQ5_Fig1.pdf", "RQ5_Costs", "Scenario", ("Cost (€)",),
+        title="RQ5: Estimated Maintenance Cost Reduction", ylabel="Cost (€)",
+        figsize=(6, 4), legend=False, rotation=0
+    ),
+    Figure(
+        "figures/RQ5_Fig2.pdf", "RQ5_Savings_Quantiles", "Percentile", ("Savings (€)",),
+        kind="line", title="RQ5: Distribution of Simulated Cost Savings",
+        xlabel="Percentile of scenarios", ylabel="Savings (€)", figsize=(6, 4), legend=False
+    ),
+    Figure(
+        "figures/Model_Feature_Importances.pdf", "Model_Feature_Importances", "Feature", ("Importance",),
+        title="Top 10 Feature Importances", ylabel="Importance",
+        figsize=(8, 5), legend=False, top=10
+    ),
+    Figure(
+        "figures/Model_Permutation_Importances.pdf", "Model_Permutation_Importances", "Feature", ("Importance",),
+        title="Top 10 Permutation Importances (test set)", ylabel="Drop in test {Scoring}",
+        figsize=(8, 5), legend=False, top=10
+    ),
+    Figure(
+        "figures/Model_Group_Importances.pdf", "Model_Group_Importances", "Feature", ("Importance",),
+        kind="barh", title="Permutation Importance of Correlated Feature Groups (test set)",
+        xlabel="Drop in test {Scoring}", figsize=(9, 5), legend=False, invert_yaxis=True
+    ),
+    Figure(
+        "figures/Model_ROC_Curve.pdf", "Model_Threshold_Curve", "FPR", ("TPR",),
+        kind="line", title="ROC Curve (test set)", xlabel="False positive rate",
+        ylabel="True positive rate", figsize=(6, 5), legend=False
+    ),
+    Figure(
+        "figures/Model_PR_Curve.pdf", "Model_Threshold_Curve", "Recall", ("Precision",),
+        kind="line", title="Precision-Recall Curve (test set)", ylabel="Precision",
+        figsize=(6, 5), legend=False
+    ),
+    Figure(
+        "figures/Model_Threshold_Curve.pdf", "Model_Threshold_Curve", "Threshold", ("Cost",),
+        kind="line", title="Expected Cost vs Alarm Threshold (test set)",
+        xlabel="Failure probability threshold", ylabel="Cost (€)", figsize=(6, 4), legend=False
+    )
+]
+
+
+def result_path(name: str, results_dir: str = RESULTS_DIR) -> str:
+    return os.path.join(results_dir, f"{name}.arrow")
+
+
+def save_result(name: str, df: pd.DataFrame, results_dir: str = RESULTS_DIR) -> str:
+    """
+    Store an analysis result frame for the report stage.
+    """
+
+    return write_dataset(df, result_path(name, results_dir))
+
+
+def load_result(name: str, results_dir: str = RESULTS_DIR) -> pd.DataFrame:
+    return read_dataset(result_path(name, results_dir))
+
+
+# -------------------------
+# Change detection
+# -------------------------
+def _manifest_path(results_dir: str) -> str:
+    return os.path.join(results_dir, "report_manifest.json")
+
+
+def _artifact_digest(spec, results_dir: str) -> str:
+    # The definition plus the bytes of the result it is built from
+    digest = hashlib.sha256(repr(spec).encode())
+    with open(result_path(spec.result, results_dir), "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _load_manifest(results_dir: str) -> dict:
+    try:
+        with open(_manifest_path(results_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest: dict, results_dir: str):
+    path = _manifest_path(results_dir)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# -------------------------
+# Rendering
+# -------------------------
+def _render_figure(spec: Figure, results_dir: str) -> str:
+    # Runs in a worker process; matplotlib is only imported here
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    frame = load_result(spec.result, results_dir)
+    first = frame.iloc[0].to_dict() if len(frame) else {}
+    data = frame.set_index(spec.index)[list(spec.columns)]
+    if spec.top is not None:
+        data = data.head(spec.top)
+
+    fig, ax = plt.subplots(figsize=spec.figsize)
+    options = {"marker": spec.marker} if spec.marker else {}
+    data.plot(kind=spec.kind, ax=ax, legend=spec.legend, logx=spec.logx, **options)
+
+    if spec.invert_yaxis:
+        ax.invert_yaxis()
+    ax.set_title(spec.title)
+    if spec.xlabel is not None:
+        ax.set_xlabel(spec.xlabel.format_map(first))
+    if spec.ylabel is not None:
+        ax.set_ylabel(spec.ylabel.format_map(first))
+    if spec.rotation is not None:
+        ax.tick_params(axis="x", labelrotation=spec.rotation)
+
+    fig.tight_layout()
+    os.makedirs(os.path.dirname(spec.path) or ".", exist_ok=True)
+    fig.savefig(spec.path)
+    plt.close(fig)
+    return spec.path
+
+
+def _render_figures(figures, results_dir: str, workers: int = None):
+    workers = min(len(figures), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [_render_figure(spec, results_dir) for spec in figures]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_render_figure, figures, [results_dir] * len(figures)))
+
+
+def _write_tables(tables, changed, results_dir: str, workbook: str, csv_dir: str):
+    frames = {spec.name: load_result(spec.result, results_dir) for spec in tables}
+
+    with step("write_csv") as s:
+        os.makedirs(csv_dir, exist_ok=True)
+        for spec in changed:
+            path = os.path.join(csv_dir, f"{spec.name}.csv")
+            frames[spec.name].to_csv(path, index=False, na_rep=spec.na_rep)
+            s.wrote(path)
+
+    # The workbook is a single file: rewrite it whole when any sheet changed
+    with step("write_workbook", sheets=len(tables)) as s:
+        os.makedirs(os.path.dirname(workbook) or ".", exist_ok=True)
+        with pd.ExcelWriter(workbook, engine="openpyxl") as writer:
+            for spec in tables:
+                frames[spec.name].to_excel(writer, sheet_name=spec.name, index=False, na_rep=spec.na_rep)
+        s.wrote(workbook)
+
+
+@stage("report")
+def build_report(results_dir: str = RESULTS_DIR, workbook: str = WORKBOOK,
+                 csv_dir: str = CSV_DIR, force: bool = False, workers: int = None):
+    """
+    Render every table and figure whose result frame exists; unchanged
+    artifacts are skipped unless ``force``. Returns the rebuilt paths.
+    """
+
+    tables = [t for t in TABLES if os.path.exists(result_path(t.result, results_dir))]
+    figures = [f for f in FIGURES if os.path.exists(result_path(f.result, results_dir))]
+    missing = sorted({a.result for a in TABLES + FIGURES} - {a.result for a in tables + figures})
+    if missing:
+        log("Results not found, skipping their artifacts", missing=missing)
+
+    manifest = {} if force else _load_manifest(results_dir)
+    digests = {}
+    for spec in tables:
+        digests[os.path.join(csv_dir, f"{spec.name}.csv")] = _artifact_digest(spec, results_dir)
+    for spec in figures:
+        digests[spec.path] = _artifact_digest(spec, results_dir)
+
+    def stale(path):
+        return manifest.get(path) != digests[path] or not os.path.exists(path)
+
+    changed_tables = [t for t in tables if stale(os.path.join(csv_dir, f"{t.name}.csv"))]
+    changed_figures = [f for f in figures if stale(f.path)]
+    rebuilt = []
+
+    if changed_tables or (tables and not os.path.exists(workbook)):
+        _write_tables(tables, changed_tables, results_dir, workbook, csv_dir)
+        rebuilt += [workbook] + [os.path.join(csv_dir, f"{t.name}.csv") for t in changed_tables]
+
+    if changed_figures:
+        with step("render_figures", figures=len(changed_figures)) as s:
+            for path in _render_figures(changed_figures, results_dir, workers):
+                s.wrote(path)
+                rebuilt.append(path)
+
+    manifest.update(digests)
+    _save_manifest(manifest, results_dir)
+
+    log("Report rendered", rebuilt=len(rebuilt),
+        unchanged=len(tables) + len(figures) - len(changed_tables) - len(changed_figures))
+    return rebuilt
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render all RQ tables and figures")
+    parser.add_argument("--results", default=RESULTS_DIR)
+    parser.add_argument("--force", action="store_true", help="rebuild unchanged artifacts too")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    build_report(args.results, force=args.force, workers=args.workers)
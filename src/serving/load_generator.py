@@ -0,0 +1,96 @@
+import argparse
+import json
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+from src.io.dataset import read_dataset
+from src.serving.scoring_service import FEATURE_COLUMNS, ROLLING_FEATURES
+
+# Raw sensor columns a client sends with every reading
+READING_COLUMNS = [c for c in FEATURE_COLUMNS if c not in ROLLING_FEATURES and not c.endswith("_z")]
+
+
+def _http_scorer(url: str):
+    def score(machine_id, reading):
+        request = urllib.request.Request(
+            url + "/score",
+            data=json.dumps({"machine_id": machine_id, "reading": reading}).encode(),
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    return score
+
+
+def generate_load(score, readings, concurrency: int = 16, duration: float = 10.0):
+    """
+    Replay ``readings`` from ``concurrency`` client threads for ``duration``
+    seconds and return client-side latency percentiles and throughput.
+    """
+
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    stop_at = time.perf_counter() + duration
+
+    def client(i):
+        k = i
+        while time.perf_counter() < stop_at:
+            machine_id, reading = readings[k % len(readings)]
+            start = time.perf_counter()
+            try:
+                score(machine_id, reading)
+            except Exception:
+                errors[i] += 1
+            latencies[i].append(time.perf_counter() - start)
+            k += concurrency
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    lat = np.concatenate([np.array(l) for l in latencies]) * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": int(lat.size),
+        "errors": sum(errors),
+        "throughput_rps": lat.size / elapsed,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99))
+    }
+
+
+def load_readings(path: str, n_machines: int = 50):
+    """
+    Sensor readings from a dataset, spread over ``n_machines`` machine ids.
+    """
+
+    df = read_dataset(path, columns=READING_COLUMNS)
+    return [
+        (f"machine-{i % n_machines}", row)
+        for i, row in enumerate(df.to_dict(orient="records"))
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator for the scoring service")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--data", default="data/raw/ai4i2020_snapshot.arrow")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    readings = load_readings(args.data)
+    score = _http_scorer(args.url)
+
+    for concurrency in args.concurrency:
+        print(json.dumps(generate_load(score, readings, concurrency, args.duration)))
+
+    with urllib.request.urlopen(args.url + "/stats") as response:
+        print("Server stats:", response.read().decode())
@@ -0,0 +1,274 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.feature_engineering.build_features import (
+    ABT_COLUMNS, ROLLING_FEATURES, ROLLING_WINDOW, ZSCORE_FEATURES, z_params
+)
+from src.modeling.model_registry import load_model
+from src.pipeline.instrumentation import LatencyStats, log
+
+FEATURE_COLUMNS = [c for c in ABT_COLUMNS if c != "Machine failure"]
+
+# Seconds a request waits for its score before the front end answers 504
+SCORE_TIMEOUT = 10.0
+
+
+# -------------------------
+# Online scoring service
+# -------------------------
+# The model is loaded once. Each reading updates a per-machine rolling
+# buffer (5-row rolling means, z-scores with the training moments); the
+# resulting feature vectors are scored by a background thread that groups
+# concurrent requests into one predict_proba call.
+#
+# build_features computes the rolling means over the whole history in UDI
+# order, not per machine. The features match the ABT's when the readings
+# of that history are sent in UDI order under one machine_id (see
+# tests/test_scoring_service.py). Readings of several machines are averaged
+# per machine only, so their rolling means differ from the training rows
+# whenever the machines' readings were interleaved in the history.
+DEFAULT_THRESHOLD = 0.5
+
+
+class ScoringService:
+    """
+    In-process scoring API with adaptive micro-batching.
+
+    ``max_batch`` caps a batch; ``max_wait_ms`` is the longest the batcher
+    waits to fill one. The wait is only used while recent batches show
+    concurrent load, so a lone request is scored immediately.
+
+    With ``registry_version`` (a version number or "latest") the model is
+    taken from the model registry instead of ``model_path``.
+    """
+
+    def __init__(self, model_path: str, state_path: str,
+                 max_batch: int = 256, max_wait_ms: float = 2.0,
+                 registry_version=None):
+        if registry_version is not None:
+            self.model = load_model(version=registry_version)
+        else:
+            self.model = joblib.load(model_path, mmap_mode="r")
+        self.classes = list(self.model.classes_)
+        # Registry versions carry their cost-optimal alarm threshold, unless
+        # their test split had no failures to choose it on
+        self.threshold = getattr(self.model, "threshold", DEFAULT_THRESHOLD)
+        if self.threshold is None:
+            log("Registry version has no alarm threshold, alarming at the default",
+                version=registry_version, threshold=DEFAULT_THRESHOLD)
+            self.threshold = DEFAULT_THRESHOLD
+
+        # The z-score parameters the ABT (and so the model) was built with
+        with open(state_path) as f:
+            self.z_params = z_params(json.load(f))
+
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.stats = LatencyStats()
+
+        self._buffers = defaultdict(lambda: defaultdict(lambda: deque(maxlen=ROLLING_WINDOW)))
+        self._buffer_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._load = 1.0
+        self._running = True
+        self._submit_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._batch_loop, daemon=True)
+        self._worker.start()
+
+    # -------------------------
+    # Feature transform
+    # -------------------------
+    def transform(self, machine_id: str, reading: dict):
+        """
+        Feature vector in ABT column order for one sensor reading.
+
+        Until a machine has ``ROLLING_WINDOW`` readings the rolling means
+        use the readings seen so far (``window_full`` is False).
+        """
+
+        with self._buffer_lock:
+            buffers = self._buffers[machine_id]
+            for col in ROLLING_FEATURES.values():
+                buffers[col].append(float(reading[col]))
+            rolling = {f: np.mean(buffers[col]) for f, col in ROLLING_FEATURES.items()}
+            window_full = len(buffers["Torque [Nm]"]) == ROLLING_WINDOW
+
+        values = dict(rolling)
+        for feature, col in ZSCORE_FEATURES.items():
+            mean, std = self.z_params[col]
+            values[feature] = (float(reading[col]) - mean) / std
+        for col in FEATURE_COLUMNS:
+            if col not in values:
+                values[col] = float(reading[col])
+
+        return np.array([values[c] for c in FEATURE_COLUMNS]), window_full
+
+    # -------------------------
+    # Scoring
+    # -------------------------
+    def submit(self, machine_id: str, reading: dict) -> Future:
+        features, window_full = self.transform(machine_id, reading)
+        future = Future()
+        with self._submit_lock:
+            if self._running:
+                self._queue.put((time.perf_counter(), features, window_full, future))
+            else:
+                future.set_exception(RuntimeError("scoring service is closed"))
+        return future
+
+    def score(self, machine_id: str, reading: dict, timeout: float = SCORE_TIMEOUT) -> dict:
+        return self.submit(machine_id, reading).result(timeout)
+
+    def _batch_loop(self):
+        while self._running:
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.perf_counter() + (self.max_wait if self._load > 1.5 else 0.0)
+
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get_nowait() if remaining <= 0 else self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            # Exponentially weighted batch size drives the adaptive wait
+            self._load = 0.8 * self._load + 0.2 * len(batch)
+            self._score_batch(batch)
+
+    def _score_batch(self, batch):
+        X = pd.DataFrame(np.vstack([item[1] for item in batch]), columns=FEATURE_COLUMNS)
+
+        try:
+            proba = self.model.predict_proba(X)
+        except Exception as exc:
+            for item in batch:
+                item[3].set_exception(exc)
+            return
+
+        if 1 in self.classes:
+            p_fail = proba[:, self.classes.index(1)]
+        else:
+            p_fail = np.zeros(len(batch))
+
+        done = time.perf_counter()
+        latencies = []
+        for (enqueued, _, window_full, future), p in zip(batch, p_fail):
+            latencies.append(done - enqueued)
+            future.set_result({
+                "failure_probability": float(p),
+                "prediction": int(p >= self.threshold),
+                "window_full": window_full
+            })
+        self.stats.record_batch(latencies)
+
+    def close(self):
+        """
+        Stop the batcher; requests still queued fail with RuntimeError.
+        """
+
+        with self._submit_lock:
+            self._running = False
+        self._worker.join()
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            item[3].set_exception(RuntimeError("scoring service is closed"))
+
+
+# -------------------------
+# HTTP front end
+# -------------------------
+def make_handler(service: ScoringService):
+
+    class ScoringHandler(BaseHTTPRequestHandler):
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send(200, service.stats.snapshot())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                future = service.submit(str(body["machine_id"]), body["reading"])
+            except (KeyError, ValueError, TypeError) as exc:
+                self._send(400, {"error": repr(exc)})
+                return
+
+            try:
+                result = future.result(SCORE_TIMEOUT)
+            except TimeoutError:
+                self._send(504, {"error": f"not scored within {SCORE_TIMEOUT:g}s"})
+                return
+            except Exception as exc:
+                self._send(500, {"error": repr(exc)})
+                return
+            self._send(200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoringHandler
+
+
+def serve(model_path: str, state_path: str, host: str = "127.0.0.1", port: int = 8080,
+          **batch_options):
+    service = ScoringService(model_path, state_path, **batch_options)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Scoring service listening on http://{host}:{port} (POST /score, GET /stats)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the trained failure model over HTTP")
+    parser.add_argument("--model", default="models/random_forest_model.pkl")
+    parser.add_argument("--state", default="data/processed/abt_state.json")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--registry-version", default=None,
+                        help='serve a registry version ("latest" or a number) instead of --model')
+    args = parser.parse_args()
+
+    serve(args.model, args.state, args.host, args.port,
+          max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+          registry_version=args.registry_version)
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_cleaning.clean_data import clean_data, clean_data_streaming
+from src.io.dataset import read_dataset, write_dataset
+from src.io.schema import AI4I_SCHEMA, csv_dtypes, enforce_schema
+
+RAW = Path(__file__).resolve().parents[1] / "data" / "raw" / "ai4i2020.csv"
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    # Real rows with gaps in every sensor, exact duplicates within and across
+    # chunks, and rows that become duplicates only once imputed
+    df = pd.read_csv(RAW, nrows=1500, dtype=csv_dtypes(AI4I_SCHEMA))
+    rng = np.random.default_rng(0)
+    sensors = [c.name for c in AI4I_SCHEMA if c.nullable]
+    for col in sensors:
+        df.loc[rng.choice(len(df), 40, replace=False), col] = np.nan
+
+    twins = df.iloc[[10, 11, 700]].copy()
+    twins.loc[twins.index[0], sensors[0]] = np.nan
+    df = pd.concat([df, df.iloc[rng.choice(len(df), 60)], twins, df.iloc[:5]], ignore_index=True)
+
+    path = str(tmp_path / "snapshot.arrow")
+    write_dataset(enforce_schema(df, AI4I_SCHEMA)[0], path)
+    return path
+
+
+def _clean_both(path, tmp_path, **kwargs):
+    clean_data(path, str(tmp_path / "memory.arrow"))
+    stats = clean_data_streaming(path, str(tmp_path / "streaming.arrow"), quantiles="exact", **kwargs)
+    return read_dataset(str(tmp_path / "memory.arrow")), read_dataset(str(tmp_path / "streaming.arrow")), stats
+
+
+def test_exact_streaming_matches_in_memory(snapshot, tmp_path):
+    expected, actual, stats = _clean_both(snapshot, tmp_path, chunksize=97)
+    assert stats["duplicates"] >= 65
+    pd.testing.assert_frame_equal(actual, expected.reset_index(drop=True))
+
+
+def test_hash_collisions_keep_distinct_rows(snapshot, tmp_path, monkeypatch):
+    # Every row gets the same hash: only whole-row comparison can tell them apart
+    monkeypatch.setattr(pd.util, "hash_pandas_object",
+                        lambda df, index=False: pd.Series(np.zeros(len(df), dtype="uint64")))
+    expected, actual, _ = _clean_both(snapshot, tmp_path, chunksize=500)
+    pd.testing.assert_frame_equal(actual, expected.reset_index(drop=True))
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from src.modeling.compiled_forest import CompiledForest, compile_forest
+
+# Leaf probabilities are stored as float32
+ATOL = 1e-6
+
+
+def _forest(n_rows=2000, n_classes=2, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n_rows, 5)), columns=[f"f{i}" for i in range(5)])
+    y = (X["f0"] + X["f1"] * X["f2"] > 0).astype(int) + (n_classes > 2) * (X["f3"] > 1)
+    model = RandomForestClassifier(n_estimators=25, min_samples_leaf=2, random_state=seed).fit(X, y)
+    return model, X
+
+
+def test_probabilities_match_sklearn():
+    model, X = _forest()
+    compiled = compile_forest(model)
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), rtol=0, atol=ATOL)
+    # Classes agree wherever the vote is not a tie within float32 rounding
+    proba = model.predict_proba(X)
+    decided = np.abs(proba[:, 1] - proba[:, 0]) > ATOL
+    np.testing.assert_array_equal(compiled.predict(X)[decided], model.predict(X)[decided])
+
+
+def test_probabilities_match_sklearn_on_unseen_rows_and_small_batches():
+    model, X = _forest(n_classes=3)
+    compiled = compile_forest(model)
+    unseen = pd.DataFrame(np.random.default_rng(1).normal(scale=2, size=(500, 5)), columns=X.columns)
+    np.testing.assert_allclose(compiled.predict_proba(unseen, batch_size=7), model.predict_proba(unseen),
+                               rtol=0, atol=ATOL)
+
+
+def test_columns_are_reordered_by_name():
+    model, X = _forest()
+    compiled = compile_forest(model)
+    shuffled = X[X.columns[::-1]]
+    np.testing.assert_allclose(compiled.predict_proba(shuffled), model.predict_proba(X), rtol=0, atol=ATOL)
+
+
+def test_saved_arrays_round_trip(tmp_path):
+    model, X = _forest()
+    compile_forest(model).save_arrays(str(tmp_path / "compiled"))
+    loaded = CompiledForest.load_arrays(str(tmp_path / "compiled"))
+    np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(X), rtol=0, atol=ATOL)
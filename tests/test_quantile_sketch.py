@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from src.data_cleaning.quantile_sketch import KLLSketch
+
+
+def _true_ranks(sorted_values, x):
+    # Fraction of values <= x
+    return np.searchsorted(sorted_values, x, side="right") / sorted_values.size
+
+
+@pytest.mark.parametrize("distribution", ["normal", "lognormal", "discrete"])
+def test_rank_error_within_bound(distribution):
+    rng = np.random.default_rng(0)
+    values = {
+        "normal": rng.normal(size=200_000),
+        "lognormal": rng.lognormal(sigma=2, size=200_000),
+        "discrete": rng.integers(0, 50, size=200_000).astype("float64")
+    }[distribution]
+
+    sketch = KLLSketch(k=200)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+
+    exact = np.sort(values)
+    bound = sketch.rank_error_bound()
+    assert sketch.n == values.size
+    assert 0 < bound < 0.05
+
+    points = np.quantile(values, np.linspace(0, 1, 101))
+    assert np.abs(sketch.cdf(points) - _true_ranks(exact, points)).max() <= bound
+
+    q = np.linspace(0.01, 0.99, 99)
+    estimates = sketch.quantile(q)
+    below = np.searchsorted(exact, estimates, side="left") / exact.size
+    above = _true_ranks(exact, estimates)
+    # Some rank held by the estimate is within the bound of q
+    assert np.all((below - bound <= q) & (q <= above + bound))
+
+
+def test_merged_sketches_stay_within_bound():
+    rng = np.random.default_rng(1)
+    parts = [rng.normal(loc, 1, 50_000) for loc in range(4)]
+    sketch = KLLSketch(k=200)
+    for part in parts:
+        sketch.merge(KLLSketch(k=200).update(part))
+
+    exact = np.sort(np.concatenate(parts))
+    points = np.quantile(exact, np.linspace(0, 1, 101))
+    assert sketch.n == exact.size
+    assert np.abs(sketch.cdf(points) - _true_ranks(exact, points)).max() <= sketch.rank_error_bound()
+
+
+def test_serialization_round_trip():
+    sketch = KLLSketch(k=100).update(np.random.default_rng(2).normal(size=20_000))
+    restored = KLLSketch.from_dict(sketch.to_dict())
+    q = np.linspace(0, 1, 11)
+    np.testing.assert_array_equal(restored.quantile(q), sketch.quantile(q))
+    assert restored.rank_error_bound() == sketch.rank_error_bound()
@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.dummy import DummyClassifier
+
+from src.feature_engineering.build_features import ROLLING_WINDOW, _compute_abt, _state_from_history
+from src.serving.scoring_service import FEATURE_COLUMNS, ScoringService
+
+RAW = Path(__file__).resolve().parents[1] / "data" / "raw" / "ai4i2020.csv"
+
+
+@pytest.fixture
+def history():
+    # Real readings in UDI order; the machine types are interleaved
+    return pd.read_csv(RAW, nrows=400)
+
+
+@pytest.fixture
+def service(history, tmp_path):
+    abt = _compute_abt(history.copy())
+    state_path = tmp_path / "abt_state.json"
+    state_path.write_text(json.dumps(_state_from_history(history, len(abt))))
+
+    model_path = tmp_path / "model.pkl"
+    joblib.dump(DummyClassifier().fit(abt[FEATURE_COLUMNS], abt["Machine failure"]), model_path)
+
+    service = ScoringService(str(model_path), str(state_path))
+    yield service
+    service.close()
+
+
+def _features(service, history, machine_ids):
+    return np.vstack([
+        service.transform(machine_id, reading)[0]
+        for machine_id, reading in zip(machine_ids, history.to_dict("records"))
+    ])
+
+
+def test_single_machine_replay_matches_build_features(service, history):
+    # Readings sent in UDI order under one machine_id reproduce the ABT
+    features = _features(service, history, ["line"] * len(history))
+    expected = _compute_abt(history.copy())[FEATURE_COLUMNS].to_numpy(dtype="float64")
+    np.testing.assert_allclose(features[ROLLING_WINDOW - 1:], expected, rtol=1e-6)
+
+
+def test_per_machine_buffers_differ_from_build_features(service, history):
+    # Rolling means per machine type only use that type's readings, which
+    # the ABT's global rolling means do not
+    features = _features(service, history, history["Type"])
+    expected = _compute_abt(history.copy())[FEATURE_COLUMNS].to_numpy(dtype="float64")
+    rolling = [FEATURE_COLUMNS.index(c) for c in ("Torque_roll_mean", "Speed_roll_mean", "Temp_roll_mean")]
+    static = [i for i in range(len(FEATURE_COLUMNS)) if i not in rolling]
+
+    np.testing.assert_allclose(features[ROLLING_WINDOW - 1:, static], expected[:, static], rtol=1e-6)
+    assert not np.allclose(features[ROLLING_WINDOW - 1:, rolling], expected[:, rolling], rtol=1e-6)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from sklearn.metrics import average_precision_score, confusion_matrix, roc_auc_score
+
+from src.evaluation.thresholds import (
+    at_threshold, average_precision, evaluate_scores, roc_auc, threshold_curve
+)
+
+
+def _scores(n_rows=3000, seed=0):
+    # Rare positives and rounded scores, so ties are common
+    rng = np.random.default_rng(seed)
+    y = rng.random(n_rows) < 0.05
+    scores = np.round(np.clip(rng.normal(0.3 + 0.4 * y, 0.2), 0, 1), 2)
+    return y.astype(int), scores
+
+
+def test_summaries_match_sklearn():
+    y, scores = _scores()
+    curve = threshold_curve(y, scores)
+    assert roc_auc(curve) == pytest.approx(roc_auc_score(y, scores), abs=1e-12)
+    assert average_precision(curve) == pytest.approx(average_precision_score(y, scores), abs=1e-12)
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.25, 0.5, 0.73, 1.0])
+def test_confusion_matches_sklearn(threshold):
+    y, scores = _scores()
+    row = at_threshold(threshold_curve(y, scores), threshold)
+    tn, fp, fn, tp = confusion_matrix(y, scores > threshold, labels=[0, 1]).ravel()
+    assert (row["TN"], row["FP"], row["FN"], row["TP"]) == (tn, fp, fn, tp)
+
+
+def test_every_curve_row_matches_sklearn():
+    y, scores = _scores(n_rows=500, seed=1)
+    for row in threshold_curve(y, scores).itertuples():
+        tn, fp, fn, tp = confusion_matrix(y, scores >= row.Threshold, labels=[0, 1]).ravel()
+        assert (row.TN, row.FP, row.FN, row.TP) == (tn, fp, fn, tp)
+
+
+def test_no_positives_has_no_operating_threshold():
+    metrics, _ = evaluate_scores(np.zeros(100, dtype=int), np.linspace(0, 1, 100))
+    assert np.isnan(metrics["auc"])
+    assert np.isnan(metrics["operating_point"]["threshold"])